@@ -1,18 +1,172 @@
 import cv2
 import numpy as np
-import mahotas
 import joblib
 import os
+import threading
+import time
+from contextlib import contextmanager
+from svm_numpy import NumpySVC
+from profil_deteksi import PROFIL_DETEKSI, PROFIL_DEFAULT
 import warnings # 1. Import library warnings
 
 # 2. Perintah untuk mematikan UserWarning (tulisan merah di terminal)
 warnings.filterwarnings("ignore", category=UserWarning)
 
+# 3. Arah tetangga GLCM (dy, dx) -> sama dengan urutan arah 2D di mahotas.haralick
+GLCM_DELTAS = ((0, 1), (1, 1), (1, 0), (1, -1))
+
+# 4. Ukuran gambar yang dipakai model (WAJIB sama dengan training)
+IMAGE_SIZE = 512
+
+# 5. Toleransi fitur jalur vectorized vs jalur mahotas, per fitur:
+#    |vectorized - mahotas| <= FEATURE_ATOL + FEATURE_RTOL * |mahotas| (seperti np.allclose).
+#    Selisihnya cuma dari urutan penjumlahan float64 (terukur <= ~1e-7 absolut). Relatif saja
+#    tidak cukup: correlation bisa mendekati 0 (misal -0.000156), jadi selisih relatifnya besar.
+#    Dicek di tests/test_ai_engine.py.
+FEATURE_RTOL = 1e-6
+FEATURE_ATOL = 1e-6
+
+# 6. File model gabungan (svm + scaler + label encoder) tanpa kompresi.
+#    Array di dalamnya bisa di-memory-map, jadi load-nya cepat dan worker hasil fork
+#    berbagi halaman memori yang sama. Dibuat dengan: python ai_engine.py export
+MODEL_BUNDLE = "model_bundle.joblib"
+
+
+def _glcm_features_batch(gray_patches):
+    """
+    Hitung 4 fitur GLCM (contrast, correlation, energy, homogeneity) untuk
+    banyak patch sekaligus, setara dengan:
+        mahotas.features.haralick(patch, ignore_zeros=True).mean(axis=0)[[1, 2, 8, 4]]
+    Input: array uint8 (N x P x P)
+    Output: (array fitur N x 4, array bool N -> False kalau mahotas akan ValueError)
+
+    Matriks co-occurrence tidak dibentuk utuh (256 x 256 per patch), karena
+    contrast/correlation/homogeneity cukup dihitung dari rata-rata pasangan
+    piksel, dan entropy cukup dari jumlah kemunculan tiap pasangan nilai.
+    """
+    g = gray_patches.astype(np.int32)
+    n, ps, _ = g.shape
+    per_arah = np.zeros((len(GLCM_DELTAS), n, 4))
+    valid = np.ones(n, dtype=bool)
+    patch_id = np.broadcast_to(np.arange(n, dtype=np.int32)[:, None, None], g.shape)
+    k = np.arange(256, dtype=np.float64)
+    lut_idm = 1.0 / (1.0 + k * k)
+
+    for d, (dy, dx) in enumerate(GLCM_DELTAS):
+        # Pasangan (a, b) = (piksel, tetangganya) di arah ini
+        x0, x1 = max(0, -dx), ps - max(0, dx)
+        a = g[:, :ps - dy, x0:x1]
+        b = g[:, dy:, x0 + dx:x1 + dx]
+
+        # ignore_zeros: pasangan yang salah satunya 0 dibuang
+        m = (a > 0) & (b > 0)
+        n_pair = m.sum(axis=(1, 2)).astype(np.float64)
+        valid &= n_pair > 0
+        n_pair[n_pair == 0] = 1.0
+
+        # Contrast & Homogeneity (Inverse Difference Moment)
+        diff = np.abs(a - b)
+        contrast = (diff * diff * m).sum(axis=(1, 2)) / n_pair
+        homogeneity = (lut_idm[diff] * m).sum(axis=(1, 2)) / n_pair
+
+        # Correlation (matriks simetris -> px == py, jadi ux == uy, sx == sy)
+        ux = ((a + b) * m).sum(axis=(1, 2)) / (2 * n_pair)
+        vx = ((a * a + b * b) * m).sum(axis=(1, 2)) / (2 * n_pair) - ux ** 2
+        eij = (a * b * m).sum(axis=(1, 2)) / n_pair
+        sx = np.sqrt(np.maximum(vx, 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = np.where(sx == 0.0, 1.0, (1.0 / sx / sx) * (eij - ux * ux))
+
+        # Entropy (indeks 8 mahotas, dipakai sebagai 'energy' saat training)
+        # Pasangan dihitung tanpa urutan: sel (i,j) & (j,i) matriks simetris
+        # masing-masing berisi c, sedangkan sel diagonal (i,i) berisi 2c.
+        a_m, b_m, pid = a[m], b[m], patch_id[:, :ps - dy, x0:x1][m]
+        keys = np.sort((pid << 16) | (np.minimum(a_m, b_m) << 8) | np.maximum(a_m, b_m))
+        if keys.size == 0:
+            # Tidak ada pasangan bukan-nol sama sekali (misal gambar hitam):
+            # semua patch sudah ditandai tidak valid, nilainya tidak dipakai
+            entropy = np.zeros(n)
+        else:
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            counts = np.diff(np.r_[starts, keys.size]).astype(np.float64)
+            keys = keys[starts]
+            diagonal = ((keys >> 8) & 255) == (keys & 255)
+            sum_clogc = np.where(diagonal, 2 * counts * np.log2(2 * counts), 2 * counts * np.log2(counts))
+            total = 2 * n_pair
+            entropy = np.log2(total) - np.bincount(keys >> 16, weights=sum_clogc, minlength=n) / total
+
+        per_arah[d] = np.stack([contrast, correlation, entropy, homogeneity], axis=1)
+
+    return per_arah.mean(axis=0), valid
+
+
+def _jpeg_size(data):
+    """
+    Baca (lebar, tinggi) dari header JPEG (marker SOF) tanpa decode gambar.
+    Output: (w, h) atau None kalau bukan JPEG / header tidak ketemu
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # byte pengisi
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # marker tanpa panjang
+            i += 2
+            continue
+        length = int.from_bytes(data[i + 2:i + 4], "big")
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h = int.from_bytes(data[i + 5:i + 7], "big")
+            w = int.from_bytes(data[i + 7:i + 9], "big")
+            return w, h
+        i += 2 + length
+    return None
+
+
+def _bundle_terbaru(path_bundle, path_pkl):
+    # Bundle dipakai kalau ada dan tidak lebih lama dari file .pkl mana pun
+    # (kalau model dilatih ulang tapi bundle lupa di-export ulang, .pkl yang dipakai)
+    if not os.path.exists(path_bundle):
+        return False
+    waktu_bundle = os.path.getmtime(path_bundle)
+    return all(not os.path.exists(p) or os.path.getmtime(p) <= waktu_bundle for p in path_pkl)
+
+
+def export_model_bundle(model_folder="ai_models"):
+    """Gabungkan model_svm.pkl, scaler.pkl, label_encoder.pkl jadi 1 file MODEL_BUNDLE (tanpa kompresi)."""
+    bundle = {
+        "svm": joblib.load(os.path.join(model_folder, "model_svm.pkl")),
+        "scaler": joblib.load(os.path.join(model_folder, "scaler.pkl")),
+        "le": joblib.load(os.path.join(model_folder, "label_encoder.pkl")),
+    }
+    path_bundle = os.path.join(model_folder, MODEL_BUNDLE)
+    joblib.dump(bundle, path_bundle, compress=0)
+    return path_bundle
+
+
 class LeafDiseaseDetector:
-    def __init__(self, model_folder="ai_models"):
+    def __init__(self, model_folder="ai_models", vectorized_features=True, reduced_decode=True, mmap=True,
+                 numpy_svm=True, early_exit=False, early_exit_min=12, early_exit_chunk=8, early_exit_z=2.58,
+                 profil=PROFIL_DEFAULT):
         """
         Saat API dinyalakan, fungsi ini jalan duluan untuk memuat Model ke memori.
         Jadi tidak perlu load berulang-ulang setiap ada request (biar cepat).
+
+        vectorized_features=False -> pakai jalur lama (cv2 + mahotas per patch),
+        berguna untuk membandingkan hasil dengan jalur vectorized.
+        reduced_decode=True -> JPEG besar yang dikirim sebagai bytes langsung
+        di-decode dalam ukuran 1/2, 1/4 atau 1/8 (selama masih >= 512 px).
+        mmap=True -> kalau ada model_bundle.joblib, array model di-memory-map dari file.
+        numpy_svm=True -> scaler + predict_proba dihitung dengan NumpySVC (svm_numpy.py),
+        bukan sklearn/libsvm; False -> pakai sklearn (untuk pembanding).
+        early_exit=True -> mode cepat (lihat _predict_early_exit) sebagai setelan default;
+        early_exit_min/chunk = jumlah kotak di kelompok pertama/berikutnya,
+        early_exit_z = ambang keyakinan statistik (2.58 ~ 99%).
+        profil = profil deteksi default (lihat PROFIL_DETEKSI) kalau request tidak memilih.
         """
         print("--- AI ENGINE: Loading Models... ---")
         
@@ -20,19 +174,75 @@ class LeafDiseaseDetector:
         path_svm = os.path.join(model_folder, "model_svm.pkl")
         path_scaler = os.path.join(model_folder, "scaler.pkl")
         path_le = os.path.join(model_folder, "label_encoder.pkl")
+        path_bundle = os.path.join(model_folder, MODEL_BUNDLE)
+
+        if _bundle_terbaru(path_bundle, (path_svm, path_scaler, path_le)):
+            # mmap_mode="c" (copy-on-write): libsvm butuh array yang bisa ditulis,
+            # tapi selama tidak ada yang menulis, halaman memori tetap dibagi dengan file
+            bundle = joblib.load(path_bundle, mmap_mode="c" if mmap else None)
+            self.svm = bundle["svm"]
+            self.scaler = bundle["scaler"]
+            self.le = bundle["le"]
+        else:
+            # Cek apakah file ada
+            if not os.path.exists(path_svm):
+                raise FileNotFoundError(f"Model tidak ditemukan di: {path_svm}")
+
+            # Load objek
+            self.svm = joblib.load(path_svm)
+            self.scaler = joblib.load(path_scaler)
+            self.le = joblib.load(path_le)
         
-        # Cek apakah file ada
-        if not os.path.exists(path_svm):
-            raise FileNotFoundError(f"Model tidak ditemukan di: {path_svm}")
-
-        # Load objek
-        self.svm = joblib.load(path_svm)
-        self.scaler = joblib.load(path_scaler)
-        self.le = joblib.load(path_le)
-        
+        self.numpy_svm = None
+        if numpy_svm:
+            try:
+                self.numpy_svm = NumpySVC(self.svm, self.scaler)
+            except ValueError as e:
+                print(f"⚠️ WARNING: NumpySVC tidak bisa dipakai, kembali ke sklearn. Error: {e}")
+
         self.PATCH_SIZE = 64
+        if profil not in PROFIL_DETEKSI:
+            raise ValueError(f"Profil deteksi tidak dikenal: {profil}")
+        self.profil = profil
+        self.early_exit = early_exit
+        self.early_exit_min = early_exit_min
+        self.early_exit_chunk = early_exit_chunk
+        self.early_exit_z = early_exit_z
+        self.vectorized_features = vectorized_features
+        self.reduced_decode = reduced_decode
+        # Statistik panggilan terakhir per thread (waktu per tahap + jumlah kotak), lihat ambil_statistik
+        self._statistik = threading.local()
         print("--- AI ENGINE: Ready! ---")
 
+    def _mulai_statistik(self):
+        self._statistik.data = {"tahap": {}, "patch": {}}
+
+    @contextmanager
+    def _ukur(self, tahap):
+        """Jumlahkan durasi blok ke statistik tahap (tidak melakukan apa-apa di luar predict_*)."""
+        mulai = time.perf_counter()
+        try:
+            yield
+        finally:
+            data = getattr(self._statistik, "data", None)
+            if data is not None:
+                data["tahap"][tahap] = data["tahap"].get(tahap, 0.0) + time.perf_counter() - mulai
+
+    def _hitung_patch(self, status, jumlah):
+        data = getattr(self._statistik, "data", None)
+        if data is not None:
+            data["patch"][status] = data["patch"].get(status, 0) + int(jumlah)
+
+    def ambil_statistik(self):
+        """
+        Ambil (lalu kosongkan) statistik predict_image / predict_images terakhir di thread ini:
+        {"tahap": {"decode": detik, "resize_mask": ..., "fitur": ..., "svm": ...},
+         "patch": {"dinilai": n, "tidak_valid": n, "background": n, "dilewati_early_exit": n}}
+        """
+        data = getattr(self._statistik, "data", None)
+        self._statistik.data = None
+        return data or {}
+
     def _extract_features(self, image):
         """
         Fungsi Privat (internal) untuk ekstraksi fitur patch.
@@ -49,6 +259,8 @@ class LeafDiseaseDetector:
         mean_hsv = np.mean(hsv, axis=(0,1))
 
         # Fitur Tekstur (GLCM)
+        # mahotas hanya dibutuhkan jalur lama ini, jadi di-import di sini (API tidak perlu load)
+        import mahotas
         try:
             texture = mahotas.features.haralick(gray, ignore_zeros=True).mean(axis=0)
         except ValueError:
@@ -69,56 +281,244 @@ class LeafDiseaseDetector:
         ]
         return features
 
-    def predict_image(self, image_path):
+    def _extract_features_batch(self, img, gray, coords):
         """
-        Fungsi utama yang dipanggil oleh main.py.
-        Input: Path file gambar
-        Output: Dictionary hasil diagnosa
+        Versi vectorized dari _extract_features untuk semua patch sekaligus.
+        Konversi warna dilakukan 1x untuk gambar utuh, lalu mean/std per patch
+        dihitung dari tumpukan patch NumPy, dan GLCM lewat _glcm_features_batch.
+        Input: gambar BGR, gray (hasil cvtColor gambar yang sama), list (y, x)
+               (kotak boleh tumpang tindih, posisinya tidak harus kelipatan PATCH_SIZE)
+        Output: array fitur (N x 13) + array bool patch yang fiturnya valid
+        Hasil sama dengan _extract_features dalam toleransi FEATURE_ATOL + FEATURE_RTOL.
+        """
+        ps = self.PATCH_SIZE
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        ys = np.array([y for y, _ in coords])
+        xs = np.array([x for _, x in coords])
+
+        # View semua jendela ps x ps (tanpa copy), lalu ambil & tumpuk jendela
+        # yang lolos validasi saja -> (patch, piksel, channel)
+        def blok(arr):
+            arr = arr.reshape(arr.shape[0], arr.shape[1], -1)
+            jendela = np.lib.stride_tricks.sliding_window_view(arr, (ps, ps), axis=(0, 1))
+            return jendela[ys, xs].transpose(0, 2, 3, 1).reshape(len(coords), ps * ps, -1)
+
+        bgr_patches = blok(img)
+        hsv_patches = blok(hsv)
+        gray_patches = blok(gray).reshape(len(coords), ps, ps)
+
+        # Fitur Warna (BGR dibalik jadi RGB)
+        mean_rgb = bgr_patches.mean(axis=1)[:, ::-1]
+        std_rgb = bgr_patches.std(axis=1)[:, ::-1]
+        mean_hsv = hsv_patches.mean(axis=1)
+
+        # Fitur Tekstur (GLCM)
+        texture, valid = _glcm_features_batch(gray_patches)
+
+        features = np.hstack([mean_rgb, std_rgb, mean_hsv, texture])
+        return features, valid
+
+    def _classify_patches(self, batch_feats):
+        """
+        Prediksi banyak patch sekaligus.
+        Input: list/array fitur (N x 13)
+        Output: (label per patch, probabilitas tertinggi per patch)
+
+        Scaler & SVM bekerja per baris, jadi hasilnya sama persis dengan
+        memanggil transform/predict_proba satu per satu, tapi overhead
+        sklearn cuma dibayar sekali per gambar.
+        """
+        self._hitung_patch("dinilai", len(batch_feats))
+        with self._ukur("svm"):
+            if self.numpy_svm is not None:
+                probs = self.numpy_svm.predict_proba(batch_feats)
+            else:
+                feats_scaled = self.scaler.transform(np.asarray(batch_feats, dtype=np.float64))
+                probs = self.svm.predict_proba(feats_scaled)
+
+        # Ambil probabilitas tertinggi tiap baris
+        max_probs = np.max(probs, axis=1)
+        pred_idx = np.argmax(probs, axis=1)
+        pred_labels = self.le.inverse_transform(pred_idx)
+        return pred_labels, max_probs
+
+    def _load_image(self, source, image_size=IMAGE_SIZE):
+        """
+        Baca gambar dari path file ATAU langsung dari memori (bytes / buffer / file-like).
+        Jalur memori tidak perlu tulis-baca disk dulu, cukup cv2.imdecode.
+        image_size: ukuran akhir setelah resize (decode kecil tidak boleh lebih kecil dari ini)
+        Output: gambar BGR, atau None kalau tidak terbaca
+        """
+        if isinstance(source, (str, os.PathLike)):
+            return cv2.imread(os.fspath(source))
+
+        if hasattr(source, "read"):
+            source = source.read()
+        data = np.frombuffer(source, dtype=np.uint8)
+        if data.size == 0:
+            return None
+
+        # Decode JPEG langsung dalam ukuran kecil kalau hasilnya masih >= ukuran model
+        flag = cv2.IMREAD_COLOR
+        ukuran = _jpeg_size(data[:65536].tobytes()) if self.reduced_decode else None
+        if ukuran:
+            w, h = ukuran
+            for faktor, flag_kecil in ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                                       (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                       (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                if min(w, h) // faktor >= image_size:
+                    flag = flag_kecil
+                    break
+        return cv2.imdecode(data, flag)
+
+    def _candidate_tiles(self, mask, stride=None):
+        """
+        Kotak PATCH_SIZE x PATCH_SIZE yang isinya daun (mask) minimal 30%,
+        digeser tiap `stride` piksel (None = PATCH_SIZE, kotak tidak tumpang tindih).
+        Jumlah piksel mask per kotak dihitung sekaligus dari integral image
+        (hasil sama dengan cv2.countNonZero per kotak, urutan baris demi baris).
+        Output: list (y, x) + array jumlah piksel daun per kotak
+        """
+        ps = self.PATCH_SIZE
+        stride = stride or ps
+        h, w = mask.shape
+        # kotak yang terpotong di tepi tidak dipakai
+        ys = np.arange(0, h - ps + 1, stride)
+        xs = np.arange(0, w - ps + 1, stride)
+        ii = cv2.integral((mask > 0).astype(np.uint8))
+        isi = (ii[ys[:, None] + ps, xs[None, :] + ps] - ii[ys[:, None], xs[None, :] + ps]
+               - ii[ys[:, None] + ps, xs[None, :]] + ii[ys[:, None], xs[None, :]])
+        rows, cols = np.nonzero(isi >= ps * ps * 0.3)
+        self._hitung_patch("background", isi.size - len(rows))
+        return [(int(ys[r]), int(xs[c])) for r, c in zip(rows, cols)], isi[rows, cols]
+
+    def _profil(self, profil):
+        """Nama profil -> setelan (lihat PROFIL_DETEKSI). None -> profil default detector."""
+        nama = profil or self.profil
+        if nama not in PROFIL_DETEKSI:
+            raise ValueError(f"Profil deteksi tidak dikenal: {nama}")
+        return nama, PROFIL_DETEKSI[nama]
+
+    def _prepare_image(self, source, image_size=IMAGE_SIZE, stride=None):
+        """
+        Baca gambar -> resize -> masking -> daftar kotak kandidat.
+        Output: (img, gray, coords), atau None kalau gambar tidak terbaca
         """
         # 1. Baca Gambar
-        img = cv2.imread(image_path)
+        with self._ukur("decode"):
+            img = self._load_image(source, image_size)
         if img is None:
-            return {"status": "error", "message": "Gambar tidak terbaca"}
+            return None
+        with self._ukur("resize_mask"):
+            return self._preprocess(img, image_size, stride)
 
-        # Resize WAJIB sama dengan training (512x512)
-        img = cv2.resize(img, (512, 512))
+    def _preprocess(self, img, image_size=IMAGE_SIZE, stride=None):
+        """Resize -> masking -> kotak kandidat. Output: (img, gray, coords)"""
+        # Resize (profil standard/accurate = 512x512, sama dengan training)
+        img = cv2.resize(img, (image_size, image_size))
         
         # Preprocessing Masking (Otsu)
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         blur = cv2.GaussianBlur(gray, (5,5), 0)
         _, mask = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
         
+        # 2. Sliding Window: kotak yang bukan background
+        coords, _ = self._candidate_tiles(mask, stride)
+        return img, gray, coords
+
+    def _tile_features(self, img, gray, coords):
+        """Ekstraksi fitur kotak-kotak terpilih. Output: array fitur patch valid (N x 13)"""
+        with self._ukur("fitur"):
+            if coords and self.vectorized_features:
+                feats, valid = self._extract_features_batch(img, gray, coords)
+                feats = feats[valid]
+            else:
+                batch_feats = []
+                for y, x in coords:
+                    hasil = self._extract_features(img[y:y+self.PATCH_SIZE, x:x+self.PATCH_SIZE])
+                    if hasil is None: continue
+                    batch_feats.append(hasil)
+                feats = np.asarray(batch_feats, dtype=np.float64).reshape(-1, 13)
+        self._hitung_patch("tidak_valid", len(coords) - len(feats))
+        return feats
+
+    def _image_features(self, source):
+        """
+        Baca gambar -> masking -> sliding window -> ekstraksi fitur.
+        Input: path file atau bytes gambar
+        Output: array fitur semua patch valid (N x 13), atau None kalau gambar tidak terbaca
+        """
+        siap = self._prepare_image(source)
+        if siap is None:
+            return None
+        # Fitur semua patch dikumpulkan dulu, baru diprediksi sekaligus (batch)
+        return self._tile_features(*siap)
+
+    def _vote_settled(self, counts, n_vote, n_dinilai, n_total):
+        """
+        Apakah juara voting sudah pasti, walaupun kotak sisanya belum dinilai?
+        - Pasti  : selisih juara 1 & 2 lebih besar dari jumlah kotak sisa
+        - Statistik: selisih proporsi juara 1 & 2 > z * standard error
+          (dengan koreksi populasi terbatas, karena jumlah kotak total diketahui)
+        """
+        if n_vote == 0:
+            return False
+        c1, c2 = np.sort(counts)[::-1][:2] if len(counts) > 1 else (counts[0], 0)
+        if c1 - c2 > n_total - n_dinilai:
+            return True
+        if n_vote < self.early_exit_min or n_total <= 1:
+            return False
+        p1, p2 = c1 / n_vote, c2 / n_vote
+        fpc = (n_total - n_dinilai) / (n_total - 1)
+        se = np.sqrt(max(p1 + p2 - (p1 - p2) ** 2, 0.0) / n_vote * fpc)
+        return (p1 - p2) > self.early_exit_z * se
+
+    def _predict_early_exit(self, img, gray, coords):
+        """
+        Mode cepat: kotak dinilai per kelompok (early_exit_chunk) dengan urutan yang
+        menyebar ke seluruh daun, dan berhenti begitu juara voting sudah pasti.
+        Persentase detail & confidence dihitung dari kotak yang sempat dinilai.
+        Output: (hasil voting, jumlah kotak yang dinilai)
+        """
+        n_total = len(coords)
+        # Urutan prioritas: deret golden ratio atas urutan baris -> kotak awal sudah
+        # tersebar merata di seluruh area daun (mirip sampel acak, tapi selalu sama)
+        urutan = np.argsort((np.arange(n_total) * 0.6180339887498949) % 1.0, kind="stable")
+        kelas = {nama: i for i, nama in enumerate(self.le.classes_)}
+        counts = np.zeros(len(kelas), dtype=np.int64)
+        semua_label, semua_prob = [], []
+        n_dinilai = 0
+
+        while n_dinilai < n_total:
+            ukuran = self.early_exit_min if n_dinilai == 0 else self.early_exit_chunk
+            idx = urutan[n_dinilai:n_dinilai + ukuran]
+            n_dinilai += len(idx)
+            feats = self._tile_features(img, gray, [coords[i] for i in idx])
+            if len(feats):
+                pred_labels, max_probs = self._classify_patches(feats)
+                semua_label.extend(pred_labels)
+                semua_prob.extend(max_probs)
+                for label in pred_labels:
+                    counts[kelas[label]] += 1
+            if self._vote_settled(counts, len(semua_label), n_dinilai, n_total):
+                break
+
+        self._hitung_patch("dilewati_early_exit", n_total - n_dinilai)
+        return self._aggregate_votes(semua_label, semua_prob), n_dinilai
+
+    def _aggregate_votes(self, pred_labels, max_probs):
+        """
+        Voting hasil prediksi patch -> persentase area + penyakit dominan.
+        Output: Dictionary hasil diagnosa
+        """
         # Data Container untuk Voting
         confidence_data = {class_name: [] for class_name in self.le.classes_}
         total_valid_patches = 0
-        h, w, _ = img.shape
-        
-        # 2. Sliding Window (Looping Kotak)
-        for y in range(0, h, self.PATCH_SIZE):
-            for x in range(0, w, self.PATCH_SIZE):
-                patch = img[y:y+self.PATCH_SIZE, x:x+self.PATCH_SIZE]
-                patch_mask = mask[y:y+self.PATCH_SIZE, x:x+self.PATCH_SIZE]
-                
-                # Validasi Ukuran & Isi (Bukan background)
-                if patch.shape[0] != self.PATCH_SIZE or patch.shape[1] != self.PATCH_SIZE: continue
-                if cv2.countNonZero(patch_mask) < (self.PATCH_SIZE * self.PATCH_SIZE * 0.3): continue 
-                
-                # Ekstraksi
-                feats = self._extract_features(patch)
-                if feats is None: continue
 
-                # Scaling & Prediksi
-                feats_scaled = self.scaler.transform([feats])
-                probs = self.svm.predict_proba(feats_scaled)[0]
-                
-                # Ambil probabilitas tertinggi
-                max_prob = np.max(probs)
-                pred_idx = np.argmax(probs)
-                pred_label = self.le.inverse_transform([pred_idx])[0]
-                
-                # Simpan vote
-                confidence_data[pred_label].append(max_prob)
-                total_valid_patches += 1
+        # Simpan vote (urutan sama dengan urutan patch)
+        for pred_label, max_prob in zip(pred_labels, max_probs):
+            confidence_data[pred_label].append(max_prob)
+            total_valid_patches += 1
 
         # 3. Hitung Hasil Akhir (Persentase)
         if total_valid_patches == 0:
@@ -159,4 +559,79 @@ class LeafDiseaseDetector:
             "dominan": clean_dominan,     # String untuk kolom 'hasil_deteksi'
             "confidence": round(dominan_conf, 2), # Float untuk kolom 'tingkat_keyakinan'
             "detail": final_results       # Dict untuk kolom 'detail_persentase'
-        }
\ No newline at end of file
+        }
+
+    def predict_image(self, image, early_exit=None, profil=None):
+        """
+        Fungsi utama yang dipanggil oleh main.py.
+        Input: Path file gambar, atau isi file (bytes / buffer) hasil upload
+               early_exit: True/False untuk mode cepat, None -> ikut profil / setelan detector
+               profil    : nama profil di PROFIL_DETEKSI, None -> profil default detector
+        Output: Dictionary hasil diagnosa (+ patch_dievaluasi, patch_kandidat & profil)
+        """
+        nama_profil, setelan = self._profil(profil)
+        self._mulai_statistik()
+        siap = self._prepare_image(image, setelan["image_size"], setelan["stride"])
+        if siap is None:
+            return {"status": "error", "message": "Gambar tidak terbaca"}
+        img, gray, coords = siap
+
+        if early_exit is None:
+            early_exit = self.early_exit or setelan["early_exit"]
+        if early_exit:
+            hasil, n_dinilai = self._predict_early_exit(img, gray, coords)
+        else:
+            # Scaling & Prediksi (1x per gambar, bukan 1x per patch)
+            feats = self._tile_features(img, gray, coords)
+            if len(feats) == 0:
+                hasil = self._aggregate_votes([], [])
+            else:
+                hasil = self._aggregate_votes(*self._classify_patches(feats))
+            n_dinilai = len(coords)
+
+        hasil["patch_dievaluasi"] = n_dinilai
+        hasil["patch_kandidat"] = len(coords)
+        hasil["profil"] = nama_profil
+        return hasil
+
+    def predict_images(self, images, profil=None):
+        """
+        Versi batch dari predict_image untuk banyak gambar (upload massal).
+        Patch dari SEMUA gambar digabung lalu diprediksi dengan 1x panggilan SVM.
+        Input: list path gambar / bytes gambar, profil (early exit profil tidak dipakai di batch)
+        Output: list Dictionary hasil diagnosa (urutan sama dengan input)
+        """
+        nama_profil, setelan = self._profil(profil)
+        self._mulai_statistik()
+        semua_siap = [self._prepare_image(image, setelan["image_size"], setelan["stride"]) for image in images]
+        semua_feats = [None if siap is None else self._tile_features(*siap) for siap in semua_siap]
+
+        # Scaling & Prediksi (1x untuk semua gambar)
+        gabungan = [f for f in semua_feats if f is not None and len(f) > 0]
+        pred_labels, max_probs = np.array([]), np.array([])
+        if gabungan:
+            pred_labels, max_probs = self._classify_patches(np.vstack(gabungan))
+
+        hasil = []
+        posisi = 0
+        for siap, feats in zip(semua_siap, semua_feats):
+            if feats is None:
+                hasil.append({"status": "error", "message": "Gambar tidak terbaca"})
+                continue
+            akhir = posisi + len(feats)
+            item = self._aggregate_votes(pred_labels[posisi:akhir], max_probs[posisi:akhir])
+            item["patch_dievaluasi"] = item["patch_kandidat"] = len(siap[2])
+            item["profil"] = nama_profil
+            hasil.append(item)
+            posisi = akhir
+        return hasil
+
+if __name__ == "__main__":
+    # python ai_engine.py export [folder_model]
+    import sys
+    if len(sys.argv) >= 2 and sys.argv[1] == "export":
+        folder = sys.argv[2] if len(sys.argv) >= 3 else "ai_models"
+        path = export_model_bundle(folder)
+        print(f"✅ Model bundle tersimpan: {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+    else:
+        print("Pemakaian: python ai_engine.py export [folder_model]")
@@ -0,0 +1,365 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+# ==========================================
+# BENCHMARK DETECTOR & ENDPOINT INGEST
+# Hasilnya JSON (mesin bisa baca), jadi bisa dibandingkan antar commit:
+#   python benchmark.py --output hasil_lama.json
+#   (ganti kode / checkout commit lain)
+#   python benchmark.py --output hasil_baru.json --bandingkan hasil_lama.json
+# Bagian (--bagian, pisahkan dengan koma):
+# - detector: latensi per gambar (persentil) & gambar/detik untuk korpus static/images
+# - tahapan : waktu per tahap (decode, resize+mask, fitur, SVM+voting)
+# - api     : uji beban /iot/soil-data, /iot/water-level, /iot/detect-disease
+#             (uvicorn di proses terpisah, database MySQL diganti file SQLite sementara)
+# Urutan gambar & isi payload diacak dengan seed tetap supaya hasil bisa diulang.
+# ==========================================
+
+FOLDER_REPO = os.path.dirname(os.path.abspath(__file__))
+FOLDER_KORPUS = os.path.join(FOLDER_REPO, "static", "images")
+GAMBAR_TAMBAHAN = os.path.join(FOLDER_REPO, "Daun Sehat 2.JPG")
+PERSENTIL = (50, 90, 99)
+
+
+def ringkas(durasi_detik):
+    """List durasi (detik) -> statistik dalam milidetik."""
+    ms = np.asarray(durasi_detik, dtype=np.float64) * 1000
+    if ms.size == 0:
+        return {"n": 0}
+    hasil = {"n": int(ms.size), "mean_ms": round(float(ms.mean()), 3)}
+    for p in PERSENTIL:
+        hasil[f"p{p}_ms"] = round(float(np.percentile(ms, p)), 3)
+    hasil["max_ms"] = round(float(ms.max()), 3)
+    return hasil
+
+
+def muat_korpus(batas=None):
+    """Output: list (nama_file, bytes) dari static/images (+ gambar contoh di root repo)."""
+    paths = sorted(
+        os.path.join(FOLDER_KORPUS, f) for f in os.listdir(FOLDER_KORPUS)
+        if f.lower().endswith((".jpg", ".jpeg", ".png"))
+    ) if os.path.isdir(FOLDER_KORPUS) else []
+    if os.path.exists(GAMBAR_TAMBAHAN):
+        paths.append(GAMBAR_TAMBAHAN)
+    if batas:
+        paths = paths[:batas]
+    korpus = []
+    for path in paths:
+        with open(path, "rb") as f:
+            korpus.append((os.path.basename(path), f.read()))
+    return korpus
+
+
+def _info_commit():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=FOLDER_REPO, text=True,
+                                         stderr=subprocess.DEVNULL).strip()
+        kotor = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                             cwd=FOLDER_REPO, text=True, stderr=subprocess.DEVNULL).strip())
+        return {"commit": commit, "ada_perubahan": kotor}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "ada_perubahan": None}
+
+
+# ==========================================
+# 1. DETECTOR: LATENSI PER GAMBAR
+# ==========================================
+def bench_detector(detector, korpus, ulang, profil, seed):
+    urutan = [i for _ in range(ulang) for i in range(len(korpus))]
+    random.Random(seed).shuffle(urutan)
+
+    # Pemanasan: 1x tiap gambar (cache CPU, alokasi NumPy pertama, dll)
+    for _, data in korpus:
+        detector.predict_image(data, profil=profil)
+
+    durasi = []
+    mulai = time.perf_counter()
+    for i in urutan:
+        t = time.perf_counter()
+        detector.predict_image(korpus[i][1], profil=profil)
+        durasi.append(time.perf_counter() - t)
+    total = time.perf_counter() - mulai
+
+    hasil = ringkas(durasi)
+    hasil["gambar_per_detik"] = round(len(urutan) / total, 2)
+    return hasil
+
+
+# ==========================================
+# 2. TAHAPAN: DECODE / RESIZE+MASK / FITUR / SVM
+# ==========================================
+def bench_tahapan(detector, korpus, ulang, profil):
+    from profil_deteksi import PROFIL_DETEKSI
+
+    setelan = PROFIL_DETEKSI[profil]
+    tahap = {"decode": [], "resize_mask": [], "fitur": [], "svm_voting": []}
+    jumlah_patch = []
+    for putaran in range(ulang + 1):
+        for _, data in korpus:
+            t0 = time.perf_counter()
+            img = detector._load_image(data, setelan["image_size"])
+            if img is None:
+                continue
+            t1 = time.perf_counter()
+            img, gray, coords = detector._preprocess(img, setelan["image_size"], setelan["stride"])
+            t2 = time.perf_counter()
+            feats = detector._tile_features(img, gray, coords)
+            t3 = time.perf_counter()
+            if len(feats):
+                detector._aggregate_votes(*detector._classify_patches(feats))
+            t4 = time.perf_counter()
+            if putaran == 0:
+                continue  # putaran pertama = pemanasan
+            tahap["decode"].append(t1 - t0)
+            tahap["resize_mask"].append(t2 - t1)
+            tahap["fitur"].append(t3 - t2)
+            tahap["svm_voting"].append(t4 - t3)
+            jumlah_patch.append(len(feats))
+
+    total = sum(sum(d) for d in tahap.values()) or 1.0
+    hasil = {}
+    for nama, durasi in tahap.items():
+        hasil[nama] = ringkas(durasi)
+        hasil[nama]["porsi_persen"] = round(sum(durasi) / total * 100, 1)
+    hasil["patch_per_gambar"] = round(float(np.mean(jumlah_patch)), 1) if jumlah_patch else 0.0
+    return hasil
+
+
+# ==========================================
+# 3. API: UJI BEBAN ENDPOINT (SQLITE SEBAGAI PENGGANTI MYSQL)
+# ==========================================
+def _port_kosong():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ServerLokal:
+    """
+    Jalankan uvicorn main:app di proses terpisah dengan DATABASE_URL = file SQLite sementara.
+    Folder kerja juga sementara, jadi gambar upload tidak mengotori static/images.
+    """
+
+    def __init__(self, env_tambahan=None):
+        self.env_tambahan = env_tambahan or {}
+        self.folder = None
+        self.proses = None
+        self.url = None
+
+    def __enter__(self):
+        self.folder = tempfile.mkdtemp(prefix="bench_api_")
+        os.symlink(os.path.join(FOLDER_REPO, "ai_models"), os.path.join(self.folder, "ai_models"))
+        db_url = "sqlite:///" + os.path.join(self.folder, "bench.db")
+
+        # Buat tabel (di MySQL tabel dibuat migration Laravel)
+        env = dict(os.environ, DATABASE_URL=db_url, LARAVEL_FOLDER=os.path.join(self.folder, "laravel"),
+                   PYTHONWARNINGS="ignore", **self.env_tambahan)
+        subprocess.run(
+            [sys.executable, "-c", "import models, database; models.Base.metadata.create_all(database.engine)"],
+            cwd=FOLDER_REPO, env=env, check=True,
+        )
+
+        port = _port_kosong()
+        self.url = f"http://127.0.0.1:{port}"
+        self.proses = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "--app-dir", FOLDER_REPO, "main:app",
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=self.folder, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        self._tunggu_siap()
+        return self
+
+    def _tunggu_siap(self, batas_detik=60):
+        import httpx
+
+        batas = time.monotonic() + batas_detik
+        while time.monotonic() < batas:
+            if self.proses.poll() is not None:
+                raise RuntimeError("Server benchmark mati saat startup")
+            try:
+                httpx.get(self.url + "/metrics", timeout=1)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        raise RuntimeError("Server benchmark tidak siap")
+
+    def __exit__(self, *exc):
+        if self.proses:
+            self.proses.terminate()
+            try:
+                self.proses.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.proses.kill()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+def uji_beban(url, buat_request, jumlah, konkurensi):
+    """
+    Kirim `jumlah` request dengan `konkurensi` thread.
+    buat_request(i) -> dict argumen httpx (method, url, json/files, params)
+    """
+    import httpx
+
+    status = {}
+    durasi = []
+
+    with httpx.Client(base_url=url, timeout=60) as client:
+        def kirim(i):
+            req = buat_request(i)
+            t = time.perf_counter()
+            r = client.request(**req)
+            return r.status_code, time.perf_counter() - t
+
+        # Pemanasan (koneksi, lazy load, cache)
+        for i in range(min(konkurensi, jumlah)):
+            kirim(i)
+
+        mulai = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=konkurensi) as pool:
+            for kode, dt in pool.map(kirim, range(jumlah)):
+                status[str(kode)] = status.get(str(kode), 0) + 1
+                durasi.append(dt)
+        total = time.perf_counter() - mulai
+
+    hasil = ringkas(durasi)
+    hasil["request_per_detik"] = round(jumlah / total, 2)
+    hasil["konkurensi"] = konkurensi
+    hasil["status"] = status
+    return hasil
+
+
+def bench_api(korpus, jumlah, konkurensi, jumlah_deteksi, konkurensi_deteksi, profil, seed):
+    rng = random.Random(seed)
+    soil = [{"tanaman_id": rng.randint(1, 10), "moisture": round(rng.uniform(20, 90), 1)} for _ in range(jumlah)]
+    tangki = [{"distance_cm": round(rng.uniform(2, 30), 1)} for _ in range(jumlah)]
+    urutan_gambar = [rng.randrange(len(korpus)) for _ in range(jumlah_deteksi)] if korpus else []
+
+    def req_soil(i):
+        return {"method": "POST", "url": "/iot/soil-data", "json": soil[i % len(soil)]}
+
+    def req_tangki(i):
+        return {"method": "POST", "url": "/iot/water-level", "json": tangki[i % len(tangki)]}
+
+    def req_deteksi(i):
+        nama, data = korpus[urutan_gambar[i % len(urutan_gambar)]]
+        return {"method": "POST", "url": "/iot/detect-disease",
+                "params": {"tanaman_id": 1, "profil": profil},
+                "files": {"file": (nama, data, "image/jpeg")}}
+
+    hasil = {}
+    # Antrian AI dibuat cukup besar supaya yang diukur latensi, bukan penolakan 503
+    with ServerLokal({"INFERENCE_QUEUE_SIZE": str(max(konkurensi_deteksi * 2, 4))}) as server:
+        print("📡 Uji beban /iot/soil-data ...")
+        hasil["soil_data"] = uji_beban(server.url, req_soil, jumlah, konkurensi)
+        print("📡 Uji beban /iot/water-level ...")
+        hasil["water_level"] = uji_beban(server.url, req_tangki, jumlah, konkurensi)
+        if urutan_gambar:
+            print("📡 Uji beban /iot/detect-disease ...")
+            hasil["detect_disease"] = uji_beban(server.url, req_deteksi, jumlah_deteksi, konkurensi_deteksi)
+    return hasil
+
+
+# ==========================================
+# 4. PERBANDINGAN DENGAN HASIL SEBELUMNYA
+# ==========================================
+METRIK_BANDING = ("mean_ms", "p50_ms", "p90_ms", "p99_ms", "gambar_per_detik", "request_per_detik")
+
+
+def _ratakan(data, awalan=""):
+    # {"api": {"soil_data": {"p50_ms": 1}}} -> {"api.soil_data.p50_ms": 1}
+    hasil = {}
+    for kunci, nilai in data.items():
+        if isinstance(nilai, dict):
+            hasil.update(_ratakan(nilai, f"{awalan}{kunci}."))
+        elif kunci in METRIK_BANDING:
+            hasil[awalan + kunci] = nilai
+    return hasil
+
+
+def bandingkan(lama, baru):
+    """Output: dict metrik -> {"lama", "baru", "selisih_persen"} (metrik yang ada di kedua hasil)."""
+    lewati = ("meta", "perbandingan")
+    a = _ratakan({k: v for k, v in lama.items() if k not in lewati})
+    b = _ratakan({k: v for k, v in baru.items() if k not in lewati})
+    hasil = {}
+    for kunci in sorted(a.keys() & b.keys()):
+        selisih = (b[kunci] - a[kunci]) / a[kunci] * 100 if a[kunci] else None
+        hasil[kunci] = {"lama": a[kunci], "baru": b[kunci],
+                        "selisih_persen": None if selisih is None else round(selisih, 1)}
+    return hasil
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark detector penyakit daun & endpoint ingest")
+    parser.add_argument("--bagian", default="detector,tahapan,api", help="detector,tahapan,api")
+    parser.add_argument("--output", default="benchmark_hasil.json", help="file JSON hasil")
+    parser.add_argument("--bandingkan", help="file JSON hasil sebelumnya (misal dari commit lama)")
+    parser.add_argument("--profil", default="standard", help="profil deteksi (fast/standard/accurate)")
+    parser.add_argument("--ulang", type=int, default=3, help="berapa kali korpus diulang (detector & tahapan)")
+    parser.add_argument("--batas-gambar", type=int, default=None, help="pakai N gambar pertama saja")
+    parser.add_argument("--request", type=int, default=500, help="jumlah request per endpoint sensor")
+    parser.add_argument("--konkurensi", type=int, default=8)
+    parser.add_argument("--request-deteksi", type=int, default=60)
+    parser.add_argument("--konkurensi-deteksi", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    bagian = {b.strip() for b in args.bagian.split(",") if b.strip()}
+    korpus = muat_korpus(args.batas_gambar)
+    print(f"🖼️ Korpus: {len(korpus)} gambar")
+
+    hasil = {
+        "meta": {
+            **_info_commit(),
+            "waktu": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu": os.cpu_count(),
+            "jumlah_gambar": len(korpus),
+            "argumen": vars(args),
+        }
+    }
+
+    if bagian & {"detector", "tahapan"} and korpus:
+        sys.path.insert(0, FOLDER_REPO)
+        from ai_engine import LeafDiseaseDetector
+
+        detector = LeafDiseaseDetector(model_folder=os.path.join(FOLDER_REPO, "ai_models"))
+        if "detector" in bagian:
+            print("⏱️ Benchmark detector ...")
+            hasil["detector"] = bench_detector(detector, korpus, args.ulang, args.profil, args.seed)
+        if "tahapan" in bagian:
+            print("⏱️ Benchmark per tahap ...")
+            hasil["tahapan"] = bench_tahapan(detector, korpus, args.ulang, args.profil)
+
+    if "api" in bagian:
+        hasil["api"] = bench_api(korpus, args.request, args.konkurensi, args.request_deteksi,
+                                 args.konkurensi_deteksi, args.profil, args.seed)
+
+    if args.bandingkan:
+        with open(args.bandingkan) as f:
+            hasil["perbandingan"] = bandingkan(json.load(f), hasil)
+        for metrik, nilai in hasil["perbandingan"].items():
+            print(f"   {metrik:45s} {nilai['lama']:>10} -> {nilai['baru']:>10} ({nilai['selisih_persen']}%)")
+
+    with open(args.output, "w") as f:
+        json.dump(hasil, f, indent=2)
+    print(f"✅ Hasil benchmark tersimpan: {args.output}")
+    return hasil
+
+
+if __name__ == "__main__":
+    main()
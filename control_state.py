@@ -0,0 +1,255 @@
+import os
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+import models
+
+# ==========================================
+# STATUS MODE MANUAL POMPA (AMAN UNTUK BANYAK WORKER)
+# Dulu disimpan di variabel global MANUAL_WATERING_ON, yang berbeda-beda
+# di tiap proses kalau uvicorn dijalankan dengan --workers > 1.
+# Sekarang disimpan di backend yang bisa dipilih:
+# - "memory"  : di memori proses (hanya untuk 1 worker, sama seperti dulu)
+# - "sqlite"  : file SQLite lokal, dipakai bersama semua worker di 1 server
+# - "database": tabel kontrol_pompa di database utama (untuk banyak server)
+# Mode manual berlaku per tanaman; SEMUA_TANAMAN = mode manual untuk semua tanaman.
+# ==========================================
+
+SEMUA_TANAMAN = 0
+
+# Jeda minimal (detik) sebelum DB dicoba dibaca lagi setelah gagal (DatabaseControlState),
+# supaya tiap laporan sensor tidak menunggu connect timeout selama DB mati
+JEDA_GAGAL_MIN = 1.0
+
+
+class _ControlStateBase:
+    def _baca(self):
+        """Output: dict tanaman_id -> manual aktif (bool)."""
+        raise NotImplementedError
+
+    def _tulis(self, tanaman_id, aktif):
+        raise NotImplementedError
+
+    def _matikan(self, tanaman_ids):
+        raise NotImplementedError
+
+    def is_manual(self, tanaman_id):
+        status = self._baca()
+        return status.get(tanaman_id, False) or status.get(SEMUA_TANAMAN, False)
+
+    def semua(self):
+        return dict(self._baca())
+
+    def set_manual(self, tanaman_id, aktif):
+        """tanaman_id None -> berlaku untuk semua tanaman (OFF juga mematikan mode manual per tanaman)."""
+        if tanaman_id is None and not aktif:
+            nyala = [t for t, on in self._baca().items() if on]
+            if nyala:
+                self._matikan(nyala)
+            return
+        self._tulis(SEMUA_TANAMAN if tanaman_id is None else tanaman_id, bool(aktif))
+
+    def matikan_manual(self, tanaman_id):
+        """
+        Tanah sudah basah: matikan mode manual tanaman ini + mode manual semua tanaman.
+        Output: True kalau ada mode manual yang dimatikan.
+        """
+        status = self._baca()
+        aktif = [t for t in (tanaman_id, SEMUA_TANAMAN) if status.get(t)]
+        if not aktif:
+            return False
+        self._matikan(aktif)
+        return True
+
+    def siapkan(self, engine):
+        """Dipanggil saat startup (buat tabel kalau perlu)."""
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryControlState(_ControlStateBase):
+    def __init__(self):
+        self._status = {}
+        self._lock = threading.Lock()
+
+    def _baca(self):
+        with self._lock:
+            return dict(self._status)
+
+    def _tulis(self, tanaman_id, aktif):
+        with self._lock:
+            self._status[tanaman_id] = aktif
+
+    def _matikan(self, tanaman_ids):
+        with self._lock:
+            for t in tanaman_ids:
+                self._status[t] = False
+
+
+class SQLiteControlState(_ControlStateBase):
+    def __init__(self, path="control_state.db"):
+        """
+        Semua worker membuka file yang sama. Hasil baca di-cache di memori proses,
+        dan hanya dibaca ulang kalau PRAGMA data_version berubah (ada proses lain yang commit).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kontrol_pompa ("
+            "tanaman_id INTEGER PRIMARY KEY, manual_on INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._versi = None
+        self._cache = {}
+
+    def _baca(self):
+        with self._lock:
+            versi = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if versi != self._versi:
+                rows = self._conn.execute("SELECT tanaman_id, manual_on FROM kontrol_pompa").fetchall()
+                self._cache = {t: bool(aktif) for t, aktif in rows}
+                self._versi = versi
+            return self._cache
+
+    def _tulis(self, tanaman_id, aktif):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO kontrol_pompa (tanaman_id, manual_on, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(tanaman_id) DO UPDATE SET manual_on = excluded.manual_on, updated_at = excluded.updated_at",
+                (tanaman_id, int(aktif), time.time()),
+            )
+            self._versi = None  # data_version tidak berubah untuk tulisan koneksi sendiri
+
+    def _matikan(self, tanaman_ids):
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE kontrol_pompa SET manual_on = 0, updated_at = ? "
+                f"WHERE manual_on = 1 AND tanaman_id IN ({','.join('?' * len(tanaman_ids))})",
+                (time.time(), *tanaman_ids),
+            )
+            self._versi = None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DatabaseControlState(_ControlStateBase):
+    def __init__(self, session_factory, cache_detik=1.0):
+        """
+        Disimpan di tabel kontrol_pompa (database utama).
+        cache_detik: hasil baca dipakai ulang selama sekian detik (0 = selalu baca DB);
+                     tulisan dari proses ini langsung membuat cache kadaluarsa.
+        Kalau DB tidak bisa dibaca, dipakai status terakhir yang diketahui
+        (belum pernah terbaca = semua AUTO), supaya IoT tetap dapat perintah pompa;
+        DB baru dicoba lagi setelah cache_detik (minimal JEDA_GAGAL_MIN) detik.
+        """
+        self.session_factory = session_factory
+        self.cache_detik = cache_detik
+        self._lock = threading.Lock()
+        self._cache = None
+        self._dibaca = 0.0
+        self._versi = 0  # naik tiap tulisan dari proses ini
+        self._coba_lagi = 0.0  # setelah baca gagal: DB tidak dicoba sebelum waktu (monotonic) ini
+
+    def _baca(self):
+        with self._lock:
+            sekarang = time.monotonic()
+            if self._cache is not None and sekarang - self._dibaca < self.cache_detik:
+                return self._cache
+            if sekarang < self._coba_lagi:
+                return dict(self._cache or {})
+            versi = self._versi
+        db = self.session_factory()
+        try:
+            rows = db.query(models.KontrolPompa.tanaman_id, models.KontrolPompa.manual_on).all()
+        except Exception as e:
+            print(f"⚠️ WARNING: Gagal membaca kontrol pompa, pakai status terakhir. Error: {e}")
+            with self._lock:
+                self._coba_lagi = time.monotonic() + max(self.cache_detik, JEDA_GAGAL_MIN)
+                return dict(self._cache or {})
+        finally:
+            db.close()
+        status = {t: bool(aktif) for t, aktif in rows}
+        with self._lock:
+            # Ada tulisan selama query berjalan -> hasil baca ini mungkin sudah basi, jangan disimpan
+            if self._versi == versi:
+                self._cache = status
+                self._dibaca = time.monotonic()
+        return status
+
+    def siapkan(self, engine):
+        models.Base.metadata.create_all(bind=engine, tables=[models.KontrolPompa.__table__])
+
+    def _buang_cache(self, berubah=None):
+        """
+        Tandai cache kadaluarsa setelah tulisan. berubah = {tanaman_id: aktif} yang baru ditulis,
+        dipakai sebagai status terakhir yang diketahui kalau DB tidak bisa dibaca.
+        """
+        with self._lock:
+            self._versi += 1
+            self._dibaca = float("-inf")
+            if berubah:
+                self._coba_lagi = 0.0  # tulisan berhasil -> DB sudah bisa dipakai lagi
+                if self._cache is not None:
+                    self._cache = {**self._cache, **berubah}
+
+    def _tulis(self, tanaman_id, aktif):
+        tabel = models.KontrolPompa
+        db = self.session_factory()
+        berhasil = False
+        try:
+            # UPDATE dulu; kalau barisnya belum ada -> INSERT (kalau keduluan worker lain, UPDATE lagi)
+            for _ in range(2):
+                hasil = db.execute(update(tabel).where(tabel.tanaman_id == tanaman_id).values(manual_on=aktif))
+                if hasil.rowcount:
+                    db.commit()
+                    berhasil = True
+                    break
+                try:
+                    db.add(tabel(tanaman_id=tanaman_id, manual_on=aktif))
+                    db.commit()
+                    berhasil = True
+                    break
+                except IntegrityError:
+                    db.rollback()
+        finally:
+            db.close()
+            self._buang_cache({tanaman_id: aktif} if berhasil else None)
+
+    def _matikan(self, tanaman_ids):
+        tabel = models.KontrolPompa
+        db = self.session_factory()
+        berhasil = False
+        try:
+            db.execute(
+                update(tabel)
+                .where(tabel.tanaman_id.in_(tanaman_ids), tabel.manual_on.is_(True))
+                .values(manual_on=False)
+            )
+            db.commit()
+            berhasil = True
+        finally:
+            db.close()
+            self._buang_cache({t: False for t in tanaman_ids} if berhasil else None)
+
+
+def buat_control_state(backend, session_factory=None, path="control_state.db", cache_detik=1.0):
+    """Pilih backend dari nama (env CONTROL_STATE_BACKEND)."""
+    if backend == "sqlite":
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        return SQLiteControlState(path)
+    if backend == "database":
+        return DatabaseControlState(session_factory, cache_detik=cache_detik)
+    if backend != "memory":
+        raise ValueError(f"CONTROL_STATE_BACKEND tidak dikenal: {backend}")
+    return MemoryControlState()
@@ -0,0 +1,87 @@
+import threading
+
+from metrics import Counter
+
+# ==========================================
+# DEADBAND + HEARTBEAT UNTUK LOG KELEMBAPAN
+# Sebagian besar laporan sensor hanya berubah 0.1% dengan pompa yang sama,
+# tapi dulu tetap jadi 1 baris log_kelembapan. Sekarang baris hanya ditulis kalau:
+# - kelembapan bergeser >= ambang (deadband) dari nilai yang TERAKHIR DITULIS
+# - pompa_on / sumber_perintah berubah
+# - sudah lewat heartbeat_detik sejak baris terakhir (tanda perangkat masih hidup)
+# Nilai yang terakhir ditulis per tanaman disimpan di memori proses ini (tiap worker punya
+# patokan sendiri -> baris dobel / heartbeat tidak rapi, jadi API harus jalan dengan 1 worker,
+# lihat WEB_CONCURRENCY di main.py). Di antara dua baris,
+# nilai sebenarnya dianggap tetap (step), lihat timeseries.bucket_series(step=True).
+# Ambang 0 = setiap laporan ditulis (perilaku lama).
+# ==========================================
+
+KEPUTUSAN = Counter("soil_deadband_total", "Jumlah laporan kelembapan yang ditulis / dilewati deadband")
+
+
+class DeadbandFilter:
+    def __init__(self, ambang=0.0, heartbeat_detik=300, ambang_per_tanaman=None):
+        """
+        ambang             : selisih kelembapan (%) minimal supaya baris baru ditulis
+        heartbeat_detik    : jarak maksimal antar baris walaupun nilainya tetap (0 = tanpa heartbeat)
+        ambang_per_tanaman : {tanaman_id: ambang} untuk tanaman yang butuh ambang berbeda
+        """
+        self.ambang = ambang
+        self.heartbeat_detik = heartbeat_detik
+        self.ambang_per_tanaman = dict(ambang_per_tanaman or {})
+        self._terakhir = {}  # tanaman_id -> (kelembapan, pompa_on, sumber_perintah, waktu)
+        self._lock = threading.Lock()
+
+    @property
+    def aktif(self):
+        return self.ambang > 0 or any(a > 0 for a in self.ambang_per_tanaman.values())
+
+    def ambang_untuk(self, tanaman_id):
+        return self.ambang_per_tanaman.get(tanaman_id, self.ambang)
+
+    def isi(self, tanaman_id, kelembapan, pompa_on, sumber_perintah, waktu):
+        """Isi nilai terakhir dari DB (startup), supaya laporan pertama setelah restart tidak selalu ditulis."""
+        with self._lock:
+            self._terakhir[tanaman_id] = (kelembapan, pompa_on, sumber_perintah, waktu)
+
+    def lupakan(self, tanaman_id):
+        # Dipanggil kalau baris yang "ditulis" ternyata gagal masuk DB -> laporan berikutnya pasti ditulis
+        with self._lock:
+            self._terakhir.pop(tanaman_id, None)
+
+    def perlu_tulis(self, tanaman_id, kelembapan, pompa_on, sumber_perintah, waktu):
+        """
+        Output: True kalau laporan ini harus jadi baris baru (nilai terakhir langsung diperbarui).
+        Data kiriman ulang yang lebih tua dari baris terakhir selalu ditulis (tanpa mengubah nilai terakhir).
+        """
+        with self._lock:
+            lama = self._terakhir.get(tanaman_id)
+            if lama is not None and waktu < lama[3]:
+                tulis, alasan = True, "terlambat"
+            else:
+                if lama is None:
+                    alasan = "pertama"
+                elif (pompa_on, sumber_perintah) != (lama[1], lama[2]):
+                    alasan = "pompa"
+                elif abs(kelembapan - lama[0]) >= self.ambang_untuk(tanaman_id):
+                    alasan = "deadband"
+                elif self.heartbeat_detik and (waktu - lama[3]).total_seconds() >= self.heartbeat_detik:
+                    alasan = "heartbeat"
+                else:
+                    alasan = None
+                tulis = alasan is not None
+                if tulis:
+                    self._terakhir[tanaman_id] = (kelembapan, pompa_on, sumber_perintah, waktu)
+
+        KEPUTUSAN.inc(keputusan="tulis" if tulis else "lewati", alasan=alasan or "dalam_ambang")
+        return tulis
+
+
+def parse_ambang_per_tanaman(teks):
+    """"1:0.5,3:2" -> {1: 0.5, 3: 2.0} (format env SOIL_DEADBAND_TANAMAN)."""
+    hasil = {}
+    for bagian in (teks or "").split(","):
+        if bagian.strip():
+            tanaman_id, ambang = bagian.split(":")
+            hasil[int(tanaman_id)] = float(ambang)
+    return hasil
@@ -0,0 +1,72 @@
+import threading
+import time
+import uuid
+
+# ==========================================
+# PENYIMPANAN JOB DETEKSI (MODE ASYNC)
+# Kamera cukup upload gambar lalu dapat job_id, hasilnya diambil belakangan
+# lewat endpoint polling. Disimpan di memori proses API: polling ke worker lain tidak
+# menemukan job-nya, jadi API harus jalan dengan 1 worker (lihat WEB_CONCURRENCY di main.py).
+# ==========================================
+
+STATUS_ANTRI = "queued"
+STATUS_SELESAI = "done"
+STATUS_GAGAL = "error"
+
+
+class JobStore:
+    def __init__(self, ttl_detik=3600, max_jobs=1000):
+        """
+        ttl_detik : berapa lama job yang sudah selesai masih bisa di-polling
+        max_jobs  : batas jumlah job di memori (job selesai paling lama dibuang duluan)
+        """
+        self.ttl_detik = ttl_detik
+        self.max_jobs = max_jobs
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def buat(self, tanaman_id, filename):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._bersihkan()
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": STATUS_ANTRI,
+                "tanaman_id": tanaman_id,
+                "gambar": filename,
+                "hasil": None,
+                "error": None,
+                "dibuat": time.time(),
+                "selesai": None,
+            }
+        return job_id
+
+    def selesai(self, job_id, hasil):
+        self._update(job_id, status=STATUS_SELESAI, hasil=hasil, selesai=time.time())
+
+    def gagal(self, job_id, pesan):
+        self._update(job_id, status=STATUS_GAGAL, error=pesan, selesai=time.time())
+
+    def hapus(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id, **data):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(data)
+
+    def _bersihkan(self):
+        # Buang job selesai yang sudah kadaluarsa, lalu yang paling lama kalau masih kepenuhan
+        sekarang = time.time()
+        selesai = sorted(
+            (job["selesai"], job_id) for job_id, job in self._jobs.items() if job["selesai"] is not None
+        )
+        for waktu, job_id in selesai:
+            if sekarang - waktu > self.ttl_detik or len(self._jobs) >= self.max_jobs:
+                del self._jobs[job_id]
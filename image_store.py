@@ -0,0 +1,153 @@
+import errno
+import hashlib
+import os
+import shutil
+import threading
+
+from metrics import Counter
+
+# ==========================================
+# PENYIMPANAN GAMBAR DETEKSI (CONTENT-ADDRESSED)
+# - Nama file = hash isi gambar -> upload di detik yang sama tidak saling timpa,
+#   dan gambar kembar (kamera posisi tetap) cukup disimpan sekali.
+# - Isi gambar ditulis SEKALI ke folder Python, lalu dibagikan ke folder Laravel:
+#   "hardlink" : 1 file fisik, 2 nama (default; beda disk -> otomatis symlink)
+#   "symlink"  : folder Laravel berisi symlink ke folder Python
+#   "shared"   : Laravel membaca langsung folder Python (tidak ada yang ditulis di sana)
+#   "copy"     : tulis 2x seperti dulu (kalau link tidak didukung)
+# - Thumbnail JPEG kecil dibuat di belakang ke subfolder thumbs/ (nama file sama),
+#   untuk daftar/galeri di dashboard supaya tidak mengirim gambar ukuran penuh.
+# ==========================================
+
+MODE_TAUTAN = ("hardlink", "symlink", "shared", "copy")
+# Panjang hash di nama file (hex). 32 hex = 128 bit, peluang tabrakan bisa diabaikan
+PANJANG_HASH = 32
+FOLDER_THUMBNAIL = "thumbs"
+
+BYTES_WRITTEN = Counter("image_store_bytes_written_total", "Jumlah byte gambar yang ditulis ke disk")
+DEDUP_HITS = Counter("image_store_dedup_total", "Jumlah upload yang isinya sudah tersimpan (tidak ditulis ulang)")
+LINK_FALLBACK = Counter("image_store_link_fallback_total", "Jumlah tautan yang turun ke cara lain (hardlink -> symlink -> copy)")
+
+
+def _ekstensi(data):
+    # Tebak ekstensi dari isi file (magic bytes), bukan dari nama upload
+    if data[:3] == b"\xff\xd8\xff":
+        return ".jpg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return ".png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return ".jpg"
+
+
+class ImageStore:
+    def __init__(self, folder, folder_laravel=None, mode="hardlink", thumbnail_size=256, thumbnail_quality=70):
+        """
+        folder            : folder utama (static/images, dipakai AI & /static)
+        folder_laravel    : folder storage Laravel (None / sama dengan folder -> mode "shared")
+        mode              : cara membagikan file ke Laravel (lihat MODE_TAUTAN)
+        thumbnail_size    : sisi terpanjang thumbnail (px), 0 = tidak membuat thumbnail
+        thumbnail_quality : kualitas JPEG thumbnail (0-100)
+        """
+        if mode not in MODE_TAUTAN:
+            raise ValueError(f"IMAGE_STORE_MODE tidak dikenal: {mode}")
+        if not folder_laravel or os.path.abspath(folder_laravel) == os.path.abspath(folder):
+            mode = "shared"
+        self.folder = folder
+        self.folder_laravel = folder_laravel
+        self.mode = mode
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_quality = thumbnail_quality
+
+        os.makedirs(os.path.join(folder, FOLDER_THUMBNAIL), exist_ok=True)
+        if mode != "shared":
+            os.makedirs(os.path.join(folder_laravel, FOLDER_THUMBNAIL), exist_ok=True)
+
+    def nama_file(self, data):
+        """Nama file dari hash isi gambar, misal "3f2a...9c.jpg"."""
+        return hashlib.sha256(data).hexdigest()[:PANJANG_HASH] + _ekstensi(data)
+
+    def _tulis(self, path, data):
+        """
+        Tulis atomik (file sementara + rename) -> pembaca tidak pernah melihat file setengah jadi.
+        Dua thread yang menulis gambar sama bersamaan aman: isinya identik, rename menimpa utuh.
+        Output: False kalau file dengan isi yang sama sudah ada.
+        """
+        if os.path.exists(path):
+            return False
+        sementara = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(sementara, "wb") as f:
+            f.write(data)
+        os.replace(sementara, path)
+        BYTES_WRITTEN.inc(len(data))
+        return True
+
+    def _tautkan(self, sumber, tujuan):
+        """Bagikan file `sumber` ke path `tujuan` (folder Laravel) sesuai mode."""
+        if self.mode == "shared" or os.path.lexists(tujuan):
+            return
+        if self.mode == "hardlink":
+            try:
+                os.link(sumber, tujuan)
+                return
+            except FileExistsError:
+                return
+            except OSError as e:
+                # Beda disk / filesystem tidak mendukung hardlink -> coba symlink
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                    raise
+                LINK_FALLBACK.inc(dari="hardlink")
+        if self.mode in ("hardlink", "symlink"):
+            try:
+                os.symlink(os.path.abspath(sumber), tujuan)
+                return
+            except FileExistsError:
+                return
+            except OSError:
+                LINK_FALLBACK.inc(dari="symlink")
+        shutil.copyfile(sumber, tujuan)
+        BYTES_WRITTEN.inc(os.path.getsize(tujuan))
+
+    def simpan(self, data, filename=None):
+        """
+        Simpan gambar (sekali tulis) + bagikan ke Laravel. Thumbnail dibuat terpisah (buat_thumbnail).
+        Output: path file di folder utama
+        """
+        filename = filename or self.nama_file(data)
+        path = os.path.join(self.folder, filename)
+        if not self._tulis(path, data):
+            DEDUP_HITS.inc()
+        if self.mode != "shared":
+            self._tautkan(path, os.path.join(self.folder_laravel, filename))
+        return path
+
+    def buat_thumbnail(self, data, filename):
+        """Thumbnail JPEG (sisi terpanjang thumbnail_size) di thumbs/<nama>.jpg. Output: path atau None."""
+        if not self.thumbnail_size:
+            return None
+        nama_thumb = os.path.splitext(filename)[0] + ".jpg"
+        path = os.path.join(self.folder, FOLDER_THUMBNAIL, nama_thumb)
+        if not os.path.exists(path):
+            # cv2 di-import di sini: modul ini juga dipakai replica yang tidak memuat AI
+            import cv2
+            import numpy as np
+
+            buf = np.frombuffer(data, dtype=np.uint8)
+            # Decode JPEG langsung dalam ukuran 1/4 (jauh lebih cepat), lalu resize ke ukuran akhir
+            img = cv2.imdecode(buf, cv2.IMREAD_REDUCED_COLOR_4)
+            if img is None or max(img.shape[:2]) < self.thumbnail_size:
+                img = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+            if img is None:
+                return None
+            h, w = img.shape[:2]
+            skala = self.thumbnail_size / max(h, w)
+            if skala < 1:
+                img = cv2.resize(img, (max(1, round(w * skala)), max(1, round(h * skala))), interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, self.thumbnail_quality])
+            if not ok:
+                return None
+            self._tulis(path, jpeg.tobytes())
+
+        if self.mode != "shared":
+            self._tautkan(path, os.path.join(self.folder_laravel, FOLDER_THUMBNAIL, nama_thumb))
+        return path
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from instrumentasi import catat_statistik_deteksi
+from metrics import Counter, Gauge, Histogram
+
+# ==========================================
+# WORKER POOL UNTUK AI ENGINE
+# predict_image itu berat (CPU), jadi tidak boleh jalan di event loop.
+# Semua deteksi dilempar ke pool ini, dengan antrian yang dibatasi supaya
+# lonjakan upload gambar tidak bikin endpoint sensor ikut lambat.
+# ==========================================
+
+QUEUE_DEPTH = Gauge("inference_queue_depth", "Jumlah deteksi yang sedang antri / diproses")
+QUEUE_WAIT = Histogram("inference_queue_wait_seconds", "Lama deteksi menunggu di antrian sebelum diproses")
+INFERENCE_DURATION = Histogram("inference_duration_seconds", "Lama proses predict_image di worker")
+REJECTED = Counter("inference_rejected_total", "Jumlah deteksi yang ditolak karena antrian penuh")
+
+# Detector milik proses ini (diisi oleh pool thread, atau oleh initializer di pool proses)
+_detector = None
+
+
+class PoolPenuh(Exception):
+    """Dilempar kalau antrian deteksi sudah penuh (endpoint membalas 503)."""
+
+
+def _init_worker(model_folder):
+    # Dijalankan sekali di tiap proses worker. Kalau proses hasil fork dari
+    # API, detector sudah ikut terbawa jadi tidak perlu load ulang.
+    global _detector
+    if _detector is None:
+        from ai_engine import LeafDiseaseDetector
+        _detector = LeafDiseaseDetector(model_folder=model_folder)
+
+
+def _jalankan(nama_method, args):
+    # Dipanggil di dalam worker: kembalikan hasil + waktu mulai (untuk hitung waktu tunggu)
+    # + statistik tahap (metric dicatat di proses API, bukan di proses worker)
+    mulai = time.time()
+    hasil = getattr(_detector, nama_method)(*args)
+    return hasil, mulai, time.time() - mulai, _detector.ambil_statistik()
+
+
+class InferencePool:
+    def __init__(self, model_folder="ai_models", mode="thread", workers=1, max_queue=4):
+        """
+        mode      : "thread" (1 model dipakai bersama) atau "process" (1 model per proses)
+        workers   : jumlah worker yang memproses gambar bersamaan
+        max_queue : jumlah gambar yang boleh antri di luar yang sedang diproses
+        """
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Mode pool tidak dikenal: {mode}")
+        self.model_folder = model_folder
+        self.mode = mode
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def start(self, detector=None):
+        global _detector
+        # Detector yang sudah di-load API dipakai ulang (thread, atau proses hasil fork)
+        _detector = detector
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.model_folder,),
+            )
+        else:
+            if _detector is None:
+                _init_worker(self.model_folder)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ai-worker")
+        print(f"--- AI POOL: {self.workers} worker ({self.mode}), antrian maks {self.max_queue} ---")
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def kapasitas(self):
+        return self.workers + self.max_queue
+
+    def penuh(self):
+        return self._pending >= self.kapasitas
+
+    def submit(self, nama_method, *args):
+        """
+        Masukkan pekerjaan ke antrian (langsung, tanpa await) lalu kembalikan
+        Task yang bisa di-await untuk mengambil hasilnya. Slot antrian sudah
+        dipesan saat fungsi ini selesai, jadi pemanggil (misal job async)
+        tahu saat itu juga apakah pekerjaannya diterima.
+        Melempar PoolPenuh kalau antrian sudah penuh.
+        """
+        if self._executor is None:
+            raise RuntimeError("Inference pool belum dijalankan")
+
+        with self._lock:
+            if self._pending >= self.kapasitas:
+                REJECTED.inc()
+                raise PoolPenuh()
+            self._pending += 1
+            QUEUE_DEPTH.set(self._pending)
+
+        masuk = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, _jalankan, nama_method, args)
+        except Exception:
+            self._lepas_slot()
+            raise
+        return asyncio.ensure_future(self._tunggu(future, masuk))
+
+    async def _tunggu(self, future, masuk):
+        try:
+            hasil, mulai, durasi, statistik = await future
+            QUEUE_WAIT.observe(max(0.0, mulai - masuk))
+            INFERENCE_DURATION.observe(durasi)
+            catat_statistik_deteksi(statistik)
+            return hasil
+        finally:
+            self._lepas_slot()
+
+    def _lepas_slot(self):
+        with self._lock:
+            self._pending -= 1
+            QUEUE_DEPTH.set(self._pending)
+
+    async def run(self, nama_method, *args):
+        """
+        Jalankan method LeafDiseaseDetector (misal "predict_image") di pool
+        dan tunggu hasilnya. Melempar PoolPenuh kalau antrian sudah penuh.
+        """
+        return await self.submit(nama_method, *args)
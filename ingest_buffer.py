@@ -0,0 +1,182 @@
+import math
+import threading
+import time
+
+from sqlalchemy import insert, text
+
+from metrics import Counter, Gauge, Histogram
+
+# ==========================================
+# BUFFER TULIS (WRITE-BEHIND) UNTUK DATA SENSOR
+# Endpoint sensor cukup menaruh baris ke buffer lalu langsung membalas perangkat.
+# Thread di belakang menulis isi buffer ke database dengan 1 INSERT multi-baris
+# setiap buffer mencapai batas jumlah ATAU batas waktu, dan saat API dimatikan.
+# Baris rusak tidak boleh menyandera buffer:
+# - nilai float NaN / inf ditolak saat masuk (lolos JSON, tapi ditolak MySQL)
+# - kalau INSERT gagal padahal DB hidup, baris dibagi dua dan dicoba per bagian (bisection);
+#   baris yang tetap gagal sendirian dibuang setelah maks_percobaan kali
+# - kalau DB mati, semua baris dikembalikan ke buffer tanpa dihitung sebagai percobaan
+# ==========================================
+
+
+class WriteBehindBuffer:
+    def __init__(self, session_factory, model, nama, flush_rows=200, flush_interval=1.0, max_rows=10000,
+                 maks_percobaan=3, maks_statement=64):
+        """
+        session_factory: pembuat Session (SessionLocal)
+        model          : tabel tujuan (misal models.LogKelembapan)
+        nama           : nama buffer (dipakai sebagai nama metric)
+        flush_rows     : tulis ke DB kalau isi buffer sudah sebanyak ini
+        flush_interval : tulis ke DB paling lambat tiap sekian detik
+        max_rows       : kapasitas buffer; kalau DB macet & buffer penuh, baris baru dibuang
+        maks_percobaan : baris yang gagal ditulis sendirian (DB hidup, baris lain berhasil)
+                         dibuang setelah sekian kali
+        maks_statement : batas jumlah INSERT per flush saat bisection (sisanya dicoba di flush berikutnya)
+        """
+        self.session_factory = session_factory
+        self.model = model
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.maks_percobaan = maks_percobaan
+        self.maks_statement = maks_statement
+
+        self._rows = []
+        self._percobaan = {}  # id(baris) -> jumlah gagal ditulis sendirian
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stop = False
+        self._thread = None
+
+        self.depth = Gauge(f"{nama}_buffer_depth", "Jumlah baris yang menunggu ditulis ke database")
+        self.flush_seconds = Histogram(f"{nama}_buffer_flush_seconds", "Lama 1x flush (INSERT multi-baris + commit)")
+        self.flushed = Counter(f"{nama}_buffer_flushed_rows_total", "Jumlah baris yang berhasil ditulis")
+        self.dropped = Counter(f"{nama}_buffer_dropped_rows_total", "Jumlah baris yang dibuang (buffer penuh / gagal tulis)")
+        self.rejected = Counter(f"{nama}_buffer_rejected_rows_total", "Jumlah baris yang ditolak (nilai NaN / inf)")
+
+    def add(self, row):
+        """Taruh 1 baris (dict kolom -> nilai) ke buffer. Output: False kalau baris ditolak / dibuang."""
+        if any(isinstance(v, float) and not math.isfinite(v) for v in row.values()):
+            self.rejected.inc()
+            return False
+        with self._cond:
+            if len(self._rows) >= self.max_rows:
+                self.dropped.inc()
+                return False
+            self._rows.append(row)
+            self.depth.set(len(self._rows))
+            if len(self._rows) >= self.flush_rows:
+                self._cond.notify()
+        return True
+
+    def start(self):
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, name=f"buffer-{self.model.__tablename__}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Hentikan thread lalu kuras sisa buffer ke database
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._stop and len(self._rows) < self.flush_rows:
+                    self._cond.wait(timeout=self.flush_interval)
+                if self._stop:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Tulis semua isi buffer dengan 1 INSERT multi-baris. Output: jumlah baris yang ditulis."""
+        with self._flush_lock:
+            with self._cond:
+                rows, self._rows = self._rows, []
+                self.depth.set(0)
+            if not rows:
+                return 0
+
+            mulai = time.perf_counter()
+            db = self.session_factory()
+            try:
+                ditulis, gagal, rusak, error = self._tulis(db, rows, [self.maks_statement])
+            finally:
+                db.close()
+                self.flush_seconds.observe(time.perf_counter() - mulai)
+
+            if gagal:
+                print(f"❌ Error DB (buffer {self.model.__tablename__}): {len(gagal)} baris gagal ditulis. Error: {error}")
+                self._kembalikan(self._saring_rusak(gagal, rusak if ditulis else set()))
+            return ditulis
+
+    def _tulis(self, db, rows, anggaran):
+        """
+        INSERT multi-baris; kalau gagal padahal DB hidup, dibagi dua dan dicoba per bagian.
+        anggaran: [sisa jumlah INSERT di flush ini] (dipakai bersama semua cabang)
+        Output: (jumlah tertulis, baris gagal (urutan asli), id baris yang gagal sendirian, error terakhir)
+        """
+        anggaran[0] -= 1
+        try:
+            db.execute(insert(self.model).values(rows))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            if len(rows) == 1 and self._db_hidup(db):
+                return 0, rows, {id(rows[0])}, e
+            if len(rows) == 1 or anggaran[0] <= 0 or not self._db_hidup(db):
+                return 0, rows, set(), e
+            tengah = len(rows) // 2
+            hasil = [self._tulis(db, bagian, anggaran) for bagian in (rows[:tengah], rows[tengah:])]
+            return (sum(h[0] for h in hasil), hasil[0][1] + hasil[1][1],
+                    hasil[0][2] | hasil[1][2], hasil[1][3] or hasil[0][3])
+
+        self.flushed.inc(len(rows))
+        for row in rows:
+            self._percobaan.pop(id(row), None)
+        return len(rows), [], set(), None
+
+    def _db_hidup(self, db):
+        # Bedakan "baris ditolak database" dengan "database mati / tidak terhubung"
+        try:
+            db.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            db.rollback()
+            return False
+
+    def _saring_rusak(self, rows, rusak):
+        """
+        Hitung percobaan baris yang gagal sendirian; yang sudah maks_percobaan kali dibuang.
+        rusak hanya diisi kalau ada baris lain yang berhasil di flush yang sama,
+        supaya masalah tabel / hak akses tidak membuat semua baris dibuang.
+        """
+        sisa = []
+        for row in rows:
+            if id(row) in rusak:
+                n = self._percobaan.get(id(row), 0) + 1
+                if n >= self.maks_percobaan:
+                    self._percobaan.pop(id(row), None)
+                    self.dropped.inc()
+                    print(f"🗑️ Baris dibuang setelah {n}x gagal ditulis (buffer {self.model.__tablename__}): {row}")
+                    continue
+                self._percobaan[id(row)] = n
+            sisa.append(row)
+        return sisa
+
+    def _kembalikan(self, rows):
+        # Gagal tulis -> taruh lagi di depan buffer (dicoba di flush berikutnya),
+        # selama muat; sisanya dihitung sebagai baris yang dibuang
+        with self._cond:
+            muat = max(0, self.max_rows - len(self._rows))
+            self._rows = rows[:muat] + self._rows
+            if len(rows) > muat:
+                self.dropped.inc(len(rows) - muat)
+                for row in rows[muat:]:
+                    self._percobaan.pop(id(row), None)
+            self.depth.set(len(self._rows))
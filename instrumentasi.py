@@ -0,0 +1,112 @@
+import time
+
+from sqlalchemy import event
+
+from metrics import Counter, Histogram
+
+# ==========================================
+# INSTRUMENTASI REQUEST, TAHAP DETEKSI & QUERY DATABASE
+# Semua metric di sini tampil di /metrics (format Prometheus) dan cukup ringan
+# untuk dinyalakan terus di produksi: per kejadian hanya perf_counter + 1 lock.
+# - http_*            : durasi & jumlah request per route (template path, bukan URL asli)
+# - detection_stage_* : waktu per tahap deteksi (baca upload, decode, fitur, SVM, DB, file)
+# - detection_patches : kotak yang dinilai / dilewati di predict_image
+# - db_query_*        : durasi query dari event engine SQLAlchemy (per jenis operasi)
+# - ingest_readings   : jumlah data sensor yang masuk per endpoint (laju = rate() di Prometheus)
+# ==========================================
+
+# Tahap deteksi & query DB jauh lebih cepat dari request, jadi bucket-nya mulai dari 0.5 ms
+BUCKET_CEPAT = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+HTTP_DURATION = Histogram("http_request_duration_seconds", "Lama request sampai header balasan dikirim")
+HTTP_REQUESTS = Counter("http_requests_total", "Jumlah request per route & status")
+DETECTION_STAGE = Histogram("detection_stage_seconds", "Lama tiap tahap deteksi penyakit", buckets=BUCKET_CEPAT)
+DETECTION_PATCHES = Counter("detection_patches_total", "Jumlah kotak gambar per status (dinilai / dilewati)")
+DB_QUERY = Histogram("db_query_duration_seconds", "Lama eksekusi query database", buckets=BUCKET_CEPAT)
+DB_ERRORS = Counter("db_query_errors_total", "Jumlah query database yang gagal")
+INGEST_READINGS = Counter("ingest_readings_total", "Jumlah data sensor yang diterima per endpoint")
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI murni (tanpa BaseHTTPMiddleware, jadi overhead-nya kecil).
+    Durasi diukur sampai header balasan dikirim: BackgroundTasks (simpan gambar)
+    tidak ikut terhitung, dan koneksi SSE yang terbuka lama tidak merusak histogram.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mulai = time.perf_counter()
+        tercatat = False
+
+        def catat(status):
+            # Route diisi router saat request cocok; 404 digabung supaya label tidak meledak
+            route = getattr(scope.get("route"), "path", None) or "lainnya"
+            HTTP_DURATION.observe(time.perf_counter() - mulai, method=scope["method"], route=route)
+            HTTP_REQUESTS.inc(method=scope["method"], route=route, status=status)
+
+        async def send_ukur(message):
+            nonlocal tercatat
+            if message["type"] == "http.response.start" and not tercatat:
+                tercatat = True
+                catat(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_ukur)
+        except Exception:
+            if not tercatat:
+                catat(500)
+            raise
+
+
+def _jenis_query(statement):
+    # "SELECT ...", "INSERT ..." -> label operasi (jumlah nilai kecil, aman untuk Prometheus)
+    kata = statement.lstrip().split(None, 1)
+    jenis = kata[0].lower() if kata else ""
+    return jenis if jenis in ("select", "insert", "update", "delete") else "lainnya"
+
+
+def pasang_timer_db(engine):
+    """
+    Pasang event before/after_cursor_execute ke engine (sync, atau .sync_engine milik engine async).
+    Waktu mulai disimpan di conn.info (tumpukan, aman untuk query bersarang).
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _mulai(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("waktu_query", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _selesai(conn, cursor, statement, parameters, context, executemany):
+        tumpukan = conn.info.get("waktu_query")
+        if tumpukan:
+            DB_QUERY.observe(time.perf_counter() - tumpukan.pop(), operasi=_jenis_query(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def _gagal(context):
+        tumpukan = context.connection.info.get("waktu_query") if context.connection is not None else None
+        if tumpukan:
+            tumpukan.pop()
+        operasi = _jenis_query(context.statement) if context.statement else "lainnya"
+        DB_ERRORS.inc(operasi=operasi)
+
+
+def catat_statistik_deteksi(statistik):
+    """
+    Masukkan statistik 1 panggilan detector (dari LeafDiseaseDetector.ambil_statistik)
+    ke histogram tahap & counter kotak. Dipanggil di proses API, jadi mode pool
+    "process" pun tetap tercatat.
+    """
+    if not statistik:
+        return
+    for tahap, durasi in statistik.get("tahap", {}).items():
+        DETECTION_STAGE.observe(durasi, tahap=tahap)
+    for status, jumlah in statistik.get("patch", {}).items():
+        if jumlah:
+            DETECTION_PATCHES.inc(jumlah, status=status)
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import threading
+
+from metrics import Counter, Gauge
+
+# ==========================================
+# PUSH DATA SENSOR LANGSUNG KE DASHBOARD (SERVER-SENT EVENTS)
+# Browser cukup membuka 1 koneksi /web/stream, lalu setiap data kelembapan,
+# status pompa & tangki yang masuk langsung dikirim (tanpa polling ke DB).
+# - Tiap pelanggan punya antrian sendiri dengan kapasitas terbatas
+# - Pelanggan yang lambat: event paling lama dibuang (yang penting data terbaru)
+# - Broker milik 1 proses: browser hanya menerima data yang masuk ke worker yang sama,
+#   jadi API harus jalan dengan 1 worker (lihat WEB_CONCURRENCY di main.py)
+# ==========================================
+
+SUBSCRIBERS = Gauge("live_stream_subscribers", "Jumlah koneksi dashboard yang sedang berlangganan")
+EVENTS_SENT = Counter("live_stream_events_total", "Jumlah event yang dikirim ke antrian pelanggan")
+EVENTS_DROPPED = Counter("live_stream_events_dropped_total", "Jumlah event yang dibuang karena pelanggan lambat")
+
+
+class Langganan:
+    def __init__(self, tanaman_ids, max_queue):
+        # tanaman_ids kosong / None -> terima data semua tanaman
+        self.tanaman_ids = set(tanaman_ids) if tanaman_ids else None
+        self.queue = asyncio.Queue(maxsize=max_queue)
+
+    def mau(self, event):
+        tanaman_id = event["data"].get("tanaman_id")
+        return tanaman_id is None or self.tanaman_ids is None or tanaman_id in self.tanaman_ids
+
+
+class LiveBroker:
+    def __init__(self, max_queue=50, max_subscribers=200):
+        """
+        max_queue      : jumlah event yang boleh menumpuk per pelanggan
+        max_subscribers: batas jumlah koneksi dashboard sekaligus
+        """
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._subs = set()
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def attach_loop(self, loop):
+        # Dipanggil saat startup: publish dari thread endpoint sync diteruskan ke loop ini
+        self._loop = loop
+
+    def subscribe(self, tanaman_ids=None):
+        """Output: Langganan, atau None kalau jumlah pelanggan sudah penuh."""
+        with self._lock:
+            if len(self._subs) >= self.max_subscribers:
+                return None
+            sub = Langganan(tanaman_ids, self.max_queue)
+            self._subs.add(sub)
+            SUBSCRIBERS.set(len(self._subs))
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+            SUBSCRIBERS.set(len(self._subs))
+
+    def publish(self, jenis, data):
+        """
+        Kirim event ke semua pelanggan yang cocok. Aman dipanggil dari thread mana pun
+        (endpoint sync berjalan di threadpool, bukan di event loop).
+        """
+        if self._loop is None or not self._subs:
+            return
+        event = {"event": jenis, "data": data}
+        try:
+            self._loop.call_soon_threadsafe(self._sebarkan, event)
+        except RuntimeError:
+            # Loop sudah ditutup (API sedang mati)
+            pass
+
+    def _sebarkan(self, event):
+        # Berjalan di event loop
+        with self._lock:
+            subs = [sub for sub in self._subs if sub.mau(event)]
+        for sub in subs:
+            if sub.queue.full():
+                sub.queue.get_nowait()
+                EVENTS_DROPPED.inc(event=event["event"])
+            sub.queue.put_nowait(event)
+            EVENTS_SENT.inc(event=event["event"])
+
+
+def format_sse(event):
+    # Format teks Server-Sent Events: "event: <jenis>\ndata: <json>\n\n"
+    data = json.dumps(event["data"], default=str)
+    return f"event: {event['event']}\ndata: {data}\n\n"
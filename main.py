@@ -1,13 +1,31 @@
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException
+from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Response, BackgroundTasks, Request, Query, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from database import engine, get_db
-from typing import List
+from database import engine, get_db, get_async_db, AsyncDB, SessionLocal, async_engine
+from typing import List, Optional, Union
 import models
 import schemas
-from ai_engine import LeafDiseaseDetector
-import shutil
+from inference_pool import InferencePool, PoolPenuh
+from detection_jobs import JobStore
+from prediction_cache import PredictionCache
+from ingest_buffer import WriteBehindBuffer
+from state_cache import LatestStateCache
+from rollup import RollupJob, index_kurang, siapkan_tabel
+from live_stream import LiveBroker, format_sse
+from control_state import buat_control_state
+from rekomendasi_cache import RekomendasiCache
+from deadband import DeadbandFilter, parse_ambang_per_tanaman
+from profil_deteksi import PROFIL_DETEKSI, PROFIL_DEFAULT, punya_kolom
+import timeseries
+import tangki
+from metrics import render_metrics
+from image_store import ImageStore
+from instrumentasi import MetricsMiddleware, pasang_timer_db, DETECTION_STAGE, INGEST_READINGS
+import asyncio
 import os
 import json
 import warnings
@@ -29,131 +47,502 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Durasi & jumlah request per route, durasi query DB (semua tampil di /metrics)
+app.add_middleware(MetricsMiddleware)
+pasang_timer_db(engine)
+if async_engine is not None:
+    pasang_timer_db(async_engine.sync_engine)
+
 os.makedirs("static/images", exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# 3. Load AI Engine
+# 3. Konfigurasi Worker Pool AI (bisa diubah lewat environment variable)
+# - INFERENCE_POOL_MODE : "thread" atau "process"
+# - INFERENCE_WORKERS   : jumlah gambar yang diproses bersamaan
+# - INFERENCE_QUEUE_SIZE: jumlah gambar yang boleh antri, sisanya dibalas 503
+# - INFERENCE_RETRY_AFTER: saran jeda (detik) di header Retry-After
+INFERENCE_POOL_MODE = os.getenv("INFERENCE_POOL_MODE", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "4"))
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", "5"))
+MAX_BATCH_IMAGES = int(os.getenv("MAX_BATCH_IMAGES", "50"))
+# DETECT_EARLY_EXIT=1: /iot/detect-disease memakai mode cepat (early exit) kalau request tidak memilih
+DETECT_EARLY_EXIT = os.getenv("DETECT_EARLY_EXIT", "0") == "1"
+# DETECT_PROFILE: profil deteksi default (fast / standard / accurate, lihat profil_deteksi.py)
+DETECT_PROFILE = os.getenv("DETECT_PROFILE", PROFIL_DEFAULT)
+# Diisi saat startup: True kalau penyakit_daun sudah punya kolom profil_deteksi.
+# Belum ada -> hasil deteksi tetap disimpan, hanya profilnya tidak dicatat.
+SIMPAN_PROFIL_DETEKSI = False
+
+# Cache hasil deteksi untuk gambar kembar (kamera posisi tetap)
+# - PREDICTION_CACHE_SIZE / PREDICTION_CACHE_TTL : jumlah entri & umur (detik)
+# - PREDICTION_CACHE_PHASH=1 : cocokkan juga frame yang nyaris sama (dHash)
+# - PREDICTION_CACHE_PHASH_DISTANCE : beda bit dHash maksimal
+# Model AI dimuat sekali saat startup: setelah mengganti file di ai_models/, restart API
+# (model di worker pool & cache hasil ikut diperbarui).
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "256"))
+PREDICTION_CACHE_TTL = int(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+PREDICTION_CACHE_PHASH = os.getenv("PREDICTION_CACHE_PHASH", "0") == "1"
+PREDICTION_CACHE_PHASH_DISTANCE = int(os.getenv("PREDICTION_CACHE_PHASH_DISTANCE", "4"))
+
+# State berikut hanya hidup di memori 1 proses, TIDAK dibagi antar worker uvicorn / gunicorn.
+# Dengan WEB_CONCURRENCY > 1 tiap worker punya salinan sendiri (dashboard bisa basi,
+# job async dari worker A tidak ditemukan di worker B), jadi API harus jalan dengan 1 worker.
+# (status kontrol manual & job rollup sudah aman: disimpan di DB / memakai lease)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+STATE_PER_PROSES = [
+    "cache kondisi terkini (/web/dashboard-metrics, /web/tank-levels)",
+    "job deteksi async (/iot/detect-disease/jobs)",
+    "pelanggan SSE (/web/stream hanya menerima data yang masuk ke worker yang sama)",
+    "deadband log kelembapan (patokan nilai terakhir ditulis berbeda per worker)",
+]
+
+def _peringatan_multi_worker(jumlah_worker):
+    """Output: teks peringatan kalau API dijalankan dengan lebih dari 1 worker, None kalau aman."""
+    if jumlah_worker <= 1:
+        return None
+    return (f"⚠️ WARNING: WEB_CONCURRENCY={jumlah_worker}, padahal state ini hanya ada di memori tiap worker: "
+            f"{'; '.join(STATE_PER_PROSES)}. Jalankan API dengan 1 worker.")
+
+# 4. Load AI Engine
 ai_engine = None
+inference_pool = None
+# AI_LAZY_LOAD=1: model tidak dimuat saat startup, tapi saat request deteksi pertama
+# (replica yang hanya melayani sensor bisa nyala dalam hitungan milidetik)
+AI_LAZY_LOAD = os.getenv("AI_LAZY_LOAD", "0") == "1"
+_ai_lock = asyncio.Lock()
+detection_jobs = JobStore()
+prediction_cache = PredictionCache(
+    max_items=PREDICTION_CACHE_SIZE,
+    ttl_detik=PREDICTION_CACHE_TTL,
+    perceptual=PREDICTION_CACHE_PHASH,
+    jarak_maks=PREDICTION_CACHE_PHASH_DISTANCE,
+)
+_job_tasks = set()  # Simpan referensi task job async supaya tidak dibuang GC
+
+# Cache tabel rekomendasi_zat (dimuat saat startup, dimuat ulang tiap REKOMENDASI_CACHE_TTL detik)
+# ADMIN_TOKEN: kalau diisi, endpoint /admin/* wajib mengirim header X-Admin-Token yang sama
+rekomendasi_cache = RekomendasiCache(SessionLocal, ttl_detik=int(os.getenv("REKOMENDASI_CACHE_TTL", "600")))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 @app.on_event("startup")
 def startup_event():
-    global ai_engine
+    pesan = _peringatan_multi_worker(WEB_CONCURRENCY)
+    if pesan:
+        print(pesan)
+
+    # Tabel riwayat tangki + cek UNIQUE tangki_id di log_tangki (milik Laravel, tidak diubah).
+    # Index belum ada -> API menolak jalan (upsert level tangki tidak mungkin benar tanpanya);
+    # DB belum bisa dihubungi -> cukup peringatan, seperti persiapan tabel lain
+    try:
+        tangki.siapkan_tabel(engine)
+    except RuntimeError:
+        raise
+    except Exception as e:
+        print(f"⚠️ WARNING: Gagal memeriksa tabel tangki. Error: {e}")
+
+    soil_buffer.start()
+
+    try:
+        kontrol_pompa.siapkan(engine)
+    except Exception as e:
+        print(f"⚠️ WARNING: Gagal menyiapkan tabel kontrol pompa. Error: {e}")
+
+    # Tabel rollup (milik FastAPI). Index log_kelembapan milik Laravel: hanya dicek, tidak dibuat
     try:
-        if os.path.exists("ai_models/model_svm.pkl"):
-            ai_engine = LeafDiseaseDetector(model_folder="ai_models")
+        siapkan_tabel(engine)
+        if ROLLUP_ENABLED:
+            rollup_job.start()
+    except Exception as e:
+        print(f"⚠️ WARNING: Gagal menyiapkan rollup log kelembapan. Error: {e}")
+    try:
+        kurang = index_kurang(engine)
+        if kurang:
+            print(f"⚠️ WARNING: Index log_kelembapan belum ada ({', '.join(i.name for i in kurang)}), "
+                  "grafik & rollup jadi lambat. Jalankan migration Laravel-nya atau "
+                  "'python migrasi_index_log_kelembapan.py --jalankan'")
+    except Exception as e:
+        print(f"⚠️ WARNING: Gagal memeriksa index log_kelembapan. Error: {e}")
+
+    # Isi cache kondisi terkini dari DB
+    try:
+        db = SessionLocal()
+        try:
+            jumlah = latest_state.warm(db)
+            print(f"✅ Cache dashboard terisi ({jumlah} tanaman)")
+            # Baris terakhir tiap tanaman = nilai terakhir yang ditulis (patokan deadband)
+            for t_id, soil in latest_state.get_all_soil().items():
+                if soil["waktu"] is not None:
+                    soil_deadband.isi(t_id, soil["kelembapan_tanah"], soil["pompa_on"],
+                                      soil["sumber_perintah"], soil["waktu"])
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"⚠️ WARNING: Gagal mengisi cache dashboard. Error: {e}")
+
+    # Kolom profil_deteksi di penyakit_daun (milik Laravel, tidak diubah di sini)
+    global SIMPAN_PROFIL_DETEKSI
+    try:
+        SIMPAN_PROFIL_DETEKSI = punya_kolom(engine)
+        if not SIMPAN_PROFIL_DETEKSI:
+            print("⚠️ WARNING: Kolom penyakit_daun.profil_deteksi belum ada, profil deteksi tidak dicatat. "
+                  "Jalankan migration Laravel-nya atau 'python migrasi_profil_deteksi.py --jalankan'")
+    except Exception as e:
+        SIMPAN_PROFIL_DETEKSI = False
+        print(f"⚠️ WARNING: Gagal memeriksa kolom profil deteksi. Error: {e}")
+
+    try:
+        jumlah = rekomendasi_cache.muat()
+        print(f"✅ Cache rekomendasi terisi ({jumlah} penyakit)")
+    except Exception as e:
+        print(f"⚠️ WARNING: Gagal mengisi cache rekomendasi. Error: {e}")
+
+    if AI_LAZY_LOAD:
+        print("💤 AI Model akan dimuat saat ada request deteksi pertama")
+    else:
+        _muat_ai()
+
+def _muat_ai():
+    """Load AI Engine + nyalakan worker pool. Output: True kalau AI siap dipakai."""
+    global ai_engine, inference_pool
+    try:
+        if os.path.exists("ai_models/model_svm.pkl") or os.path.exists("ai_models/model_bundle.joblib"):
+            # Import di sini: cv2/sklearn cukup berat, replica yang hanya melayani sensor tidak perlu
+            from ai_engine import LeafDiseaseDetector
+
+            detector = LeafDiseaseDetector(model_folder="ai_models", profil=DETECT_PROFILE)
             print("✅ AI Model Loaded Successfully!")
+
+            pool = InferencePool(
+                model_folder="ai_models",
+                mode=INFERENCE_POOL_MODE,
+                workers=INFERENCE_WORKERS,
+                max_queue=INFERENCE_QUEUE_SIZE,
+            )
+            pool.start(detector)
+            ai_engine, inference_pool = detector, pool
+            return True
         else:
             print("⚠️ WARNING: Model tidak ditemukan.")
     except Exception as e:
         print(f"⚠️ WARNING: Gagal load AI Model. Error: {e}")
+    return False
+
+async def _pastikan_ai():
+    # Mode lazy: request deteksi pertama yang memuat model (request lain menunggu di lock)
+    if ai_engine and inference_pool:
+        return True
+    if not AI_LAZY_LOAD:
+        return False
+    async with _ai_lock:
+        if not (ai_engine and inference_pool):
+            await run_in_threadpool(_muat_ai)
+    return bool(ai_engine and inference_pool)
+
+@app.on_event("startup")
+async def startup_stream():
+    # Event dari endpoint sync (threadpool) diteruskan ke event loop ini
+    live_broker.attach_loop(asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+def shutdown_event():
+    # Kuras sisa log sensor ke database sebelum mati
+    soil_buffer.stop()
+    rollup_job.stop()
+    if inference_pool:
+        inference_pool.shutdown()
+    kontrol_pompa.close()
+
+@app.on_event("shutdown")
+async def shutdown_async_db():
+    if async_engine is not None:
+        await async_engine.dispose()
+
+# Status mode manual pompa (per tanaman), dipakai bersama semua worker uvicorn
+# - CONTROL_STATE_BACKEND : "memory" (1 worker), "sqlite" (banyak worker, 1 server), "database" (banyak server)
+# - CONTROL_STATE_PATH    : lokasi file untuk backend sqlite
+# - CONTROL_STATE_CACHE_TTL: umur cache (detik) untuk backend database
+kontrol_pompa = buat_control_state(
+    os.getenv("CONTROL_STATE_BACKEND", "memory"),
+    session_factory=SessionLocal,
+    path=os.getenv("CONTROL_STATE_PATH", "control_state.db"),
+    cache_detik=float(os.getenv("CONTROL_STATE_CACHE_TTL", "1.0")),
+)
+MAX_SOIL_BATCH = int(os.getenv("MAX_SOIL_BATCH", "1000"))
+
+# Deadband log kelembapan: baris baru hanya kalau nilai / pompa berubah atau heartbeat lewat
+# - SOIL_DEADBAND         : selisih kelembapan (%) minimal untuk ditulis (0 = semua laporan ditulis)
+# - SOIL_DEADBAND_TANAMAN : ambang khusus per tanaman, format "1:0.5,3:2"
+# - SOIL_HEARTBEAT        : jarak maksimal antar baris (detik) walaupun nilainya tetap
+soil_deadband = DeadbandFilter(
+    ambang=float(os.getenv("SOIL_DEADBAND", "0")),
+    heartbeat_detik=float(os.getenv("SOIL_HEARTBEAT", "300")),
+    ambang_per_tanaman=parse_ambang_per_tanaman(os.getenv("SOIL_DEADBAND_TANAMAN", "")),
+)
+
+# Tangki air (bisa banyak, dibedakan tangki_id; lihat tangki.py)
+# - TANK_CONFIG          : geometri per tangki "id:tinggi_cm[:offset_cm[:kapasitas_liter]]",
+#                          dipisah koma, misal "1:100,2:150:5:2000" (default 1 tangki 100 cm)
+# - TANK_HISTORY_SECONDS : simpan riwayat level tiap sekian detik per tangki (0 = tanpa riwayat)
+registri_tangki = tangki.RegistriTangki(
+    tangki.parse_konfigurasi_tangki(os.getenv("TANK_CONFIG", tangki.TANGKI_DEFAULT)),
+    riwayat_detik=float(os.getenv("TANK_HISTORY_SECONDS", "0")),
+)
 
-# Global Variable
-MANUAL_WATERING_ON = False
+# Kondisi terkini tiap tanaman & tangki (untuk dashboard, tanpa query DB)
+latest_state = LatestStateCache()
+
+# Push data terkini ke dashboard (Server-Sent Events di /web/stream)
+# - STREAM_QUEUE_SIZE : event yang boleh menumpuk per browser (lebih dari itu, yang lama dibuang)
+# - STREAM_MAX_CLIENTS: batas koneksi dashboard sekaligus
+# - STREAM_HEARTBEAT  : kirim ping tiap sekian detik supaya koneksi tidak diputus proxy
+STREAM_HEARTBEAT = float(os.getenv("STREAM_HEARTBEAT", "15"))
+live_broker = LiveBroker(
+    max_queue=int(os.getenv("STREAM_QUEUE_SIZE", "50")),
+    max_subscribers=int(os.getenv("STREAM_MAX_CLIENTS", "200")),
+)
+
+def _data_soil(tanaman_id, soil):
+    return {
+        "tanaman_id": tanaman_id,
+        "kelembapan_tanah": soil["kelembapan_tanah"],
+        "pompa_on": soil["pompa_on"],
+        "sumber_perintah": soil["sumber_perintah"],
+        "waktu": soil["waktu"],
+    }
+
+def _publish_soil(tanaman_id):
+    # Kirim kondisi terkini (dari cache, jadi data kiriman ulang yang lebih tua tidak menimpa)
+    soil = latest_state.get_soil(tanaman_id)
+    if soil:
+        live_broker.publish("soil", _data_soil(tanaman_id, soil))
+
+def _publish_tank(tangki_id):
+    tank = latest_state.get_tank(tangki_id)
+    if tank:
+        live_broker.publish("tank", {"tangki_id": tangki_id, **tank})
+
+# Buffer tulis untuk log kelembapan (banyak probe lapor tiap beberapa detik)
+# - SOIL_BUFFER_FLUSH_ROWS    : tulis ke DB kalau buffer sudah berisi sekian baris
+# - SOIL_BUFFER_FLUSH_INTERVAL: tulis ke DB paling lambat tiap sekian detik
+# - SOIL_BUFFER_MAX_ROWS      : kapasitas buffer kalau DB sedang macet
+soil_buffer = WriteBehindBuffer(
+    SessionLocal,
+    models.LogKelembapan,
+    nama="soil_log",
+    flush_rows=int(os.getenv("SOIL_BUFFER_FLUSH_ROWS", "200")),
+    flush_interval=float(os.getenv("SOIL_BUFFER_FLUSH_INTERVAL", "1.0")),
+    max_rows=int(os.getenv("SOIL_BUFFER_MAX_ROWS", "10000")),
+)
+
+# Rollup log kelembapan (menit/jam/hari) + retensi data lama
+# - ROLLUP_ENABLED=0       : matikan job di proses ini (banyak worker aman: hanya 1 yang memegang lease)
+# - ROLLUP_INTERVAL        : jeda antar putaran (detik)
+# - ROLLUP_LOOKBACK        : rentang (detik) yang dihitung ulang tiap putaran untuk data yang telat
+# - RETENSI_MENTAH_HARI / RETENSI_MENIT_HARI / RETENSI_JAM_HARI : masa simpan (0 = selamanya)
+#   Data mentah default disimpan selamanya; isi RETENSI_MENTAH_HARI hanya kalau data
+#   lama memang boleh DIHAPUS PERMANEN (tidak diarsipkan, hanya ringkasannya yang tersisa)
+ROLLUP_ENABLED = os.getenv("ROLLUP_ENABLED", "1") == "1"
+rollup_job = RollupJob(
+    SessionLocal,
+    interval=float(os.getenv("ROLLUP_INTERVAL", "60")),
+    lookback=int(os.getenv("ROLLUP_LOOKBACK", "3600")),
+    retensi_mentah_hari=int(os.getenv("RETENSI_MENTAH_HARI", "0")),
+    retensi_menit_hari=int(os.getenv("RETENSI_MENIT_HARI", "90")),
+    retensi_jam_hari=int(os.getenv("RETENSI_JAM_HARI", "730")),
+)
 
 # ==========================================
 # 1. ENDPOINT: IOT SENSOR KELEMBAPAN TANAH (Mode: LOG HISTORY)
 # ==========================================
-@app.post("/iot/soil-data", response_model=schemas.IotResponse)
-def receive_soil_data(
-    data: schemas.SoilDataInput, 
-    db: Session = Depends(get_db)
-):
-    global MANUAL_WATERING_ON
-    
-    t_id = data.tanaman_id
-    mois = data.moisture
-    
+def _tentukan_pompa(tanaman_id, mois, verbose=True):
+    """
+    Logika Kontrol Pompa (dipakai endpoint tunggal & batch).
+    < 50% -> NYALA, > 70% -> MATI (sekaligus mematikan mode manual tanaman ini).
+    Output: (pump_status, sumber_perintah)
+    """
     pump_status = False
     trigger = "AUTO"
 
-    # --- 1. Logika Kontrol Pompa ---
     if mois < 50.0:
         pump_status = True
-        print(f"🌱 [AUTO] Kering ({mois}%), Pompa NYALA.")
+        if verbose: print(f"🌱 [AUTO] Kering ({mois}%), Pompa NYALA.")
     elif mois > 70.0:
         pump_status = False
-        print(f"💧 [AUTO] Basah ({mois}%), Pompa MATI.")
-        if MANUAL_WATERING_ON: 
-            MANUAL_WATERING_ON = False 
+        if verbose: print(f"💧 [AUTO] Basah ({mois}%), Pompa MATI.")
+        # Gagal menulis (DB mati) tidak boleh membuat IoT kehilangan perintah pompa
+        try:
+            kontrol_pompa.matikan_manual(tanaman_id)
+        except Exception as e:
+            print(f"⚠️ WARNING: Gagal mematikan mode manual tanaman {tanaman_id}. Error: {e}")
     
-    if MANUAL_WATERING_ON:
+    if kontrol_pompa.is_manual(tanaman_id):
         pump_status = True
         trigger = "MANUAL"
 
-    # --- 2. LOGIKA DATABASE (UBAH JADI INSERT HISTORY) ---
-    try:
-        # Kita TIDAK LAGI mengecek data lama (update).
-        # Kita LANGSUNG membuat data baru setiap kali sensor melapor.
-        new_log = models.LogKelembapan(
-            tanaman_id=t_id,
-            kelembapan_tanah=mois,
-            pompa_on=pump_status,
-            sumber_perintah=trigger
-            # created_at akan otomatis diisi jam sekarang oleh Database
-        )
-        
-        db.add(new_log)
-        db.commit()
-        db.refresh(new_log) # Ambil ID baru yang terbentuk
-        
-        print(f"📝 History Baru Tersimpan: ID {new_log.id} | {mois}% | Pompa: {pump_status}")
-            
-    except Exception as e:
-        print(f"❌ Error DB: {e}")
-        db.rollback()
+    return pump_status, trigger
+
+@app.post("/iot/soil-data", response_model=schemas.IotResponse)
+def receive_soil_data(data: schemas.SoilDataInput):
+    t_id = data.tanaman_id
+    mois = data.moisture
+
+    # --- 1. Logika Kontrol Pompa ---
+    pump_status, trigger = _tentukan_pompa(t_id, mois)
+
+    # --- 2. LOGIKA DATABASE (INSERT HISTORY lewat BUFFER) ---
+    # Laporan jadi baris history baru kalau lolos deadband (nilai/pompa berubah
+    # atau heartbeat lewat), lalu ditulis ke DB secara berkelompok oleh soil_buffer.
+    # Keputusan pompa langsung dibalas. created_at = jam laporan masuk (bukan jam flush ke DB).
+    sekarang = datetime.now()
+    tulis = soil_deadband.perlu_tulis(t_id, mois, pump_status, trigger, sekarang)
+    masuk = tulis and soil_buffer.add({
+        "tanaman_id": t_id,
+        "kelembapan_tanah": mois,
+        "pompa_on": pump_status,
+        "sumber_perintah": trigger,
+        "created_at": sekarang,
+        "updated_at": sekarang,
+    })
+
+    latest_state.update_soil(t_id, mois, pump_status, trigger, sekarang)
+    _publish_soil(t_id)
+    INGEST_READINGS.inc(endpoint="soil-data")
+
+    if not tulis:
+        print(f"⏭️ Dalam deadband, tidak ditulis: Tanaman {t_id} | {mois}%")
+    elif masuk:
+        print(f"📝 History Masuk Buffer: Tanaman {t_id} | {mois}% | Pompa: {pump_status}")
+    else:
+        soil_deadband.lupakan(t_id)
+        print(f"❌ Buffer penuh / data tidak valid, history tanaman {t_id} dibuang")
     
     return {"status": "success", "pump": "ON" if pump_status else "OFF"}
 
+# ==========================================
+# 1b. ENDPOINT: IOT SENSOR KELEMBAPAN TANAH (BANYAK DATA SEKALIGUS)
+# ==========================================
+def _ke_waktu_lokal(waktu):
+    # Timestamp dari perangkat bisa membawa zona waktu (misal "...Z"),
+    # sedangkan kolom DB menyimpan jam lokal server tanpa zona
+    if waktu.tzinfo is not None:
+        return waktu.astimezone().replace(tzinfo=None)
+    return waktu
+
+def _proses_batch_soil(urut, sekarang):
+    """
+    Keputusan pompa + cache + deadband untuk data batch yang sudah urut waktu.
+    Fungsi sync biasa (I/O kontrol pompa) -> dipanggil lewat threadpool.
+    Output: (baris yang perlu ditulis, {tanaman_id: "ON"/"OFF"} dari data paling baru)
+    """
+    rows = []
+    perintah = {}
+    for waktu, r in urut:
+        pump_status, trigger = _tentukan_pompa(r.tanaman_id, r.moisture, verbose=False)
+        perintah[r.tanaman_id] = "ON" if pump_status else "OFF"
+        latest_state.update_soil(r.tanaman_id, r.moisture, pump_status, trigger, waktu)
+        # Hanya data yang lolos deadband yang jadi baris baru
+        if not soil_deadband.perlu_tulis(r.tanaman_id, r.moisture, pump_status, trigger, waktu):
+            continue
+        rows.append({
+            "tanaman_id": r.tanaman_id,
+            "kelembapan_tanah": r.moisture,
+            "pompa_on": pump_status,
+            "sumber_perintah": trigger,
+            "created_at": waktu,
+            "updated_at": sekarang,
+        })
+    return rows, perintah
+
+@app.post("/iot/soil-data/batch", response_model=schemas.SoilBatchResponse)
+async def receive_soil_data_batch(
+    readings: List[schemas.SoilReadingInput],
+    db: AsyncDB = Depends(get_async_db)
+):
+    """
+    IoT Mengirim JSON array (boleh campur beberapa tanaman):
+    [{"tanaman_id": 1, "moisture": 45.2, "timestamp": "2025-12-01T10:00:00"}, ...]
+    Semua data disimpan dengan 1 INSERT, balasan berisi perintah pompa per tanaman
+    (berdasarkan data paling baru tiap tanaman).
+    """
+    if len(readings) > MAX_SOIL_BATCH:
+        raise HTTPException(status_code=422, detail=f"Maksimal {MAX_SOIL_BATCH} data per kiriman")
+
+    sekarang = datetime.now()
+    urut = sorted(
+        ((_ke_waktu_lokal(r.timestamp) if r.timestamp else sekarang, r) for r in readings),
+        key=lambda item: item[0],
+    )
+
+    # --- 1. Logika Kontrol Pompa (diproses urut waktu, sama seperti laporan satu per satu) ---
+    # Status manual dibaca dari backend kontrol pompa (file SQLite / DB) tiap data,
+    # jadi dijalankan di threadpool supaya event loop tidak ikut menunggu I/O-nya
+    rows, perintah = await run_in_threadpool(_proses_batch_soil, urut, sekarang)
+
+    for t_id in perintah:
+        _publish_soil(t_id)
+    INGEST_READINGS.inc(len(readings), endpoint="soil-data-batch")
+
+    # --- 2. LOGIKA DATABASE (1 INSERT MULTI-BARIS) ---
+    status = "success"
+    tersimpan = 0
+    if rows:
+        try:
+            await db.execute(insert(models.LogKelembapan).values(rows))
+            await db.commit()
+            tersimpan = len(rows)
+            print(f"📝 Batch Sensor Tersimpan: {tersimpan} data | {len(perintah)} tanaman")
+        except Exception as e:
+            # Perangkat tetap dapat perintah pompa, tapi tahu datanya harus dikirim ulang
+            print(f"❌ Error DB (batch sensor): {e}")
+            await db.rollback()
+            status = "db_error"
+            for t_id in {row["tanaman_id"] for row in rows}:
+                soil_deadband.lupakan(t_id)
+
+    return {"status": status, "tersimpan": tersimpan, "dilewati": len(readings) - len(rows), "pump": perintah}
+
 # ==========================================
 # 2. ENDPOINT: IOT ULTRASONIK TANGKI AIR (Mode: Water Level)
 # ==========================================
 @app.post("/iot/water-level", response_model=schemas.IotResponse)
-def receive_tank_data(
+async def receive_tank_data(
     data: schemas.TankDataInput, 
-    db: Session = Depends(get_db)
+    db: AsyncDB = Depends(get_async_db)
 ):
     """
-    IoT Mengirim JSON: {"distance_cm": 20.5}
-    Logika: Cek data tangki. Jika ada -> Update. Jika belum -> Insert.
+    IoT Mengirim JSON: {"distance_cm": 20.5, "tangki_id": 2} (tanpa tangki_id = tangki 1)
+    Logika: 1 statement upsert ke baris tangki ini di log_tangki (tanpa SELECT dulu),
+    plus 1 baris riwayat kalau sudah waktunya (TANK_HISTORY_SECONDS).
     """
-    TINGGI_TANGKI_CM = 100.0 
-    
-    dist = data.distance_cm
-    water_level_cm = TINGGI_TANGKI_CM - dist
-    if water_level_cm < 0: water_level_cm = 0 
-    
-    persen = (water_level_cm / TINGGI_TANGKI_CM) * 100
+    t_id = data.tangki_id
+    level = registri_tangki.hitung(t_id, data.distance_cm)
+    if level is None:
+        raise HTTPException(status_code=422, detail=f"Tangki {t_id} belum terdaftar di TANK_CONFIG")
+    water_level_cm, persen, _ = level
+
+    sekarang = datetime.now()
+    latest_state.update_tank(water_level_cm, persen, sekarang, t_id)
+    _publish_tank(t_id)
+    INGEST_READINGS.inc(endpoint="water-level")
     
-    # --- LOGIKA DATABASE (UPDATE OR INSERT) ---
+    # --- LOGIKA DATABASE (UPSERT) ---
+    riwayat = registri_tangki.perlu_riwayat(t_id, sekarang)
     try:
-        # 1. Ambil data pertama yang ada di tabel log_tangki
-        # Karena asumsinya cuma ada 1 tangki, kita pakai .first() saja
-        existing_data = db.query(models.LogTangki).first()
-        
-        if existing_data:
-            # === SKENARIO A: UPDATE (Data Sudah Ada) ===
-            existing_data.ketinggian_air = water_level_cm
-            existing_data.persentase_isi = persen
-            
-            # Update waktu agar Web tahu ini data baru
-            from sqlalchemy.sql import func
-            existing_data.updated_at = func.now()
-            
-            db.commit()
-            print(f"🛢️ Update Tangki -> {persen:.1f}%")
-            
-        else:
-            # === SKENARIO B: INSERT (Data Belum Ada/Kosong) ===
-            new_log = models.LogTangki(
-                ketinggian_air=water_level_cm,
-                persentase_isi=persen
-            )
-            db.add(new_log)
-            db.commit()
-            print(f"✨ Data Baru Tangki -> {persen:.1f}%")
+        await db.execute(tangki.upsert_level(engine.dialect.name, t_id, water_level_cm, persen, sekarang))
+        if riwayat:
+            await db.execute(tangki.insert_riwayat(t_id, water_level_cm, persen, sekarang))
+        await db.commit()
+        tangki.UPSERT_TOTAL.inc()
+        if riwayat:
+            tangki.RIWAYAT_TOTAL.inc()
+        print(f"🛢️ Update Tangki {t_id} -> {persen:.1f}%")
             
     except Exception as e:
         print(f"❌ Error DB Tangki: {e}")
-        db.rollback()
+        await db.rollback()
+        if riwayat:
+            registri_tangki.lupakan_riwayat(t_id)
     
     return {"status": "recorded", "level_percent": persen}
 
@@ -166,86 +555,368 @@ PYTHON_FOLDER = "static/images"
 # 2. Folder untuk Laravel (Agar Web bisa akses)
 # GANTI path ini sesuai lokasi project Laravel di laptop Anda!
 # Contoh: "C:/xampp/htdocs/sabi-project/storage/app/public/penyakit_daun"
-LARAVEL_FOLDER = "/home/ipul/Project/web/storage/app/public/penyakit_daun"
+# (bisa juga lewat environment variable LARAVEL_FOLDER)
+LARAVEL_FOLDER = os.getenv("LARAVEL_FOLDER", "/home/ipul/Project/web/storage/app/public/penyakit_daun")
 
-# Buat folder otomatis jika belum ada
-os.makedirs(PYTHON_FOLDER, exist_ok=True)
-os.makedirs(LARAVEL_FOLDER, exist_ok=True)
+# 3. Penyimpanan gambar (nama file = hash isi, ditulis sekali, folder dibuat otomatis)
+# - IMAGE_STORE_MODE : cara membagikan ke folder Laravel: hardlink / symlink / shared / copy
+# - THUMBNAIL_SIZE   : sisi terpanjang thumbnail di <folder>/thumbs (0 = tanpa thumbnail)
+# - THUMBNAIL_QUALITY: kualitas JPEG thumbnail
+image_store = ImageStore(
+    PYTHON_FOLDER,
+    LARAVEL_FOLDER,
+    mode=os.getenv("IMAGE_STORE_MODE", "hardlink"),
+    thumbnail_size=int(os.getenv("THUMBNAIL_SIZE", "256")),
+    thumbnail_quality=int(os.getenv("THUMBNAIL_QUALITY", "70")),
+)
 
 
 # ==========================================
 # 3. ENDPOINT: DETEKSI PENYAKIT (MODIFIKASI)
 # ==========================================
-@app.post("/iot/detect-disease", response_model=schemas.DiseaseResponse)
-async def detect_disease(
-    tanaman_id: int, 
-    file: UploadFile = File(...), 
-    db: Session = Depends(get_db)
-):
-    if not ai_engine:
-        raise HTTPException(status_code=500, detail="AI Engine belum siap")
+def _antrian_penuh():
+    # 503 + Retry-After: kamera/IoT cukup kirim ulang beberapa detik lagi
+    return HTTPException(
+        status_code=503,
+        detail="Antrian deteksi penuh, coba lagi nanti",
+        headers={"Retry-After": str(INFERENCE_RETRY_AFTER)},
+    )
 
-    # A. Simpan Gambar (DUAL STORAGE)
-    waktu_sekarang = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{waktu_sekarang}_tanaman{tanaman_id}.jpg" 
-    
-    # [UBAH 1] Tentukan dua lokasi penyimpanan
-    path_python = os.path.join(PYTHON_FOLDER, filename)
-    path_laravel = os.path.join(LARAVEL_FOLDER, filename)
-    
-    # Simpan fisik file
+def _simpan_gambar(data, filename):
+    """
+    Simpan isi upload (bytes yang sudah ada di memori) 1x ke folder Python,
+    dibagikan ke folder Laravel (hardlink/symlink), lalu buat thumbnail.
+    Dijalankan sebagai BackgroundTask -> setelah balasan terkirim ke perangkat.
+    """
     try:
-        # 1. Simpan ke folder Python dulu
-        with open(path_python, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # [UBAH 2] Copy file dari Python ke folder Laravel
-        shutil.copy(path_python, path_laravel)
-        print(f"✅ Gambar tersimpan di Laravel: {path_laravel}")
-
+        with DETECTION_STAGE.time(tahap="simpan_file"):
+            path = image_store.simpan(data, filename)
+        with DETECTION_STAGE.time(tahap="thumbnail"):
+            image_store.buat_thumbnail(data, filename)
+        print(f"✅ Gambar tersimpan: {path} ({image_store.mode})")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Gagal simpan gambar: {e}")
+        print(f"❌ Gagal simpan gambar {filename}: {e}")
 
-    # B. Prediksi Menggunakan AI Engine
-    print(f"🔍 Analisa: {filename} ...")
-    # [UBAH 3] AI membaca file dari folder Python
-    hasil_ai = ai_engine.predict_image(path_python)
-    
+def _baris_penyakit(tanaman_id, filename, hasil_ai, rekomendasi_id):
+    """
+    Nilai 1 baris penyakit_daun. Ditulis dengan insert() biasa (bukan objek ORM), supaya
+    kolom profil_deteksi benar-benar tidak ikut INSERT kalau kolomnya belum ada di tabel.
+    """
+    nilai = {
+        "tanaman_id": tanaman_id,
+        "user_id": 1,
+        "gambar": filename, # [UBAH 4] Simpan NAMA FILE saja (bukan path lengkap)
+        "hasil_deteksi": hasil_ai["dominan"],
+        "tingkat_keyakinan": hasil_ai["confidence"],
+        "detail_persentase": json.dumps(hasil_ai["detail"]),
+        "rekomendasi_id": rekomendasi_id,
+    }
+    if SIMPAN_PROFIL_DETEKSI:
+        nilai["profil_deteksi"] = hasil_ai.get("profil")
+    return nilai
+
+def _simpan_hasil_deteksi(db, tanaman_id, filename, hasil_ai):
+    """
+    Cari rekomendasi + simpan baris PenyakitDaun.
+    Fungsi sync biasa -> dipanggil lewat threadpool supaya tidak memblokir event loop.
+    """
     nama_penyakit = hasil_ai["dominan"]
-    confidence = hasil_ai["confidence"]
-    detail_json = json.dumps(hasil_ai["detail"])
 
-    # C. LOGIKA PENCARIAN ID (Tetap sama)
-    rekomendasi_item = db.query(models.RekomendasiZat)\
-                         .filter(models.RekomendasiZat.nama_penyakit == nama_penyakit)\
-                         .first()
+    # C. LOGIKA PENCARIAN ID (dari cache rekomendasi, tanpa query)
+    rekomendasi_item = rekomendasi_cache.get(nama_penyakit)
     
-    rekomendasi_id = rekomendasi_item.id if rekomendasi_item else None
-    rekomendasi_text = rekomendasi_item.rekomendasi if rekomendasi_item else "Tidak ada tindakan khusus"
+    rekomendasi_id = rekomendasi_item["id"] if rekomendasi_item else None
+    rekomendasi_text = rekomendasi_item["rekomendasi"] if rekomendasi_item else "Tidak ada tindakan khusus"
 
     # D. Simpan ke Database
     try:
-        new_disease = models.PenyakitDaun(
-            tanaman_id=tanaman_id,
-            user_id=1, 
-            gambar=filename, # [UBAH 4] Simpan NAMA FILE saja (bukan path lengkap)
-            hasil_deteksi=nama_penyakit,
-            tingkat_keyakinan=confidence,
-            detail_persentase=detail_json,
-            rekomendasi_id=rekomendasi_id
-        )
-        db.add(new_disease)
-        db.commit()
+        with DETECTION_STAGE.time(tahap="simpan_db"):
+            db.execute(insert(models.PenyakitDaun).values(
+                **_baris_penyakit(tanaman_id, filename, hasil_ai, rekomendasi_id)))
+            db.commit()
     except Exception as e:
         print(f"❌ Error Database Penyakit: {e}")
+        db.rollback()
+
+    return rekomendasi_text
+
+async def _submit_prediksi(data, early_exit=False, profil=PROFIL_DEFAULT):
+    """
+    Cek cache dulu; kalau gambar ini (atau kembarannya) sudah pernah dideteksi,
+    hasilnya langsung dipakai tanpa masuk pool. Kalau belum, kirim ke pool
+    dan simpan hasilnya ke cache begitu selesai.
+    Output: awaitable hasil predict_image. Melempar PoolPenuh kalau antrian penuh.
+    """
+    # Hasil tiap profil (dan mode cepat / lengkap) disimpan terpisah di cache
+    varian = f"{profil}-cepat" if early_exit else profil
+    hasil_cache = await run_in_threadpool(prediction_cache.get, data, varian)
+    if hasil_cache is not None:
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(hasil_cache)
+        return future
+
+    task = inference_pool.submit("predict_image", data, early_exit, profil)
+
+    def _simpan_ke_cache(t):
+        # Hash (dan dHash) dihitung di thread lain, bukan di event loop
+        if not t.cancelled() and t.exception() is None and "dominan" in t.result():
+            asyncio.get_running_loop().run_in_executor(None, prediction_cache.put, data, t.result(), varian)
+    task.add_done_callback(_simpan_ke_cache)
+    return task
+
+def _simpan_hasil_deteksi_job(tanaman_id, filename, hasil_ai):
+    # Versi untuk job async: buka Session sendiri (request aslinya sudah selesai)
+    db = SessionLocal()
+    try:
+        return _simpan_hasil_deteksi(db, tanaman_id, filename, hasil_ai)
+    finally:
+        db.close()
+
+async def _selesaikan_job(job_id, task_prediksi, tanaman_id, filename, data):
+    """
+    Jalan di belakang layar setelah job diterima:
+    tunggu hasil AI -> simpan gambar -> cari rekomendasi + simpan PenyakitDaun -> tandai job selesai.
+    Gambar yang tidak terbaca -> job gagal (tidak disimpan ke disk / DB).
+    """
+    try:
+        hasil_ai = await task_prediksi
+        if "dominan" not in hasil_ai:
+            detection_jobs.gagal(job_id, hasil_ai.get("message", "Gambar tidak terbaca"))
+            print(f"❌ Job {job_id} gagal: gambar tidak terbaca")
+            return
+        await run_in_threadpool(_simpan_gambar, data, filename)
+        rekomendasi_text = await run_in_threadpool(_simpan_hasil_deteksi_job, tanaman_id, filename, hasil_ai)
+        detection_jobs.selesai(job_id, {
+            "message": "Deteksi Selesai",
+            "hasil": hasil_ai["dominan"],
+            "confidence": hasil_ai["confidence"],
+            "rekomendasi": rekomendasi_text,
+            "patch_dievaluasi": hasil_ai.get("patch_dievaluasi"),
+            "patch_kandidat": hasil_ai.get("patch_kandidat"),
+            "profil": hasil_ai.get("profil"),
+        })
+        print(f"✅ Job {job_id} selesai. Hasil: {hasil_ai['dominan']}")
+    except Exception as e:
+        print(f"❌ Job {job_id} gagal: {e}")
+        detection_jobs.gagal(job_id, str(e))
+
+def _cek_profil(profil):
+    # Kosong -> profil default (DETECT_PROFILE); nama tidak dikenal -> 422
+    profil = profil or DETECT_PROFILE
+    if profil not in PROFIL_DETEKSI:
+        raise HTTPException(status_code=422, detail=f"profil harus salah satu dari: {', '.join(PROFIL_DETEKSI)}")
+    return profil
+
+@app.get("/iot/detect-disease/profiles")
+def get_detection_profiles():
+    """Daftar profil deteksi + perkiraan waktu per gambar (untuk memilih profil di perangkat)."""
+    return {"default": DETECT_PROFILE, "profil": PROFIL_DETEKSI}
+
+@app.post("/iot/detect-disease", response_model=Union[schemas.DiseaseResponse, schemas.DetectionJobResponse])
+async def detect_disease(
+    tanaman_id: int, 
+    response: Response,
+    background_tasks: BackgroundTasks,
+    mode: str = "sync",
+    early_exit: Optional[bool] = None,
+    profil: Optional[str] = None,
+    file: UploadFile = File(...), 
+    db: Session = Depends(get_db)
+):
+    """
+    mode=sync  (default): tunggu sampai AI selesai, balas DiseaseResponse.
+    mode=async          : gambar masuk antrian, langsung balas job_id (202).
+                          Hasilnya diambil lewat GET /iot/detect-disease/jobs/{job_id}
+    early_exit=true     : mode cepat, voting berhenti begitu penyakit dominan sudah pasti
+                          (kosong -> ikut DETECT_EARLY_EXIT / setelan profil)
+    profil=fast|standard|accurate : resolusi & kerapatan kotak (kosong -> DETECT_PROFILE),
+                          daftar & perkiraan waktunya di GET /iot/detect-disease/profiles
+    Gambar dianalisa langsung dari memori; penyimpanan ke disk jalan setelah balasan terkirim.
+    """
+    if mode not in ("sync", "async"):
+        raise HTTPException(status_code=422, detail="mode harus 'sync' atau 'async'")
+    profil = _cek_profil(profil)
+    if early_exit is None:
+        early_exit = DETECT_EARLY_EXIT or PROFIL_DETEKSI[profil]["early_exit"]
+
+    if not await _pastikan_ai():
+        raise HTTPException(status_code=500, detail="AI Engine belum siap")
+
+    # A. Baca Gambar ke Memori
+    with DETECTION_STAGE.time(tahap="baca_upload"):
+        data = await file.read()
+    if not data:
+        raise HTTPException(status_code=422, detail="File gambar kosong")
+    # Nama file dari hash isi gambar (upload di detik yang sama tidak saling timpa)
+    filename = image_store.nama_file(data)
+
+    # B. Prediksi Menggunakan AI Engine (di worker pool)
+    print(f"🔍 Analisa: {filename} ...")
+    # [UBAH 3] AI langsung decode bytes upload (tanpa tulis-baca disk),
+    # gambar kembar diambil dari cache (baris PenyakitDaun tetap dicatat)
+    try:
+        task_prediksi = await _submit_prediksi(data, early_exit, profil)
+    except PoolPenuh:
+        raise _antrian_penuh()
+
+    # B2. Mode async: sisanya (termasuk simpan file) dikerjakan di belakang, kamera langsung dapat job_id
+    if mode == "async":
+        job_id = detection_jobs.buat(tanaman_id, filename)
+        task = asyncio.create_task(_selesaikan_job(job_id, task_prediksi, tanaman_id, filename, data))
+        _job_tasks.add(task)
+        task.add_done_callback(_job_tasks.discard)
+        response.status_code = 202
+        return {"job_id": job_id, "status": "queued"}
+
+    hasil_ai = await task_prediksi
+    # Bytes upload bisa saja bukan gambar (rusak / format lain) -> AI membalas error
+    if "dominan" not in hasil_ai:
+        raise HTTPException(status_code=422, detail=hasil_ai.get("message", "Gambar tidak terbaca"))
+
+    # Simpan fisik file (DUAL STORAGE) setelah balasan terkirim
+    background_tasks.add_task(_simpan_gambar, data, filename)
+
+    # C & D. Rekomendasi + simpan ke Database (query sync -> threadpool)
+    rekomendasi_text = await run_in_threadpool(_simpan_hasil_deteksi, db, tanaman_id, filename, hasil_ai)
+    nama_penyakit = hasil_ai["dominan"]
 
     print(f"✅ Selesai. Hasil: {nama_penyakit}")
 
     return {
         "message": "Deteksi Selesai",
         "hasil": nama_penyakit,
-        "confidence": confidence,
-        "rekomendasi": rekomendasi_text
+        "confidence": hasil_ai["confidence"],
+        "rekomendasi": rekomendasi_text,
+        "patch_dievaluasi": hasil_ai.get("patch_dievaluasi"),
+        "patch_kandidat": hasil_ai.get("patch_kandidat"),
+        "profil": hasil_ai.get("profil"),
+    }
+
+# ==========================================
+# 3b. ENDPOINT: CEK STATUS JOB DETEKSI (Mode Async)
+# ==========================================
+@app.get("/iot/detect-disease/jobs/{job_id}", response_model=schemas.DetectionJobResponse)
+def get_detection_job(job_id: str):
+    job = detection_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job tidak ditemukan / sudah kadaluarsa")
+
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "hasil": job["hasil"],
+        "error": job["error"],
+    }
+
+# ==========================================
+# 3c. ENDPOINT: DETEKSI PENYAKIT MASSAL (Banyak Gambar Sekaligus)
+# ==========================================
+def _simpan_banyak_gambar(datas, filenames):
+    for data, filename in zip(datas, filenames):
+        _simpan_gambar(data, filename)
+
+def _simpan_hasil_batch(db, tanaman_id, files, filenames, hasil_list):
+    """
+    Rekomendasi dari cache + 1x transaksi untuk semua baris PenyakitDaun.
+    Output: list item hasil per gambar (urutan sama dengan upload)
+    """
+
+    items = []
+    rows = []
+    for upload, filename, hasil_ai in zip(files, filenames, hasil_list):
+        if "dominan" not in hasil_ai:
+            items.append({
+                "nama_asli": upload.filename or filename,
+                "hasil": "Gagal",
+                "confidence": 0.0,
+                "rekomendasi": "-",
+                "error": hasil_ai.get("message", "Gambar tidak terbaca"),
+            })
+            continue
+
+        # C. LOGIKA PENCARIAN ID (dari cache rekomendasi, tanpa query)
+        rekomendasi_item = rekomendasi_cache.get(hasil_ai["dominan"])
+        rows.append(_baris_penyakit(tanaman_id, filename, hasil_ai,
+                                    rekomendasi_item["id"] if rekomendasi_item else None))
+        items.append({
+            "nama_asli": upload.filename or filename,
+            "gambar": filename,
+            "hasil": hasil_ai["dominan"],
+            "confidence": hasil_ai["confidence"],
+            "rekomendasi": rekomendasi_item["rekomendasi"] if rekomendasi_item else "Tidak ada tindakan khusus",
+            "patch_dievaluasi": hasil_ai.get("patch_dievaluasi"),
+            "patch_kandidat": hasil_ai.get("patch_kandidat"),
+            "profil": hasil_ai.get("profil"),
+        })
+
+    # D. Simpan ke Database (1 transaksi)
+    try:
+        with DETECTION_STAGE.time(tahap="simpan_db"):
+            if rows:
+                db.execute(insert(models.PenyakitDaun), rows)
+            db.commit()
+        print(f"📝 {len(rows)} hasil deteksi tersimpan (batch)")
+    except Exception as e:
+        print(f"❌ Error Database Penyakit (batch): {e}")
+        db.rollback()
+
+    return items
+
+@app.post("/iot/detect-disease/batch", response_model=schemas.BatchDiseaseResponse)
+async def detect_disease_batch(
+    tanaman_id: int,
+    background_tasks: BackgroundTasks,
+    profil: Optional[str] = None,
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db)
+):
+    profil = _cek_profil(profil)
+    if not await _pastikan_ai():
+        raise HTTPException(status_code=500, detail="AI Engine belum siap")
+
+    if len(files) > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=422, detail=f"Maksimal {MAX_BATCH_IMAGES} gambar per upload")
+
+    if inference_pool.penuh():
+        raise _antrian_penuh()
+
+    # A. Baca Semua Gambar ke Memori (nama file dari hash isi, gambar kembar = 1 file)
+    with DETECTION_STAGE.time(tahap="baca_upload"):
+        datas = [await upload.read() for upload in files]
+    filenames = [image_store.nama_file(data) for data in datas]
+
+    # B. Prediksi Semua Gambar (1 pekerjaan di pool, SVM dipanggil 1x)
+    print(f"🔍 Analisa batch: {len(files)} gambar tanaman {tanaman_id} ...")
+    try:
+        hasil_list = await inference_pool.run("predict_images", datas, profil)
+    except PoolPenuh:
+        raise _antrian_penuh()
+
+    # Simpan fisik file yang terbaca setelah balasan terkirim
+    terbaca = [i for i, hasil_ai in enumerate(hasil_list) if "dominan" in hasil_ai]
+    background_tasks.add_task(_simpan_banyak_gambar, [datas[i] for i in terbaca], [filenames[i] for i in terbaca])
+
+    # C & D. Rekomendasi + simpan ke Database
+    items = await run_in_threadpool(_simpan_hasil_batch, db, tanaman_id, files, filenames, hasil_list)
+
+    # E. Ringkasan
+    berhasil = [item for item in items if not item.get("error")]
+    ringkasan = {}
+    for item in berhasil:
+        ringkasan[item["hasil"]] = ringkasan.get(item["hasil"], 0) + 1
+    dominan = max(ringkasan, key=ringkasan.get) if ringkasan else "Tidak Terdeteksi"
+    rata_rata = sum(item["confidence"] for item in berhasil) / len(berhasil) if berhasil else 0.0
+
+    print(f"✅ Batch selesai. Dominan: {dominan}")
+
+    return {
+        "message": "Deteksi Batch Selesai",
+        "jumlah_gambar": len(items),
+        "jumlah_berhasil": len(berhasil),
+        "dominan": dominan,
+        "ringkasan": ringkasan,
+        "rata_rata_confidence": round(rata_rata, 2),
+        "hasil": items,
     }
 
 # ==========================================
@@ -255,19 +926,19 @@ async def detect_disease(
 def manual_control(data: schemas.ManualControlInput): # <-- JSON Body
     """
     Web Mengirim JSON: {"action": "on"} atau {"action": "off"}
+    Tambahkan "tanaman_id" untuk 1 tanaman saja, tanpa tanaman_id = semua tanaman.
     """
-    global MANUAL_WATERING_ON
-    
     act = data.action.lower()
+    target = f"Tanaman {data.tanaman_id}" if data.tanaman_id is not None else "Semua Tanaman"
     
     if act == "on":
-        MANUAL_WATERING_ON = True
+        kontrol_pompa.set_manual(data.tanaman_id, True)
         status_msg = "MANUAL_ON"
-        print("🚨 [WEB] Manual Mode ON")
+        print(f"🚨 [WEB] Manual Mode ON ({target})")
     else:
-        MANUAL_WATERING_ON = False
+        kontrol_pompa.set_manual(data.tanaman_id, False)
         status_msg = "AUTO"
-        print("✅ [WEB] Manual Mode OFF")
+        print(f"✅ [WEB] Manual Mode OFF ({target})")
         
     return {"status": "success", "mode": status_msg}
 
@@ -275,33 +946,187 @@ def manual_control(data: schemas.ManualControlInput): # <-- JSON Body
 # 5. ENDPOINT: CHART DATA (List Schema Output)
 # ==========================================
 @app.get("/web/chart-data/{tanaman_id}", response_model=List[schemas.LogKelembapanSchema])
-def get_chart_data(tanaman_id: int, limit: int = 20, db: Session = Depends(get_db)):
-    data = db.query(models.LogKelembapan)\
-             .filter(models.LogKelembapan.tanaman_id == tanaman_id)\
-             .order_by(models.LogKelembapan.created_at.desc())\
-             .limit(limit)\
-             .all()
+async def get_chart_data(tanaman_id: int, limit: int = 20, db: AsyncDB = Depends(get_async_db)):
+    hasil = await db.execute(
+        select(models.LogKelembapan)
+        .filter(models.LogKelembapan.tanaman_id == tanaman_id)
+        .order_by(models.LogKelembapan.created_at.desc())
+        .limit(limit)
+    )
+    data = hasil.scalars().all()
     return data[::-1]
 
+# ==========================================
+# 5b. ENDPOINT: CHART RENTANG PANJANG (Agregasi / Downsampling)
+# ==========================================
+@app.get("/web/chart-series/{tanaman_id}", response_model=schemas.ChartSeriesResponse)
+async def get_chart_series(
+    tanaman_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket_seconds: Optional[int] = Query(None, gt=0),
+    points: int = 200,
+    method: str = "bucket",
+    step: Optional[bool] = None,
+    db: AsyncDB = Depends(get_async_db)
+):
+    """
+    Contoh: /web/chart-series/1?start=2025-12-01T00:00:00&end=2025-12-08T00:00:00&points=300
+    - start/end      : rentang waktu (default: 24 jam terakhir); boleh berzona waktu, diubah ke jam lokal
+    - bucket_seconds : ukuran bucket; kalau kosong dihitung dari rentang / points
+                       (rentang / bucket_seconds maksimal timeseries.MAKS_BUCKET bucket)
+    - method=bucket  : min/avg/max + rasio pompa nyala per bucket (GROUP BY di SQL)
+    - method=lttb    : titik-titik terpilih LTTB, maksimal 'points' titik
+    - step           : bucket kosong diisi nilai terakhir (jumlah = 0), sampai SOIL_HEARTBEAT detik
+                       setelah baris terakhir; kosong -> otomatis nyala kalau deadband aktif
+    """
+    if method not in ("bucket", "lttb"):
+        raise HTTPException(status_code=422, detail="method harus 'bucket' atau 'lttb'")
+    if not 2 <= points <= 5000:
+        raise HTTPException(status_code=422, detail="points harus antara 2 - 5000")
+
+    # Rentang dari browser biasanya UTC ("...Z", hasil toISOString) -> jam lokal tanpa zona seperti kolom DB
+    end = _ke_waktu_lokal(end) if end else datetime.now()
+    start = _ke_waktu_lokal(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="start harus lebih awal dari end")
+
+    if step is None:
+        step = soil_deadband.aktif
+    maks_gap = soil_deadband.heartbeat_detik or None
+
+    if method == "lttb":
+        data = await db.run_sync(timeseries.lttb_series, tanaman_id, start, end, points, step, maks_gap)
+        bucket_seconds = None
+    else:
+        if not bucket_seconds:
+            bucket_seconds = max(1, int(-(-(end - start).total_seconds() // points)))
+            # Bulatkan ke kelipatan menit supaya bisa dibaca dari tabel rollup
+            if bucket_seconds > 60:
+                bucket_seconds = -(-bucket_seconds // 60) * 60
+        try:
+            timeseries.cek_bucket(start, end, bucket_seconds)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        data = await db.run_sync(timeseries.bucket_series, tanaman_id, start, end, bucket_seconds, step, maks_gap)
+
+    return {
+        "tanaman_id": tanaman_id,
+        "start": start,
+        "end": end,
+        "method": method,
+        "bucket_seconds": bucket_seconds,
+        "points": data,
+    }
+
 # ==========================================
 # 6. ENDPOINT KHUSUS DASHBOARD (GABUNGAN)
 # ==========================================
 @app.get("/web/dashboard-metrics")
-def get_dashboard_metrics(db: Session = Depends(get_db)):
-    # 1. Ambil Data Tanah TERBARU (Order by ID Descending / Paling Besar)
-    soil = db.query(models.LogKelembapan)\
-             .filter(models.LogKelembapan.tanaman_id == 1)\
-             .order_by(models.LogKelembapan.id.desc())\
-             .first() 
-             
-    # 2. Ambil Data Tangki TERBARU (Jika tangki juga mau dibuat history)
-    # Jika tangki masih pakai logika Update, query ini tetap aman.
-    tank = db.query(models.LogTangki)\
-             .order_by(models.LogTangki.id.desc())\
-             .first()
+def get_dashboard_metrics(tanaman_id: int = 1, tangki_id: int = 1):
+    # Diambil dari cache kondisi terkini (diperbarui tiap IoT melapor), tanpa query DB
+    # 1. Data Tanah TERBARU untuk tanaman yang diminta
+    soil = latest_state.get_soil(tanaman_id)
+
+    # 2. Data Tangki TERBARU (semua tangki: /web/tank-levels)
+    tank = latest_state.get_tank(tangki_id)
 
     return {
-        "soil_moisture": soil.kelembapan_tanah if soil else 0,
-        "pump_status": soil.pompa_on if soil else False,
-        "tank_percent": tank.persentase_isi if tank else 0,
-    }
\ No newline at end of file
+        "soil_moisture": soil["kelembapan_tanah"] if soil else 0,
+        "pump_status": soil["pompa_on"] if soil else False,
+        "tank_percent": tank["persentase_isi"] if tank else 0,
+    }
+
+# ==========================================
+# 6a. LEVEL SEMUA TANGKI
+# ==========================================
+@app.get("/web/tank-levels", response_model=List[schemas.TankLevelSchema])
+def get_tank_levels():
+    """
+    Level terkini semua tangki di TANK_CONFIG, dari cache (tanpa query DB,
+    jadi menambah tangki tidak menambah beban per request).
+    Tangki yang belum pernah melapor: ketinggian_air / persentase_isi / waktu = null.
+    """
+    semua = latest_state.get_all_tanks()
+    hasil = []
+    for t_id, geo in sorted(registri_tangki.daftar().items()):
+        tank = semua.get(t_id) or {}
+        persen = tank.get("persentase_isi")
+        kapasitas = geo["kapasitas_liter"] or None
+        hasil.append({
+            "tangki_id": t_id,
+            "tinggi_cm": geo["tinggi_cm"],
+            "kapasitas_liter": kapasitas,
+            "ketinggian_air": tank.get("ketinggian_air"),
+            "persentase_isi": persen,
+            "volume_liter": kapasitas * persen / 100 if kapasitas and persen is not None else None,
+            "waktu": tank.get("waktu"),
+        })
+    return hasil
+
+# ==========================================
+# 6b. STREAM DASHBOARD (Server-Sent Events, pengganti polling)
+# ==========================================
+@app.get("/web/stream")
+async def stream_dashboard(request: Request, tanaman_id: List[int] = Query(default=[])):
+    """
+    Contoh: /web/stream?tanaman_id=1&tanaman_id=2 (tanpa tanaman_id = semua tanaman)
+    Di browser: new EventSource(url), lalu dengarkan event "soil" dan "tank".
+    Saat tersambung langsung dikirim kondisi terkini, setelah itu setiap data baru.
+    """
+    sub = live_broker.subscribe(tanaman_id)
+    if sub is None:
+        raise HTTPException(status_code=503, detail="Koneksi dashboard penuh, coba lagi nanti")
+
+    async def kirim():
+        try:
+            yield "retry: 3000\n\n"
+
+            # Kondisi terkini dulu, supaya dashboard langsung terisi
+            semua = latest_state.get_all_soil()
+            for t_id, soil in semua.items():
+                if not tanaman_id or t_id in tanaman_id:
+                    yield format_sse({"event": "soil", "data": _data_soil(t_id, soil)})
+            for t_id, tank in latest_state.get_all_tanks().items():
+                yield format_sse({"event": "tank", "data": {"tangki_id": t_id, **tank}})
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            live_broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        kirim(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ==========================================
+# 6c. ENDPOINT ADMIN
+# ==========================================
+@app.post("/admin/rekomendasi/refresh")
+def refresh_rekomendasi(x_admin_token: Optional[str] = Header(default=None)):
+    """Muat ulang cache rekomendasi setelah tabel rekomendasi_zat diubah dari Laravel."""
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Token admin salah")
+    try:
+        jumlah = rekomendasi_cache.muat()
+    except Exception as e:
+        print(f"❌ Error Refresh Rekomendasi: {e}")
+        raise HTTPException(status_code=503, detail="Gagal membaca tabel rekomendasi")
+    print(f"♻️ Cache rekomendasi dimuat ulang ({jumlah} penyakit)")
+    return {"status": "success", "jumlah": jumlah}
+
+# ==========================================
+# 7. ENDPOINT METRICS (Format Prometheus)
+# ==========================================
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return render_metrics()
@@ -0,0 +1,143 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# ==========================================
+# METRICS SEDERHANA (FORMAT PROMETHEUS)
+# Dipakai untuk memantau antrian AI, buffer sensor, dll.
+# Semua metric didaftarkan ke REGISTRY lalu ditampilkan di endpoint /metrics
+# ==========================================
+
+REGISTRY = []
+
+# Batas bucket histogram default (detik)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    isi = ",".join(f'{k}="{v}"' for k, v in labels)
+    return "{" + isi + "}"
+
+
+class _Metric:
+    tipe = "untyped"
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.tipe}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Angka yang hanya bisa naik (jumlah request, jumlah error, ...)."""
+    tipe = "counter"
+
+    def __init__(self, name, description):
+        super().__init__(name, description)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Angka yang bisa naik turun (panjang antrian, isi buffer, ...)."""
+    tipe = "gauge"
+
+    def __init__(self, name, description):
+        super().__init__(name, description)
+        self._values = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Sebaran nilai (misal: durasi) dalam bucket kumulatif + sum + count."""
+    tipe = "histogram"
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Bucket pertama yang batasnya >= value (di luar lock, biner bukan linear)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if i < len(self.buckets):
+                data[0][i] += 1
+            data[1] += value
+            data[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Pakai: with histogram.time(): ... -> durasi blok otomatis dicatat."""
+        mulai = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - mulai, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            kumulatif = 0
+            for batas, jumlah in zip(self.buckets, counts):
+                kumulatif += jumlah
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', batas),))} {kumulatif}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+def render_metrics():
+    """Gabungkan semua metric jadi teks format Prometheus."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
@@ -0,0 +1,48 @@
+import argparse
+
+import models
+from rollup import index_kurang
+
+# ==========================================
+# MIGRASI INDEX log_kelembapan (JALANKAN MANUAL, SEKALI)
+# Tabel log_kelembapan milik Laravel, jadi API tidak pernah membuat index-nya sendiri saat startup
+# (CREATE INDEX di tabel besar bisa mengunci tabel lama; startup hanya memberi peringatan).
+# Tanpa index ini grafik per tanaman & job rollup tetap jalan, hanya lambat.
+# Skrip ini untuk server yang migration Laravel-nya belum dijalankan:
+#   python migrasi_index_log_kelembapan.py              -> hanya menampilkan apa yang akan dilakukan
+#   python migrasi_index_log_kelembapan.py --jalankan   -> benar-benar membuat index
+# Database diambil dari DATABASE_URL, sama seperti API.
+# ==========================================
+
+
+def migrasi(engine, jalankan=False):
+    """Output: list nama index yang perlu / sudah dibuat."""
+    tabel = models.LogKelembapan.__tablename__
+    kurang = index_kurang(engine)
+    if not kurang:
+        print(f"✅ Index {tabel} sudah lengkap, tidak ada yang diubah")
+        return []
+
+    for index in kurang:
+        kolom = ", ".join(c.name for c in index.columns)
+        print(f"➕ CREATE INDEX {index.name} ON {tabel} ({kolom})")
+        if jalankan:
+            index.create(bind=engine)
+    if jalankan:
+        print(f"✅ Migrasi index {tabel} selesai")
+    else:
+        print("ℹ️ Belum ada yang diubah, jalankan ulang dengan --jalankan")
+    return [index.name for index in kurang]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Buat index log_kelembapan untuk grafik & rollup")
+    parser.add_argument("--jalankan", action="store_true", help="benar-benar buat index (default: hanya tampilkan)")
+    args = parser.parse_args(argv)
+
+    from database import engine
+    migrasi(engine, jalankan=args.jalankan)
+
+
+if __name__ == "__main__":
+    main()
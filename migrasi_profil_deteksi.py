@@ -0,0 +1,46 @@
+import argparse
+
+from sqlalchemy import text
+
+import models
+from profil_deteksi import punya_kolom
+
+# ==========================================
+# MIGRASI KOLOM penyakit_daun.profil_deteksi (JALANKAN MANUAL, SEKALI)
+# Tabel penyakit_daun milik Laravel, jadi API tidak pernah mengubahnya sendiri saat startup
+# (tanpa kolom ini hasil deteksi tetap disimpan, hanya profilnya tidak dicatat).
+# Skrip ini untuk server yang migration Laravel-nya belum dijalankan:
+#   python migrasi_profil_deteksi.py              -> hanya menampilkan apa yang akan dilakukan
+#   python migrasi_profil_deteksi.py --jalankan   -> benar-benar mengubah tabel
+# Database diambil dari DATABASE_URL, sama seperti API. Restart API setelahnya.
+# ==========================================
+
+
+def migrasi(engine, jalankan=False):
+    """Output: True kalau kolom perlu / sudah ditambahkan."""
+    tabel = models.PenyakitDaun.__tablename__
+    if punya_kolom(engine):
+        print(f"✅ {tabel}.profil_deteksi sudah ada, tidak ada yang diubah")
+        return False
+
+    print(f"➕ ALTER TABLE {tabel} ADD COLUMN profil_deteksi VARCHAR(20) NULL")
+    if jalankan:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {tabel} ADD COLUMN profil_deteksi VARCHAR(20) NULL"))
+        print("✅ Migrasi profil_deteksi selesai, restart API supaya profil mulai dicatat")
+    else:
+        print("ℹ️ Belum ada yang diubah, jalankan ulang dengan --jalankan")
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tambah kolom penyakit_daun.profil_deteksi")
+    parser.add_argument("--jalankan", action="store_true", help="benar-benar ubah tabel (default: hanya tampilkan)")
+    args = parser.parse_args(argv)
+
+    from database import engine
+    migrasi(engine, jalankan=args.jalankan)
+
+
+if __name__ == "__main__":
+    main()
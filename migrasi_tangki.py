@@ -0,0 +1,104 @@
+import argparse
+
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, Table, func, insert, inspect, select, text
+
+import models
+from tangki import punya_unique_tangki
+
+# ==========================================
+# MIGRASI log_tangki KE BANYAK TANGKI (JALANKAN MANUAL, SEKALI)
+# Tabel log_tangki milik Laravel, jadi API tidak pernah mengubahnya sendiri saat startup.
+# Skrip ini untuk server yang migration Laravel-nya belum dijalankan:
+#   python migrasi_tangki.py              -> hanya menampilkan apa yang akan dilakukan
+#   python migrasi_tangki.py --jalankan   -> benar-benar mengubah tabel
+# Langkah:
+# 1. Tambah kolom tangki_id (NOT NULL DEFAULT 1): semua baris lama jadi tangki 1
+# 2. Baris kembar per tangki_id (selain id terkecil, baris yang selama ini di-UPDATE endpoint lama)
+#    DISALIN UTUH ke log_tangki_arsip, baru dikeluarkan dari log_tangki (1 transaksi)
+# 3. Buat UNIQUE index tangki_id (syarat upsert di tangki.py)
+# Database diambil dari DATABASE_URL, sama seperti API.
+# ==========================================
+
+TABEL_ARSIP = "log_tangki_arsip"
+
+
+def _tabel_arsip(metadata):
+    # Salinan kolom log_tangki + waktu diarsipkan (id asli dipertahankan)
+    return Table(
+        TABEL_ARSIP, metadata,
+        Column("id", Integer, primary_key=True, autoincrement=False),
+        Column("tangki_id", Integer),
+        Column("ketinggian_air", Float),
+        Column("persentase_isi", Float),
+        Column("created_at", DateTime(timezone=True)),
+        Column("updated_at", DateTime(timezone=True)),
+        Column("diarsipkan_at", DateTime(timezone=True), server_default=func.now()),
+    )
+
+
+def migrasi(engine, jalankan=False):
+    """Output: dict ringkasan (kolom_ditambah, diarsipkan, index_dibuat)."""
+    log = models.LogTangki
+    tabel = log.__tablename__
+    hasil = {"kolom_ditambah": False, "diarsipkan": 0, "index_dibuat": False}
+    if punya_unique_tangki(engine):
+        print("✅ log_tangki sudah siap (tangki_id + UNIQUE), tidak ada yang diubah")
+        return hasil
+
+    # 1. Kolom tangki_id
+    if "tangki_id" not in {k["name"] for k in inspect(engine).get_columns(tabel)}:
+        hasil["kolom_ditambah"] = True
+        print(f"➕ ALTER TABLE {tabel} ADD COLUMN tangki_id (baris lama -> tangki 1)")
+        if jalankan:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {tabel} ADD COLUMN tangki_id INTEGER NOT NULL DEFAULT 1"))
+
+    # 2. Arsipkan baris kembar (sebelum kolom ada, semua baris dihitung sebagai tangki 1)
+    kolom_ada = jalankan or not hasil["kolom_ditambah"]
+    with engine.connect() as conn:
+        if not kolom_ada:
+            jumlah = conn.execute(select(func.count(log.id))).scalar()
+            kembar = max(0, jumlah - 1)
+        else:
+            # id dibaca dulu: MySQL tidak mengizinkan subquery ke tabel yang sama saat INSERT/DELETE
+            pertama = conn.execute(select(func.min(log.id)).group_by(log.tangki_id)).scalars().all()
+            kembar = conn.execute(select(func.count(log.id)).where(log.id.not_in(pertama))).scalar()
+    hasil["diarsipkan"] = kembar
+    if kembar:
+        print(f"📦 {kembar} baris kembar dipindah ke {TABEL_ARSIP} (disalin utuh, tidak dibuang)")
+        if jalankan:
+            arsip = _tabel_arsip(MetaData())
+            arsip.create(bind=engine, checkfirst=True)
+            with engine.begin() as conn:
+                ids = conn.execute(select(log.id).where(log.id.not_in(pertama))).scalars().all()
+                conn.execute(insert(arsip).from_select(
+                    ["id", "tangki_id", "ketinggian_air", "persentase_isi", "created_at", "updated_at"],
+                    select(log.id, log.tangki_id, log.ketinggian_air, log.persentase_isi,
+                           log.created_at, log.updated_at).where(log.id.in_(ids)),
+                ))
+                conn.execute(log.__table__.delete().where(log.id.in_(ids)))
+
+    # 3. UNIQUE index
+    hasil["index_dibuat"] = True
+    print(f"🔑 CREATE UNIQUE INDEX pada {tabel}.tangki_id")
+    if jalankan:
+        for index in log.__table__.indexes:
+            if index.unique:
+                index.create(bind=engine)
+        print("✅ Migrasi log_tangki selesai")
+    else:
+        print("ℹ️ Belum ada yang diubah, jalankan ulang dengan --jalankan")
+    return hasil
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrasi log_tangki ke banyak tangki (tangki_id + UNIQUE)")
+    parser.add_argument("--jalankan", action="store_true", help="benar-benar ubah tabel (default: hanya tampilkan)")
+    args = parser.parse_args(argv)
+
+    from database import engine
+    migrasi(engine, jalankan=args.jalankan)
+
+
+if __name__ == "__main__":
+    main()
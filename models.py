@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, Text, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from database import Base
 
@@ -22,6 +22,12 @@ class RekomendasiZat(Base):
 
 class LogKelembapan(Base):
     __tablename__ = "log_kelembapan"
+    # Index untuk query grafik per tanaman (rentang waktu) & pembersihan data lama
+    # (tabel milik Laravel: dibuat lewat migration / migrasi_index_log_kelembapan.py, bukan saat startup)
+    __table_args__ = (
+        Index("ix_log_kelembapan_tanaman_waktu", "tanaman_id", "created_at"),
+        Index("ix_log_kelembapan_waktu", "created_at"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     tanaman_id = Column(Integer)
     kelembapan_tanah = Column(Float)
@@ -30,14 +36,48 @@ class LogKelembapan(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now())
 
+# Ringkasan log_kelembapan per menit / jam / hari (diisi job rollup FastAPI)
+# avg = kelembapan_sum / jumlah, rasio pompa = pompa_on_jumlah / jumlah
+class LogKelembapanRollup(Base):
+    __tablename__ = "log_kelembapan_rollup"
+    __table_args__ = (
+        UniqueConstraint("resolusi", "tanaman_id", "bucket_start", name="uq_rollup_bucket"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    resolusi = Column(String(10))       # "minute", "hour", "day"
+    tanaman_id = Column(Integer)
+    bucket_start = Column(DateTime)
+    jumlah = Column(Integer)
+    kelembapan_min = Column(Float)
+    kelembapan_max = Column(Float)
+    kelembapan_sum = Column(Float)
+    pompa_on_jumlah = Column(Integer)
+
+# 1 baris per tangki (level terkini), ditulis dengan upsert (lihat tangki.py)
 class LogTangki(Base):
     __tablename__ = "log_tangki"
+    __table_args__ = (
+        Index("uq_log_tangki_tangki_id", "tangki_id", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
+    tangki_id = Column(Integer, nullable=False, default=1, server_default="1")
     ketinggian_air = Column(Float)
     persentase_isi = Column(Float)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now())
 
+# Riwayat level tangki (milik FastAPI), disampling tiap TANK_HISTORY_SECONDS
+class LogTangkiRiwayat(Base):
+    __tablename__ = "log_tangki_riwayat"
+    __table_args__ = (
+        Index("ix_log_tangki_riwayat_tangki_waktu", "tangki_id", "created_at"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    tangki_id = Column(Integer)
+    ketinggian_air = Column(Float)
+    persentase_isi = Column(Float)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class PenyakitDaun(Base):
     __tablename__ = "penyakit_daun"
     id = Column(Integer, primary_key=True, index=True)
@@ -48,5 +88,22 @@ class PenyakitDaun(Base):
     tingkat_keyakinan = Column(Float)
     detail_persentase = Column(Text) # JSON String
     rekomendasi_id = Column(Integer) # Ini yang akan kita cari otomatis
+    profil_deteksi = Column(String(20)) # "fast" / "standard" / "accurate" (lihat profil_deteksi.py)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# Status mode manual pompa per tanaman (dipakai bersama semua worker FastAPI)
+# tanaman_id 0 = mode manual untuk semua tanaman
+class KontrolPompa(Base):
+    __tablename__ = "kontrol_pompa"
+    tanaman_id = Column(Integer, primary_key=True, autoincrement=False)
+    manual_on = Column(Boolean, default=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Lease job latar belakang (rollup): hanya 1 proses / server yang boleh menjalankan
+# job dengan nama yang sama; lease lain boleh diambil alih kalau sudah lewat berlaku_sampai
+class KunciJob(Base):
+    __tablename__ = "kunci_job"
+    nama = Column(String(50), primary_key=True)
+    pemilik = Column(String(100))
+    berlaku_sampai = Column(DateTime)
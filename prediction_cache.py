@@ -0,0 +1,114 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import Counter, Gauge
+
+# ==========================================
+# CACHE HASIL DETEKSI (DEDUP GAMBAR KEMBAR)
+# Kamera posisi tetap sering mengirim frame yang sama persis (atau nyaris sama).
+# Hasil predict_image untuk gambar seperti itu diambil dari cache, tidak dihitung ulang.
+# - Kunci utama : SHA-256 isi file (byte-identik)
+# - Opsional    : dHash 64-bit (perceptual) untuk frame yang nyaris sama
+# Model AI hanya dimuat saat startup (termasuk worker pool), jadi cache ini sengaja
+# tidak memantau ai_models/: ganti model = restart API, dan cache ikut kosong.
+# ==========================================
+
+CACHE_HITS = Counter("prediction_cache_hits_total", "Jumlah deteksi yang diambil dari cache")
+CACHE_MISSES = Counter("prediction_cache_misses_total", "Jumlah deteksi yang tidak ada di cache")
+CACHE_EVICTIONS = Counter("prediction_cache_evictions_total", "Jumlah entri cache yang dibuang (LRU/TTL)")
+CACHE_SIZE = Gauge("prediction_cache_size", "Jumlah entri di cache deteksi")
+
+
+def _dhash(data, ukuran=8):
+    """
+    Perceptual hash (difference hash) 64-bit dari bytes gambar.
+    Gambar di-decode kecil (1/8) dalam grayscale, lalu dibandingkan piksel kiri-kanan.
+    """
+    import cv2
+    import numpy as np
+
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    kecil = cv2.resize(img, (ukuran + 1, ukuran), interpolation=cv2.INTER_AREA)
+    bits = (kecil[:, 1:] > kecil[:, :-1]).ravel()
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def _jarak_hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class PredictionCache:
+    def __init__(self, max_items=256, ttl_detik=3600, perceptual=False, jarak_maks=4):
+        """
+        max_items : jumlah entri maksimal (yang paling lama tidak dipakai dibuang duluan)
+        ttl_detik : umur maksimal entri
+        perceptual: aktifkan pencocokan dHash untuk frame yang nyaris sama
+        jarak_maks: beda bit dHash maksimal agar dianggap gambar yang sama
+        """
+        self.max_items = max_items
+        self.ttl_detik = ttl_detik
+        self.perceptual = perceptual
+        self.jarak_maks = jarak_maks
+        self._items = OrderedDict()  # "varian:sha256" -> (waktu_simpan, dhash, hasil)
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            CACHE_EVICTIONS.inc(len(self._items))
+            self._items.clear()
+            CACHE_SIZE.set(0)
+
+    def _kunci(self, data, varian=""):
+        # varian: pembeda setelan deteksi (misal mode cepat), gambar sama beda setelan = entri beda
+        return f"{varian}:{hashlib.sha256(data).hexdigest()}"
+
+    def get(self, data, varian=""):
+        """Output: hasil deteksi (dict) kalau ada di cache, selain itu None."""
+        kunci = self._kunci(data, varian)
+        sekarang = time.time()
+
+        with self._lock:
+            entri = self._items.get(kunci)
+            if entri and sekarang - entri[0] <= self.ttl_detik:
+                self._items.move_to_end(kunci)
+                CACHE_HITS.inc(jenis="exact")
+                return entri[2]
+
+        if self.perceptual:
+            dhash = _dhash(data)
+            if dhash is not None:
+                with self._lock:
+                    for kunci_lain, (waktu, dhash_lain, hasil) in reversed(self._items.items()):
+                        if dhash_lain is None or sekarang - waktu > self.ttl_detik:
+                            continue
+                        if not kunci_lain.startswith(f"{varian}:"):
+                            continue
+                        if _jarak_hamming(dhash, dhash_lain) <= self.jarak_maks:
+                            self._items.move_to_end(kunci_lain)
+                            CACHE_HITS.inc(jenis="perceptual")
+                            return hasil
+
+        CACHE_MISSES.inc()
+        return None
+
+    def put(self, data, hasil, varian=""):
+        kunci = self._kunci(data, varian)
+        dhash = _dhash(data) if self.perceptual else None
+        sekarang = time.time()
+
+        with self._lock:
+            self._items[kunci] = (sekarang, dhash, hasil)
+            self._items.move_to_end(kunci)
+
+            # Buang dari depan (paling lama tidak dipakai) selama kadaluarsa / kepenuhan
+            while self._items:
+                kunci_lama, (waktu, _, _) = next(iter(self._items.items()))
+                if sekarang - waktu <= self.ttl_detik and len(self._items) <= self.max_items:
+                    break
+                del self._items[kunci_lama]
+                CACHE_EVICTIONS.inc()
+            CACHE_SIZE.set(len(self._items))
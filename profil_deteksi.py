@@ -0,0 +1,38 @@
+from sqlalchemy import inspect
+
+import models
+
+# ==========================================
+# PROFIL DETEKSI PENYAKIT DAUN
+# Dipilih per request (?profil=...) dan dicatat di kolom penyakit_daun.profil_deteksi
+# (kalau kolomnya sudah ada, lihat punya_kolom).
+# Ukuran kotak tetap 64 px seperti training; yang diatur per profil:
+# - image_size: resolusi gambar setelah resize
+# - stride    : jarak geser kotak (64 = rapat tanpa tumpang tindih, 32 = tumpang tindih 50%,
+#               96 = ada celah 32 px antar kotak -> kotak yang dinilai lebih sedikit)
+# - early_exit: mode cepat (voting berhenti begitu penyakit dominan sudah pasti)
+# Profil:
+# - fast    : resolusi lebih kecil + kotak berjarak + early exit (kamera live, triase cepat)
+# - standard: sama persis dengan jalur lama (512x512, stride 64)
+# - accurate: resolusi training, kotak tumpang tindih (upload scout)
+# perkiraan_ms = perkiraan waktu 1 gambar di 1 worker (CPU 1 core, termasuk decode)
+# Modul ini sengaja ringan (tanpa cv2/sklearn) supaya main.py bisa import tanpa load AI.
+# ==========================================
+
+PROFIL_DETEKSI = {
+    "fast": {"image_size": 384, "stride": 96, "early_exit": True, "perkiraan_ms": 15},
+    "standard": {"image_size": 512, "stride": 64, "early_exit": False, "perkiraan_ms": 35},
+    "accurate": {"image_size": 512, "stride": 32, "early_exit": False, "perkiraan_ms": 110},
+}
+PROFIL_DEFAULT = "standard"
+
+
+def punya_kolom(engine):
+    """
+    True kalau penyakit_daun sudah punya kolom profil_deteksi.
+    Tabelnya milik Laravel dan TIDAK diubah oleh API; kolomnya dari migration:
+        $table->string('profil_deteksi', 20)->nullable()->after('rekomendasi_id');
+    (atau jalankan: python migrasi_profil_deteksi.py --jalankan)
+    """
+    kolom = {k["name"] for k in inspect(engine).get_columns(models.PenyakitDaun.__tablename__)}
+    return "profil_deteksi" in kolom
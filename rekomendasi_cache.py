@@ -0,0 +1,88 @@
+import threading
+import time
+
+import models
+from metrics import Counter, Gauge
+
+# ==========================================
+# CACHE TABEL REKOMENDASI ZAT
+# Tabel rekomendasi_zat kecil & jarang berubah, jadi dimuat sekali ke memori
+# (saat startup), lalu dimuat ulang di belakang setiap TTL habis atau lewat
+# endpoint admin. Jalur deteksi penyakit tidak perlu query rekomendasi lagi.
+# ==========================================
+
+CACHE_RELOADS = Counter("rekomendasi_cache_reloads_total", "Jumlah muat ulang cache rekomendasi")
+CACHE_SIZE = Gauge("rekomendasi_cache_size", "Jumlah penyakit di cache rekomendasi")
+
+
+def normalisasi_nama(nama):
+    # Samakan dengan format label dari predict_image: .replace("_", " ").title()
+    return " ".join(str(nama).replace("_", " ").split()).title()
+
+
+class RekomendasiCache:
+    def __init__(self, session_factory, ttl_detik=600):
+        """
+        session_factory: pembuat Session (SessionLocal)
+        ttl_detik      : umur cache sebelum dimuat ulang di belakang (0 = hanya lewat refresh manual)
+        """
+        self.session_factory = session_factory
+        self.ttl_detik = ttl_detik
+        self._data = None  # nama ternormalisasi -> {"id", "rekomendasi"}
+        self._dimuat = 0.0
+        self._lock = threading.Lock()
+        self._memuat = False
+
+    def muat(self):
+        """Baca ulang seluruh tabel. Output: jumlah penyakit di cache."""
+        db = self.session_factory()
+        try:
+            rows = db.query(models.RekomendasiZat.id,
+                            models.RekomendasiZat.nama_penyakit,
+                            models.RekomendasiZat.rekomendasi)\
+                     .order_by(models.RekomendasiZat.id)\
+                     .all()
+        finally:
+            db.close()
+
+        data = {}
+        for id_, nama, rekomendasi in rows:
+            if nama:
+                # Nama kembar -> pakai baris dengan id terkecil (sama seperti .first())
+                data.setdefault(normalisasi_nama(nama), {"id": id_, "rekomendasi": rekomendasi})
+
+        with self._lock:
+            self._data = data
+            self._dimuat = time.monotonic()
+        CACHE_RELOADS.inc()
+        CACHE_SIZE.set(len(data))
+        return len(data)
+
+    def _muat_belakang(self):
+        try:
+            self.muat()
+        except Exception as e:
+            print(f"⚠️ WARNING: Gagal memuat ulang cache rekomendasi. Error: {e}")
+        finally:
+            with self._lock:
+                self._memuat = False
+
+    def get(self, nama_penyakit):
+        """Output: {"id", "rekomendasi"} atau None kalau penyakit tidak ada di tabel."""
+        with self._lock:
+            data = self._data
+            kadaluarsa = self.ttl_detik and time.monotonic() - self._dimuat > self.ttl_detik
+            if data is not None and kadaluarsa and not self._memuat:
+                # Data lama tetap dipakai sambil dimuat ulang di belakang
+                self._memuat = True
+                threading.Thread(target=self._muat_belakang, name="rekomendasi-reload", daemon=True).start()
+
+        if data is None:
+            # Belum pernah berhasil dimuat (misal DB mati saat startup) -> coba sekarang
+            try:
+                self.muat()
+            except Exception as e:
+                print(f"⚠️ WARNING: Gagal memuat cache rekomendasi. Error: {e}")
+                return None
+            data = self._data
+        return data.get(normalisasi_nama(nama_penyakit))
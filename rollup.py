@@ -0,0 +1,329 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, func, insert, inspect, or_, update
+from sqlalchemy.exc import IntegrityError
+
+import models
+from metrics import Counter, Gauge, Histogram
+from timeseries import ROLLUP_RESOLUSI, awal_bucket, batas_rollup, dari_epoch, nomor_bucket
+
+# ==========================================
+# ROLLUP & RETENSI LOG KELEMBAPAN
+# log_kelembapan bertambah 1 baris tiap sensor lapor, selamanya.
+# Job di belakang meringkas data mentah ke log_kelembapan_rollup:
+#   mentah -> per menit -> per jam -> per hari
+# lalu menghapus data (mentah / rollup halus) yang sudah lewat masa simpan KALAU diaktifkan
+# (data mentah default disimpan selamanya).
+# Grafik rentang panjang otomatis membaca rollup (lihat timeseries.bucket_series).
+# Kalau uvicorn dijalankan dengan banyak worker / server, hanya pemegang lease di
+# tabel kunci_job yang menjalankan putaran; worker lain melewatinya.
+# ==========================================
+
+ROLLUP_ROWS = Counter("rollup_rows_total", "Jumlah baris rollup yang ditulis")
+ROLLUP_PRUNED = Counter("rollup_pruned_rows_total", "Jumlah baris yang dihapus oleh retensi")
+ROLLUP_SECONDS = Histogram("rollup_run_seconds", "Lama 1x putaran job rollup + retensi")
+ROLLUP_LAG = Gauge("rollup_lag_seconds", "Selisih waktu sekarang dengan akhir data yang sudah diringkas")
+ROLLUP_SKIPPED = Counter("rollup_skipped_total", "Jumlah putaran yang dilewati karena lease dipegang proses lain")
+
+NAMA_LEASE = "rollup_log_kelembapan"
+
+# Sumber data tiap resolusi: menit dari data mentah, jam dari menit, hari dari jam
+SUMBER_RESOLUSI = {"minute": None, "hour": "minute", "day": "hour"}
+
+# Jumlah baris per INSERT multi-baris (batas jumlah parameter SQL per statement)
+INSERT_CHUNK = 500
+
+
+def siapkan_tabel(engine):
+    """
+    Buat tabel rollup & kunci_job (milik FastAPI) yang belum ada.
+    Tabel log_kelembapan dan index-nya milik Laravel, tidak diubah di sini (cek: index_kurang).
+    """
+    models.Base.metadata.create_all(bind=engine, tables=[models.LogKelembapanRollup.__table__,
+                                                         models.KunciJob.__table__])
+
+
+def index_kurang(engine):
+    """
+    Index log_kelembapan (lihat models.LogKelembapan) yang belum ada di database.
+    Index lain yang kolom depannya sama (nama beda, mis. buatan migration Laravel) dianggap cukup,
+    begitu juga primary key.
+    Output: list objek Index yang belum ada.
+    """
+    info = inspect(engine)
+    tabel = models.LogKelembapan.__tablename__
+    ada = [tuple(i["column_names"]) for i in info.get_indexes(tabel)]
+    ada.append(tuple(info.get_pk_constraint(tabel)["constrained_columns"]))
+    kurang = []
+    for index in models.LogKelembapan.__table__.indexes:
+        kolom = tuple(c.name for c in index.columns)
+        if not any(k[:len(kolom)] == kolom for k in ada):
+            kurang.append(index)
+    return kurang
+
+
+class RollupJob:
+    def __init__(self, session_factory, interval=60.0, lookback=3600, batch_size=5000,
+                 retensi_mentah_hari=0, retensi_menit_hari=90, retensi_jam_hari=730, lease_detik=None):
+        """
+        session_factory    : pembuat Session (SessionLocal)
+        interval           : jeda antar putaran job (detik)
+        lookback           : rentang (detik) sebelum akhir rollup yang dihitung ulang tiap putaran,
+                             supaya data kiriman ulang yang telat tetap masuk ringkasan
+        batch_size         : jumlah bucket per jendela rollup & baris per statement DELETE retensi
+        retensi_*_hari     : umur maksimal data mentah / rollup menit / rollup jam (0 = simpan selamanya)
+        lease_detik        : lama lease kunci_job (default 3x interval, minimal 5 menit); kalau pemegangnya
+                             mati, proses lain baru bisa mengambil alih setelah lease habis
+        """
+        self.session_factory = session_factory
+        self.interval = interval
+        self.lookback = lookback
+        self.batch_size = batch_size
+        self.retensi = {
+            None: retensi_mentah_hari,
+            "minute": retensi_menit_hari,
+            "hour": retensi_jam_hari,
+        }
+
+        self.lease_detik = lease_detik or max(3 * interval, 300)
+        self.pemilik = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="rollup-log-kelembapan", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+            self._lepas_lease()
+
+    def ambil_lease(self, db, sekarang):
+        """
+        Ambil / perpanjang lease NAMA_LEASE untuk proses ini.
+        UPDATE hanya berhasil kalau lease milik sendiri atau sudah habis; kalau barisnya
+        belum ada -> INSERT (kalau keduluan proses lain, UPDATE lagi).
+        Output: True kalau proses ini pemegang lease.
+        """
+        kunci = models.KunciJob
+        berlaku = sekarang + timedelta(seconds=self.lease_detik)
+        for _ in range(2):
+            hasil = db.execute(
+                update(kunci)
+                .where(kunci.nama == NAMA_LEASE)
+                .where(or_(kunci.pemilik == self.pemilik, kunci.berlaku_sampai < sekarang))
+                .values(pemilik=self.pemilik, berlaku_sampai=berlaku)
+            )
+            if hasil.rowcount:
+                db.commit()
+                return True
+            if db.query(kunci.nama).filter(kunci.nama == NAMA_LEASE).first():
+                db.rollback()
+                return False
+            try:
+                db.add(kunci(nama=NAMA_LEASE, pemilik=self.pemilik, berlaku_sampai=berlaku))
+                db.commit()
+                return True
+            except IntegrityError:
+                db.rollback()
+        return False
+
+    def _lepas_lease(self):
+        # Saat API mati: lease langsung dilepas supaya worker lain tidak menunggu sampai habis
+        db = self.session_factory()
+        try:
+            kunci = models.KunciJob
+            db.execute(
+                update(kunci)
+                .where(kunci.nama == NAMA_LEASE, kunci.pemilik == self.pemilik)
+                .values(berlaku_sampai=datetime(1970, 1, 1))
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ WARNING: Gagal melepas lease rollup. Error: {e}")
+        finally:
+            db.close()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def run_once(self, sekarang=None):
+        """1 putaran: rollup semua resolusi lalu retensi. Output: dict jumlah baris per langkah."""
+        mulai = time.perf_counter()
+        db = self.session_factory()
+        hasil = {}
+        try:
+            dialect = db.get_bind().dialect.name
+            sekarang = sekarang or datetime.now()
+            if not self.ambil_lease(db, sekarang):
+                ROLLUP_SKIPPED.inc()
+                return hasil
+            for resolusi in ROLLUP_RESOLUSI:
+                hasil[resolusi] = self._rollup(db, dialect, resolusi, sekarang)
+            hasil["dihapus"] = self._retensi(db, sekarang)
+
+            akhir = batas_rollup(db, "minute")
+            if akhir:
+                ROLLUP_LAG.set(max(0.0, (sekarang - akhir).total_seconds()))
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Error Rollup: {e}")
+        finally:
+            db.close()
+            ROLLUP_SECONDS.observe(time.perf_counter() - mulai)
+        return hasil
+
+    def _rentang(self, db, dialect, resolusi, sekarang):
+        # Rentang bucket (utuh) yang perlu dihitung: dari sedikit sebelum rollup terakhir
+        # sampai bucket terakhir yang sudah selesai (dan sudah lengkap di resolusi sumbernya)
+        detik = ROLLUP_RESOLUSI[resolusi]
+        sumber = SUMBER_RESOLUSI[resolusi]
+
+        if sumber is None:
+            akhir_sumber = sekarang
+        else:
+            akhir_sumber = batas_rollup(db, sumber)
+            if akhir_sumber is None:
+                return None, None
+        akhir = awal_bucket(dialect, min(sekarang, akhir_sumber), detik)
+
+        terakhir = batas_rollup(db, resolusi)
+        if terakhir is not None:
+            mulai = terakhir - timedelta(seconds=max(self.lookback, detik))
+        elif sumber is None:
+            mulai = db.query(func.min(models.LogKelembapan.created_at)).scalar()
+        else:
+            rollup = models.LogKelembapanRollup
+            mulai = db.query(func.min(rollup.bucket_start)).filter(rollup.resolusi == sumber).scalar()
+        if mulai is None:
+            return None, None
+        if isinstance(mulai, str):
+            mulai = datetime.fromisoformat(mulai)
+        return awal_bucket(dialect, mulai, detik), akhir
+
+    def _rollup(self, db, dialect, resolusi, sekarang):
+        mulai, akhir = self._rentang(db, dialect, resolusi, sekarang)
+        if mulai is None or mulai >= akhir:
+            return 0
+
+        # Data lama yang belum pernah diringkas (putaran pertama) diproses per jendela
+        # batch_size bucket, supaya memori & ukuran transaksi tetap kecil
+        detik = ROLLUP_RESOLUSI[resolusi]
+        total = 0
+        while mulai < akhir and not self._stop.is_set():
+            # Putaran pertama bisa lama: lease diperpanjang tiap jendela, berhenti kalau sudah lepas
+            if not self.ambil_lease(db, datetime.now()):
+                break
+            selesai = min(akhir, mulai + timedelta(seconds=detik * self.batch_size))
+            total += self._rollup_jendela(db, dialect, resolusi, mulai, selesai)
+            mulai = selesai
+        return total
+
+    def _rollup_jendela(self, db, dialect, resolusi, mulai, akhir):
+        detik = ROLLUP_RESOLUSI[resolusi]
+        sumber = SUMBER_RESOLUSI[resolusi]
+        rollup = models.LogKelembapanRollup
+
+        if sumber is None:
+            log = models.LogKelembapan
+            bucket = nomor_bucket(dialect, log.created_at, detik).label("bucket")
+            rows = db.query(
+                        log.tanaman_id,
+                        bucket,
+                        func.count(log.id),
+                        func.min(log.kelembapan_tanah),
+                        func.max(log.kelembapan_tanah),
+                        func.sum(log.kelembapan_tanah),
+                        func.sum(case((log.pompa_on, 1), else_=0)),
+                     )\
+                     .filter(log.created_at >= mulai, log.created_at < akhir)\
+                     .group_by(log.tanaman_id, bucket)\
+                     .all()
+        else:
+            bucket = nomor_bucket(dialect, rollup.bucket_start, detik).label("bucket")
+            rows = db.query(
+                        rollup.tanaman_id,
+                        bucket,
+                        func.sum(rollup.jumlah),
+                        func.min(rollup.kelembapan_min),
+                        func.max(rollup.kelembapan_max),
+                        func.sum(rollup.kelembapan_sum),
+                        func.sum(rollup.pompa_on_jumlah),
+                     )\
+                     .filter(rollup.resolusi == sumber)\
+                     .filter(rollup.bucket_start >= mulai, rollup.bucket_start < akhir)\
+                     .group_by(rollup.tanaman_id, bucket)\
+                     .all()
+
+        baris = [
+            {
+                "resolusi": resolusi,
+                "tanaman_id": tanaman_id,
+                "bucket_start": dari_epoch(dialect, int(b) * detik),
+                "jumlah": int(jumlah),
+                "kelembapan_min": float(mn),
+                "kelembapan_max": float(mx),
+                "kelembapan_sum": float(total),
+                "pompa_on_jumlah": int(pompa or 0),
+            }
+            for tanaman_id, b, jumlah, mn, mx, total, pompa in rows
+            if jumlah
+        ]
+
+        # Hitung ulang = hapus ringkasan lama di rentang ini lalu tulis yang baru (1 transaksi)
+        try:
+            db.execute(
+                delete(rollup)
+                .where(rollup.resolusi == resolusi)
+                .where(rollup.bucket_start >= mulai, rollup.bucket_start < akhir)
+            )
+            for i in range(0, len(baris), INSERT_CHUNK):
+                db.execute(insert(rollup).values(baris[i:i + INSERT_CHUNK]))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        ROLLUP_ROWS.inc(len(baris), resolusi=resolusi)
+        return len(baris)
+
+    def _retensi(self, db, sekarang):
+        # Data hanya dihapus kalau sudah lewat masa simpan DAN sudah masuk ringkasan resolusi berikutnya
+        total = 0
+        berikutnya = {None: "minute", "minute": "hour", "hour": "day"}
+        for resolusi, hari in self.retensi.items():
+            if not hari:
+                continue
+            tercakup = batas_rollup(db, berikutnya[resolusi])
+            if tercakup is None:
+                continue
+            batas = min(sekarang - timedelta(days=hari), tercakup)
+
+            if resolusi is None:
+                tabel = models.LogKelembapan
+                filter_lama = [tabel.created_at < batas]
+            else:
+                tabel = models.LogKelembapanRollup
+                filter_lama = [tabel.resolusi == resolusi, tabel.bucket_start < batas]
+
+            # Hapus bertahap per batch_size baris supaya tabel tidak terkunci lama
+            while not self._stop.is_set() and self.ambil_lease(db, datetime.now()):
+                ids = [r[0] for r in db.query(tabel.id).filter(*filter_lama).limit(self.batch_size).all()]
+                if not ids:
+                    break
+                db.execute(delete(tabel).where(tabel.id.in_(ids)))
+                db.commit()
+                total += len(ids)
+                ROLLUP_PRUNED.inc(len(ids), tabel=tabel.__tablename__)
+        return total
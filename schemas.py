@@ -12,13 +12,22 @@ class SoilDataInput(BaseModel):
     tanaman_id: int
     moisture: float
 
+# 1b. Input Data Kelembapan Massal (Dari IoT yang sempat offline)
+#     timestamp = jam pengukuran di perangkat (kosong -> jam server)
+class SoilReadingInput(BaseModel):
+    tanaman_id: int
+    moisture: float
+    timestamp: Optional[datetime] = None
+
 # 2. Input Data Tangki (Dari IoT)
 class TankDataInput(BaseModel):
     distance_cm: float
+    tangki_id: int = 1  # kosong = tangki 1 (perangkat lama)
 
 # 3. Input Kontrol Manual (Dari Web)
 class ManualControlInput(BaseModel):
     action: str  # "on" atau "off"
+    tanaman_id: Optional[int] = None  # kosong = semua tanaman
 
 # ==========================================
 # B. SCHEMA OUTPUT (DATA KELUAR)
@@ -32,6 +41,14 @@ class IotResponse(BaseModel):
     level_percent: Optional[float] = None
     mode: Optional[str] = None
 
+# 1b. Balasan untuk Kiriman Sensor Massal
+#     pump: perintah pompa per tanaman, misal {1: "ON", 2: "OFF"}
+class SoilBatchResponse(BaseModel):
+    status: str
+    tersimpan: int
+    dilewati: int = 0       # data yang tidak ditulis karena masih dalam deadband
+    pump: Dict[int, str]
+
 # 2. Balasan untuk Web (Manual Control)
 class WebControlResponse(BaseModel):
     status: str
@@ -43,8 +60,41 @@ class DiseaseResponse(BaseModel):
     hasil: str
     confidence: float
     rekomendasi: str
+    patch_dievaluasi: Optional[int] = None  # jumlah kotak gambar yang dinilai AI
+    patch_kandidat: Optional[int] = None    # jumlah kotak daun (bukan background)
+    profil: Optional[str] = None            # profil deteksi yang dipakai (fast / standard / accurate)
 
-# 4. Schema untuk Data Log (Agar Grafik Web Rapi)
+# 4. Balasan Deteksi Mode Async (Job)
+#    status: "queued" -> "done" / "error". 'hasil' terisi kalau sudah "done"
+class DetectionJobResponse(BaseModel):
+    job_id: str
+    status: str
+    hasil: Optional[DiseaseResponse] = None
+    error: Optional[str] = None
+
+# 5. Hasil per Gambar pada Deteksi Massal (Batch)
+class BatchDiseaseItem(BaseModel):
+    nama_asli: str               # Nama file dari perangkat scout
+    gambar: Optional[str] = None # Nama file yang tersimpan (kolom 'gambar')
+    hasil: str
+    confidence: float
+    rekomendasi: str
+    patch_dievaluasi: Optional[int] = None
+    patch_kandidat: Optional[int] = None
+    profil: Optional[str] = None
+    error: Optional[str] = None
+
+# 6. Balasan Deteksi Massal (per gambar + ringkasan)
+class BatchDiseaseResponse(BaseModel):
+    message: str
+    jumlah_gambar: int
+    jumlah_berhasil: int
+    dominan: str                 # Penyakit yang paling sering muncul
+    ringkasan: Dict[str, int]    # {"Bercak Daun": 12, "Daun Sehat": 30, ...}
+    rata_rata_confidence: float
+    hasil: List[BatchDiseaseItem]
+
+# 7. Schema untuk Data Log (Agar Grafik Web Rapi)
 #    Ini digunakan untuk mengubah object Database menjadi JSON
 class LogKelembapanSchema(BaseModel):
     id: int
@@ -54,4 +104,31 @@ class LogKelembapanSchema(BaseModel):
     created_at: datetime
 
     class Config:
-        from_attributes = True # PENTING: Agar bisa baca data dari SQLAlchemy
\ No newline at end of file
+        from_attributes = True # PENTING: Agar bisa baca data dari SQLAlchemy
+
+# 8. Schema Titik Grafik Rentang Panjang (hasil agregasi / downsampling)
+class ChartPointSchema(BaseModel):
+    waktu: datetime
+    kelembapan_min: float
+    kelembapan_avg: float
+    kelembapan_max: float
+    pompa_on_rasio: float   # 0.0 - 1.0 (porsi laporan dengan pompa nyala)
+    jumlah: int             # jumlah data mentah di titik ini (0 = diisi nilai terakhir, mode step)
+
+class ChartSeriesResponse(BaseModel):
+    tanaman_id: int
+    start: datetime
+    end: datetime
+    method: str             # "bucket" atau "lttb"
+    bucket_seconds: Optional[int] = None
+    points: List[ChartPointSchema]
+
+# 9. Level Terkini per Tangki (dari cache, untuk /web/tank-levels)
+class TankLevelSchema(BaseModel):
+    tangki_id: int
+    tinggi_cm: float
+    kapasitas_liter: Optional[float] = None
+    ketinggian_air: Optional[float] = None  # null = tangki belum pernah melapor
+    persentase_isi: Optional[float] = None
+    volume_liter: Optional[float] = None    # hanya kalau kapasitas_liter diisi di TANK_CONFIG
+    waktu: Optional[datetime] = None
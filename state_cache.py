@@ -0,0 +1,76 @@
+import threading
+
+from sqlalchemy import func, select
+
+import models
+
+# ==========================================
+# CACHE KONDISI TERKINI (UNTUK DASHBOARD)
+# Data sensor paling baru per tanaman + level terbaru per tangki disimpan di memori.
+# Diisi dari DB saat API nyala, lalu diperbarui setiap kali IoT melapor,
+# jadi dashboard tidak perlu query ORDER BY id DESC ke tabel log yang terus membesar.
+# Cache ini milik 1 proses: API harus jalan dengan 1 worker (lihat WEB_CONCURRENCY di main.py).
+# ==========================================
+
+
+class LatestStateCache:
+    def __init__(self):
+        self._soil = {}    # tanaman_id -> {"kelembapan_tanah", "pompa_on", "sumber_perintah", "waktu"}
+        self._tanks = {}   # tangki_id -> {"ketinggian_air", "persentase_isi", "waktu"}
+        self._lock = threading.Lock()
+
+    def update_soil(self, tanaman_id, kelembapan_tanah, pompa_on, sumber_perintah, waktu):
+        # Data kiriman ulang (offline) bisa lebih tua dari yang sudah ada -> abaikan
+        with self._lock:
+            lama = self._soil.get(tanaman_id)
+            if lama and lama["waktu"] and waktu and waktu < lama["waktu"]:
+                return
+            self._soil[tanaman_id] = {
+                "kelembapan_tanah": kelembapan_tanah,
+                "pompa_on": pompa_on,
+                "sumber_perintah": sumber_perintah,
+                "waktu": waktu,
+            }
+
+    def update_tank(self, ketinggian_air, persentase_isi, waktu, tangki_id=1):
+        with self._lock:
+            self._tanks[tangki_id] = {
+                "ketinggian_air": ketinggian_air,
+                "persentase_isi": persentase_isi,
+                "waktu": waktu,
+            }
+
+    def get_soil(self, tanaman_id):
+        with self._lock:
+            return self._soil.get(tanaman_id)
+
+    def get_all_soil(self):
+        with self._lock:
+            return dict(self._soil)
+
+    def get_tank(self, tangki_id=1):
+        with self._lock:
+            return self._tanks.get(tangki_id)
+
+    def get_all_tanks(self):
+        with self._lock:
+            return dict(self._tanks)
+
+    def warm(self, db):
+        """Isi cache dari DB (dipanggil sekali saat startup)."""
+        # 1. Baris terbaru tiap tanaman (id terbesar per tanaman_id)
+        terbaru = select(func.max(models.LogKelembapan.id))\
+                    .group_by(models.LogKelembapan.tanaman_id)
+        soil_rows = db.query(models.LogKelembapan)\
+                      .filter(models.LogKelembapan.id.in_(terbaru))\
+                      .all()
+        for row in soil_rows:
+            self.update_soil(row.tanaman_id, row.kelembapan_tanah, row.pompa_on,
+                             row.sumber_perintah, row.created_at)
+
+        # 2. Level terkini tiap tangki (log_tangki = 1 baris per tangki)
+        for tank in db.query(models.LogTangki).all():
+            self.update_tank(tank.ketinggian_air, tank.persentase_isi,
+                             tank.updated_at or tank.created_at, tank.tangki_id)
+
+        return len(soil_rows)
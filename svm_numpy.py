@@ -0,0 +1,138 @@
+import numpy as np
+
+# ==========================================
+# SVM PREDICT_PROBA VERSI NUMPY
+# Model daun cuma 13 fitur, jadi overhead sklearn/libsvm per panggilan
+# (validasi input, konversi, loop C per baris) lebih besar dari hitungannya.
+# Kelas ini menyalin parameter dari SVC + StandardScaler yang sudah dilatih,
+# lalu menghitung probabilitas untuk banyak patch sekaligus dengan NumPy.
+# Rumusnya mengikuti libsvm (decision one-vs-one -> sigmoid Platt -> pairwise coupling).
+# ==========================================
+
+# Batas probabilitas pasangan (sama dengan min_prob di libsvm svm_predict_probability)
+MIN_PROB = 1e-7
+
+
+class NumpySVC:
+    def __init__(self, svm, scaler=None):
+        """
+        svm   : sklearn.svm.SVC yang sudah di-fit (kernel rbf, probability=True)
+        scaler: StandardScaler yang dipakai saat training (opsional)
+        """
+        if svm.kernel != "rbf":
+            raise ValueError(f"Kernel {svm.kernel} belum didukung (hanya rbf)")
+        if not getattr(svm, "probability", False) or len(getattr(svm, "probA_", ())) == 0:
+            raise ValueError("Model dilatih tanpa probability=True")
+
+        self.support_vectors = np.ascontiguousarray(svm.support_vectors_, dtype=np.float64)
+        self.sv_norm = np.einsum("ij,ij->i", self.support_vectors, self.support_vectors)
+        # Koefisien & intercept internal libsvm (atribut publik dibalik tandanya untuk kasus 2 kelas)
+        self.dual_coef = np.asarray(svm._dual_coef_, dtype=np.float64)
+        self.intercept = np.asarray(svm._intercept_, dtype=np.float64)
+        self.prob_a = np.asarray(svm.probA_, dtype=np.float64)
+        self.prob_b = np.asarray(svm.probB_, dtype=np.float64)
+        self.gamma = float(svm._gamma)
+        self.n_class = len(svm.classes_)
+
+        n_support = np.asarray(svm.n_support_)
+        self.sv_start = np.r_[0, np.cumsum(n_support)[:-1]]
+        self.sv_end = np.cumsum(n_support)
+
+        # Parameter scaler (transform = (x - mean) / scale)
+        self.mean = None if scaler is None or scaler.mean_ is None else np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = None if scaler is None or scaler.scale_ is None else np.asarray(scaler.scale_, dtype=np.float64)
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.mean is not None:
+            X = X - self.mean
+        if self.scale is not None:
+            X = X / self.scale
+        return X
+
+    def decision_ovo(self, X):
+        """Nilai keputusan one-vs-one (N x pasangan), urutan pasangan (0,1), (0,2), ..., (1,2), ..."""
+        X = np.asarray(X, dtype=np.float64)
+        # Kernel RBF: exp(-gamma * (|x|^2 + |sv|^2 - 2 x.sv))
+        jarak = np.einsum("ij,ij->i", X, X)[:, None] + self.sv_norm[None, :] - 2.0 * (X @ self.support_vectors.T)
+        K = np.exp(-self.gamma * jarak)
+
+        kolom = []
+        p = 0
+        for i in range(self.n_class):
+            for j in range(i + 1, self.n_class):
+                si, ei = self.sv_start[i], self.sv_end[i]
+                sj, ej = self.sv_start[j], self.sv_end[j]
+                nilai = K[:, si:ei] @ self.dual_coef[j - 1, si:ei] + K[:, sj:ej] @ self.dual_coef[i, sj:ej]
+                kolom.append(nilai + self.intercept[p])
+                p += 1
+        return np.stack(kolom, axis=1)
+
+    def _pairwise(self, dec):
+        # Sigmoid Platt per pasangan -> matriks r (N x k x k), r[i][j] = P(kelas i | i atau j)
+        fApB = dec * self.prob_a + self.prob_b
+        with np.errstate(over="ignore"):
+            positif = np.exp(-np.abs(fApB))
+        # Bentuk stabil libsvm: fApB >= 0 -> e^-f / (1 + e^-f), selain itu 1 / (1 + e^f)
+        prob = np.where(fApB >= 0, positif / (1.0 + positif), 1.0 / (1.0 + positif))
+        prob = np.clip(prob, MIN_PROB, 1 - MIN_PROB)
+
+        n, k = dec.shape[0], self.n_class
+        r = np.zeros((n, k, k))
+        p = 0
+        for i in range(k):
+            for j in range(i + 1, k):
+                r[:, i, j] = prob[:, p]
+                r[:, j, i] = 1 - prob[:, p]
+                p += 1
+        return r
+
+    def _coupling(self, r):
+        """
+        Pairwise coupling (Wu, Lin & Weng 2004), sama dengan multiclass_probability di libsvm,
+        dijalankan untuk semua baris sekaligus; baris yang sudah konvergen dibekukan.
+        """
+        n, k = r.shape[0], self.n_class
+        max_iter = max(100, k)
+        eps = 0.005 / k
+
+        Q = -r.transpose(0, 2, 1) * r  # Q[t][j] = -r[j][t] * r[t][j]
+        diag = (r.transpose(0, 2, 1) ** 2).sum(axis=2) - np.einsum("nii->ni", r) ** 2
+        idx = np.arange(k)
+        Q[:, idx, idx] = diag
+
+        P = np.full((n, k), 1.0 / k)
+        aktif = np.ones(n, dtype=bool)
+        for _ in range(max_iter):
+            Qp = np.einsum("ntj,nj->nt", Q, P)
+            pQp = (P * Qp).sum(axis=1)
+            max_error = np.abs(Qp - pQp[:, None]).max(axis=1)
+            aktif &= max_error >= eps
+            if not aktif.any():
+                break
+
+            a = np.flatnonzero(aktif)
+            Pa, Qa, Qpa, pQpa = P[a], Q[a], Qp[a], pQp[a]
+            for t in range(k):
+                Qtt = Qa[:, t, t]
+                diff = (-Qpa[:, t] + pQpa) / Qtt
+                Pa[:, t] += diff
+                pQpa = (pQpa + diff * (diff * Qtt + 2 * Qpa[:, t])) / (1 + diff) / (1 + diff)
+                Qpa = (Qpa + diff[:, None] * Qa[:, t, :]) / (1 + diff)[:, None]
+                Pa /= (1 + diff)[:, None]
+            P[a] = Pa
+        return P
+
+    def predict_proba(self, X, scaled=False):
+        """
+        X     : fitur (N x 13)
+        scaled: True kalau X sudah di-transform scaler
+        Output: probabilitas per kelas (N x jumlah kelas), urutan kolom = svm.classes_
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.shape[0] == 0:
+            return np.zeros((0, self.n_class))
+        if not scaled:
+            X = self.transform(X)
+        # libsvm versi sklearn tetap memakai coupling walaupun hanya 2 kelas
+        return self._coupling(self._pairwise(self.decision_ovo(X)))
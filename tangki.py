@@ -0,0 +1,166 @@
+import threading
+
+from sqlalchemy import inspect, insert
+
+import models
+from metrics import Counter
+
+# ==========================================
+# REGISTRY TANGKI AIR (BANYAK TANGKI)
+# Dulu hanya ada 1 tangki: tinggi 100 cm ditulis langsung di endpoint, dan setiap
+# laporan = SELECT baris pertama log_tangki lalu UPDATE (2 kali bolak-balik ke DB).
+# Sekarang:
+# - Tiap tangki punya tangki_id + geometri di memori (env TANK_CONFIG)
+# - log_tangki berisi 1 baris per tangki (UNIQUE tangki_id), ditulis dengan 1 statement
+#   upsert native: MySQL "INSERT ... ON DUPLICATE KEY UPDATE",
+#   SQLite / PostgreSQL "INSERT ... ON CONFLICT (tangki_id) DO UPDATE"
+# - Riwayat level (opsional) ke log_tangki_riwayat, maksimal 1 baris per tangki tiap
+#   riwayat_detik (sampling, bukan setiap laporan)
+# ==========================================
+
+# Geometri default = perilaku lama (1 tangki setinggi 100 cm)
+# - tinggi_cm      : jarak sensor ke dasar tangki saat kosong (dikurangi offset_cm)
+# - offset_cm      : jarak sensor ke permukaan air saat tangki penuh
+# - kapasitas_liter: isi tangki saat penuh (0 = tidak diketahui, volume tidak dihitung)
+TANGKI_DEFAULT = "1:100"
+
+UPSERT_TOTAL = Counter("tank_upsert_total", "Jumlah laporan level tangki yang ditulis (upsert)")
+RIWAYAT_TOTAL = Counter("tank_history_rows_total", "Jumlah baris riwayat level tangki yang ditulis")
+
+
+def parse_konfigurasi_tangki(teks):
+    """
+    "1:100,2:150:5:2000" -> {1: {...}, 2: {...}} (format env TANK_CONFIG)
+    Per tangki: id:tinggi_cm[:offset_cm[:kapasitas_liter]]
+    """
+    hasil = {}
+    for bagian in (teks or "").split(","):
+        if not bagian.strip():
+            continue
+        nilai = bagian.split(":")
+        if len(nilai) < 2:
+            raise ValueError(f"Format TANK_CONFIG salah: {bagian!r} (contoh 1:100 atau 2:150:5:2000)")
+        tinggi = float(nilai[1])
+        if tinggi <= 0:
+            raise ValueError(f"Tinggi tangki {nilai[0]} harus > 0")
+        hasil[int(nilai[0])] = {
+            "tinggi_cm": tinggi,
+            "offset_cm": float(nilai[2]) if len(nilai) > 2 else 0.0,
+            "kapasitas_liter": float(nilai[3]) if len(nilai) > 3 else 0.0,
+        }
+    return hasil
+
+
+class RegistriTangki:
+    def __init__(self, tangki, riwayat_detik=0):
+        """
+        tangki       : {tangki_id: geometri} (lihat parse_konfigurasi_tangki)
+        riwayat_detik: jarak minimal antar baris riwayat per tangki (0 = riwayat mati)
+        """
+        self._tangki = dict(tangki)
+        self.riwayat_detik = riwayat_detik
+        self._riwayat_terakhir = {}  # tangki_id -> waktu baris riwayat terakhir
+        self._lock = threading.Lock()
+
+    def ambil(self, tangki_id):
+        return self._tangki.get(tangki_id)
+
+    def daftar(self):
+        return dict(self._tangki)
+
+    def hitung(self, tangki_id, jarak_cm):
+        """
+        Jarak sensor ultrasonik -> (ketinggian_air cm, persentase_isi 0-100, volume liter / None).
+        Output: None kalau tangki_id belum terdaftar.
+        """
+        geo = self._tangki.get(tangki_id)
+        if geo is None:
+            return None
+        tinggi = geo["tinggi_cm"]
+        level = min(max(tinggi - (jarak_cm - geo["offset_cm"]), 0.0), tinggi)
+        persen = level / tinggi * 100
+        volume = geo["kapasitas_liter"] * persen / 100 if geo["kapasitas_liter"] else None
+        return level, persen, volume
+
+    def perlu_riwayat(self, tangki_id, waktu):
+        """True kalau laporan ini perlu jadi baris riwayat (waktu terakhir langsung diperbarui)."""
+        if not self.riwayat_detik:
+            return False
+        with self._lock:
+            lama = self._riwayat_terakhir.get(tangki_id)
+            if lama is not None and (waktu - lama).total_seconds() < self.riwayat_detik:
+                return False
+            self._riwayat_terakhir[tangki_id] = waktu
+            return True
+
+    def lupakan_riwayat(self, tangki_id):
+        # Dipanggil kalau transaksi gagal -> laporan berikutnya boleh menulis riwayat lagi
+        with self._lock:
+            self._riwayat_terakhir.pop(tangki_id, None)
+
+
+def upsert_level(dialect, tangki_id, ketinggian_air, persentase_isi, waktu):
+    """
+    1 statement INSERT-or-UPDATE untuk baris tangki_id di log_tangki (tanpa SELECT dulu).
+    dialect: nama dialect engine ("mysql", "sqlite", "postgresql")
+    """
+    tabel = models.LogTangki.__table__
+    nilai = {
+        "tangki_id": tangki_id,
+        "ketinggian_air": ketinggian_air,
+        "persentase_isi": persentase_isi,
+        "updated_at": waktu,
+    }
+    ubah = ("ketinggian_air", "persentase_isi", "updated_at")
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(tabel).values(**nilai)
+        return stmt.on_duplicate_key_update({k: stmt.inserted[k] for k in ubah})
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as insert_dialect
+        else:
+            from sqlalchemy.dialects.postgresql import insert as insert_dialect
+
+        stmt = insert_dialect(tabel).values(**nilai)
+        return stmt.on_conflict_do_update(index_elements=["tangki_id"],
+                                          set_={k: stmt.excluded[k] for k in ubah})
+    raise ValueError(f"Upsert log_tangki belum didukung untuk database {dialect}")
+
+
+def insert_riwayat(tangki_id, ketinggian_air, persentase_isi, waktu):
+    return insert(models.LogTangkiRiwayat).values(
+        tangki_id=tangki_id,
+        ketinggian_air=ketinggian_air,
+        persentase_isi=persentase_isi,
+        created_at=waktu,
+    )
+
+
+def punya_unique_tangki(engine):
+    # Nama index dari migration Laravel boleh beda, yang dicek kolomnya
+    pemeriksa = inspect(engine)
+    tabel = models.LogTangki.__tablename__
+    if "tangki_id" not in {k["name"] for k in pemeriksa.get_columns(tabel)}:
+        return False
+    unik = [i["column_names"] for i in pemeriksa.get_indexes(tabel) if i.get("unique")]
+    unik += [u["column_names"] for u in pemeriksa.get_unique_constraints(tabel)]
+    return ["tangki_id"] in unik
+
+
+def siapkan_tabel(engine):
+    """
+    Buat tabel riwayat (milik FastAPI) + pastikan log_tangki sudah siap untuk upsert.
+    Tabel log_tangki milik Laravel dan TIDAK diubah di sini; kolom & index-nya dari migration:
+        $table->unsignedInteger('tangki_id')->default(1)->unique()->after('id');
+    (atau jalankan: python migrasi_tangki.py --jalankan)
+    Melempar RuntimeError kalau kolom tangki_id / UNIQUE-nya belum ada.
+    """
+    models.Base.metadata.create_all(bind=engine, tables=[models.LogTangkiRiwayat.__table__])
+    if not punya_unique_tangki(engine):
+        raise RuntimeError(
+            "log_tangki belum punya kolom tangki_id dengan UNIQUE index. "
+            "Jalankan migration Laravel-nya atau 'python migrasi_tangki.py --jalankan'"
+        )
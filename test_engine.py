@@ -1,5 +1,6 @@
 from ai_engine import LeafDiseaseDetector
 import json
+import numpy as np
 
 # Inisialisasi Engine
 try:
@@ -16,6 +17,26 @@ try:
     # Tampilkan Hasil
     print("\n=== HASIL PREDIKSI ===")
     print(json.dumps(hasil, indent=4))
+
+    # Bandingkan dengan jalur fitur lama (cv2 + mahotas per patch)
+    engine_lama = LeafDiseaseDetector(model_folder="ai_models", vectorized_features=False)
+    hasil_lama = engine_lama.predict_image(gambar_tes)
+    print("Sama dengan jalur lama:", hasil == hasil_lama)
+    # Profil lain (resolusi kecil / kotak tumpang tindih) juga harus sama di kedua jalur
+    for profil in ("fast", "accurate"):
+        print(f"Profil {profil} sama dengan jalur lama:",
+              engine.predict_image(gambar_tes, profil=profil) == engine_lama.predict_image(gambar_tes, profil=profil))
+
+    # Bandingkan predict_proba NumpySVC dengan sklearn (patch gambar tes + fitur acak)
+    fitur = np.array(engine._image_features(gambar_tes))
+    acak = engine.scaler.mean_ + np.random.default_rng(0).normal(size=(2000, fitur.shape[1])) * engine.scaler.scale_
+    for nama, X in (("patch gambar", fitur), ("fitur acak", acak)):
+        prob_np = engine.numpy_svm.predict_proba(X)
+        prob_sk = engine.svm.predict_proba(engine.scaler.transform(X))
+        print(f"NumpySVC vs sklearn ({nama}): selisih maks {np.abs(prob_np - prob_sk).max():.2e},",
+              "argmax sama:", bool((prob_np.argmax(axis=1) == prob_sk.argmax(axis=1)).all()))
+    engine_sklearn = LeafDiseaseDetector(model_folder="ai_models", numpy_svm=False)
+    print("Sama dengan jalur sklearn:", hasil == engine_sklearn.predict_image(gambar_tes))
     
 except Exception as e:
     print(f"Terjadi Error: {e}")
\ No newline at end of file
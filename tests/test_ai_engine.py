@@ -0,0 +1,73 @@
+import cv2
+import mahotas
+import numpy as np
+import pytest
+
+from ai_engine import FEATURE_ATOL, FEATURE_RTOL, _glcm_features_batch
+from profil_deteksi import PROFIL_DETEKSI
+
+
+def _jpeg(img):
+    return cv2.imencode(".jpg", img)[1].tobytes()
+
+
+def _haralick(patch):
+    try:
+        return mahotas.features.haralick(patch, ignore_zeros=True).mean(axis=0)[[1, 2, 8, 4]]
+    except ValueError:
+        return None
+
+
+def test_glcm_batch_sama_dengan_mahotas():
+    rng = np.random.default_rng(0)
+    patches = rng.integers(0, 256, size=(40, 64, 64), dtype=np.uint8)
+    patches[::3, :32] = 0                                      # sebagian patch banyak nol
+    patches[5] = rng.integers(100, 103, size=(64, 64))         # hampir rata -> correlation ~0
+    patches[7] = 0                                             # semua nol -> tidak valid
+    patches[8] = 0
+    patches[8, 10, 10] = 50                                    # tanpa pasangan bukan-nol
+
+    fitur, valid = _glcm_features_batch(patches)
+    for i, patch in enumerate(patches):
+        lama = _haralick(patch)
+        assert valid[i] == (lama is not None)
+        if lama is not None:
+            np.testing.assert_allclose(fitur[i], lama, rtol=FEATURE_RTOL, atol=FEATURE_ATOL)
+
+
+def test_glcm_batch_tanpa_pasangan_bukan_nol():
+    fitur, valid = _glcm_features_batch(np.zeros((3, 64, 64), dtype=np.uint8))
+
+    assert fitur.shape == (3, 4)
+    assert not valid.any()
+
+
+@pytest.mark.parametrize("profil", sorted(PROFIL_DETEKSI))
+def test_fitur_vectorized_sama_dengan_jalur_mahotas(detector, gambar_daun, profil):
+    setelan = PROFIL_DETEKSI[profil]
+    img, gray, coords = detector._prepare_image(gambar_daun, setelan["image_size"], setelan["stride"])
+    assert coords
+
+    fitur, valid = detector._extract_features_batch(img, gray, coords)
+    ps = detector.PATCH_SIZE
+    for i, (y, x) in enumerate(coords):
+        lama = detector._extract_features(img[y:y + ps, x:x + ps])
+        assert valid[i] == (lama is not None)
+        if lama is not None:
+            np.testing.assert_allclose(fitur[i], lama, rtol=FEATURE_RTOL, atol=FEATURE_ATOL)
+
+
+@pytest.mark.parametrize("profil", sorted(PROFIL_DETEKSI))
+def test_gambar_hitam_tidak_terdeteksi(detector, profil):
+    hasil = detector.predict_image(_jpeg(np.zeros((600, 600, 3), dtype=np.uint8)), profil=profil)
+
+    assert hasil["dominan"] == "Tidak Terdeteksi"
+    assert hasil["profil"] == profil
+
+
+def test_batch_dengan_gambar_hitam(detector, gambar_daun):
+    hitam = _jpeg(np.zeros((600, 600, 3), dtype=np.uint8))
+    hasil = detector.predict_images([hitam, gambar_daun])
+
+    assert hasil[0]["dominan"] == "Tidak Terdeteksi"
+    assert hasil[1] == detector.predict_image(gambar_daun)
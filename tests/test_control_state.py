@@ -0,0 +1,184 @@
+import pytest
+
+import control_state
+from control_state import DatabaseControlState, MemoryControlState, SQLiteControlState, buat_control_state
+
+
+@pytest.fixture(params=["memory", "sqlite", "database"])
+def state(request, tmp_path, session_factory):
+    if request.param == "memory":
+        s = MemoryControlState()
+    elif request.param == "sqlite":
+        s = SQLiteControlState(str(tmp_path / "control_state.db"))
+    else:
+        s = DatabaseControlState(session_factory, cache_detik=60)
+    yield s
+    s.close()
+
+
+def test_manual_per_tanaman(state):
+    state.set_manual(1, True)
+
+    assert state.is_manual(1)
+    assert not state.is_manual(2)
+    state.set_manual(1, False)
+    assert not state.is_manual(1)
+
+
+def test_manual_semua_tanaman(state):
+    state.set_manual(None, True)
+
+    assert state.is_manual(1)
+    assert state.is_manual(99)
+
+
+def test_off_semua_mematikan_manual_per_tanaman(state):
+    state.set_manual(1, True)
+    state.set_manual(2, True)
+    state.set_manual(None, True)
+
+    state.set_manual(None, False)
+    assert not state.is_manual(1)
+    assert not state.is_manual(2)
+    assert not any(state.semua().values())
+
+
+def test_matikan_manual_saat_tanah_basah(state):
+    state.set_manual(1, True)
+    state.set_manual(None, True)
+
+    assert state.matikan_manual(1)
+    assert not state.is_manual(1)
+    assert not state.is_manual(2)
+    assert not state.matikan_manual(1)
+
+
+def test_sqlite_dibagi_antar_proses(tmp_path):
+    # 2 objek = 2 worker yang membuka file yang sama
+    path = str(tmp_path / "control_state.db")
+    a = buat_control_state("sqlite", path=path)
+    b = buat_control_state("sqlite", path=path)
+    try:
+        assert not b.is_manual(1)
+        a.set_manual(1, True)
+        assert b.is_manual(1)
+    finally:
+        a.close()
+        b.close()
+
+
+def test_backend_tidak_dikenal():
+    with pytest.raises(ValueError):
+        buat_control_state("redis")
+
+
+class _PabrikSession:
+    """session_factory yang bisa dialihkan ke database mati + menghitung jumlah session dibuka."""
+
+    def __init__(self, asli):
+        self.asli = asli
+        self.dibuka = 0
+        self.sebelum_query = None
+
+    def __call__(self):
+        self.dibuka += 1
+        if self.sebelum_query:
+            self.sebelum_query()
+        return self.asli()
+
+
+def test_database_mati_pakai_status_terakhir(session_factory, session_rusak):
+    pabrik = _PabrikSession(session_factory)
+    state = DatabaseControlState(pabrik, cache_detik=0)
+    state.set_manual(1, True)
+    assert state.is_manual(1)
+
+    pabrik.asli = session_rusak
+    assert state.is_manual(1)
+    assert not state.is_manual(2)
+
+
+def test_database_mati_dicoba_lagi_setelah_jeda(session_factory, session_rusak, monkeypatch):
+    jam = [1000.0]
+    monkeypatch.setattr(control_state.time, "monotonic", lambda: jam[0])
+    pabrik = _PabrikSession(session_factory)
+    state = DatabaseControlState(pabrik, cache_detik=5)
+    state.set_manual(1, True)
+    assert state.is_manual(1)
+
+    pabrik.asli = session_rusak
+    jam[0] += 6
+    dibuka = pabrik.dibuka
+    for _ in range(10):
+        assert state.is_manual(1)
+        assert not state.matikan_manual(2)
+    assert pabrik.dibuka == dibuka + 1  # 1 percobaan per jendela cache_detik, bukan tiap panggilan
+
+    jam[0] += 6
+    assert state.is_manual(1)
+    assert pabrik.dibuka == dibuka + 2
+
+    # DB pulih -> setelah jeda berikutnya dibaca lagi dari DB
+    pabrik.asli = session_factory
+    jam[0] += 6
+    assert state.is_manual(1)
+    assert pabrik.dibuka == dibuka + 3
+    assert state.is_manual(1)
+    assert pabrik.dibuka == dibuka + 3
+
+
+def test_database_mati_jeda_minimal_tanpa_cache(session_rusak, monkeypatch):
+    jam = [1000.0]
+    monkeypatch.setattr(control_state.time, "monotonic", lambda: jam[0])
+    pabrik = _PabrikSession(session_rusak)
+    state = DatabaseControlState(pabrik, cache_detik=0)
+
+    assert not state.is_manual(1)
+    assert not state.is_manual(1)
+    assert pabrik.dibuka == 1
+    jam[0] += control_state.JEDA_GAGAL_MIN
+    assert not state.is_manual(1)
+    assert pabrik.dibuka == 2
+
+
+def test_database_mati_sejak_awal_semua_auto(session_rusak):
+    state = DatabaseControlState(session_rusak)
+
+    assert not state.is_manual(1)
+    assert state.semua() == {}
+
+
+def test_tulisan_gagal_tidak_mengubah_status_terakhir(session_factory, session_rusak):
+    pabrik = _PabrikSession(session_factory)
+    state = DatabaseControlState(pabrik, cache_detik=0)
+    state.set_manual(1, True)
+    assert state.is_manual(1)
+
+    pabrik.asli = session_rusak
+    with pytest.raises(RuntimeError):
+        state.set_manual(1, False)
+    assert state.is_manual(1)
+
+
+def test_tulisan_membuat_cache_kadaluarsa(session_factory):
+    state = DatabaseControlState(session_factory, cache_detik=60)
+    assert not state.is_manual(1)
+
+    state.set_manual(1, True)
+    assert state.is_manual(1)
+
+
+def test_hasil_baca_basi_tidak_disimpan(session_factory):
+    pabrik = _PabrikSession(session_factory)
+    state = DatabaseControlState(pabrik, cache_detik=60)
+
+    # Tulisan dari thread lain tepat saat query baca berjalan
+    pabrik.sebelum_query = state._buang_cache
+    state.is_manual(1)
+    pabrik.sebelum_query = None
+
+    dibuka = pabrik.dibuka
+    state.is_manual(1)
+    assert pabrik.dibuka == dibuka + 1  # dibaca ulang dari DB, bukan dari cache basi
+    state.is_manual(1)
+    assert pabrik.dibuka == dibuka + 1
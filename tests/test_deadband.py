@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from deadband import KEPUTUSAN, DeadbandFilter, parse_ambang_per_tanaman
+
+AWAL = datetime(2026, 1, 1, 10, 0, 0)
+
+
+def _detik(n):
+    return AWAL + timedelta(seconds=n)
+
+
+def test_laporan_pertama_selalu_ditulis():
+    f = DeadbandFilter(ambang=1.0)
+    ditulis = KEPUTUSAN.value(keputusan="tulis", alasan="pertama")
+
+    assert f.perlu_tulis(1, 50.0, False, "AUTO", AWAL)
+    assert KEPUTUSAN.value(keputusan="tulis", alasan="pertama") == ditulis + 1
+
+
+def test_perubahan_kecil_dilewati_perubahan_besar_ditulis():
+    f = DeadbandFilter(ambang=1.0)
+    f.perlu_tulis(1, 50.0, False, "AUTO", AWAL)
+
+    assert not f.perlu_tulis(1, 50.5, False, "AUTO", _detik(10))
+    # Dibandingkan dengan nilai yang terakhir DITULIS (50.0), bukan laporan terakhir (50.5)
+    assert f.perlu_tulis(1, 51.0, False, "AUTO", _detik(20))
+    assert not f.perlu_tulis(1, 50.2, False, "AUTO", _detik(30))
+
+
+def test_perubahan_pompa_selalu_ditulis():
+    f = DeadbandFilter(ambang=5.0)
+    f.perlu_tulis(1, 50.0, False, "AUTO", AWAL)
+
+    assert f.perlu_tulis(1, 50.0, True, "AUTO", _detik(10))
+    assert f.perlu_tulis(1, 50.0, True, "MANUAL", _detik(20))
+
+
+def test_heartbeat():
+    f = DeadbandFilter(ambang=5.0, heartbeat_detik=300)
+    f.perlu_tulis(1, 50.0, False, "AUTO", AWAL)
+
+    assert not f.perlu_tulis(1, 50.0, False, "AUTO", _detik(299))
+    assert f.perlu_tulis(1, 50.0, False, "AUTO", _detik(300))
+    assert not f.perlu_tulis(1, 50.0, False, "AUTO", _detik(400))
+
+
+def test_tanpa_heartbeat():
+    f = DeadbandFilter(ambang=5.0, heartbeat_detik=0)
+    f.perlu_tulis(1, 50.0, False, "AUTO", AWAL)
+
+    assert not f.perlu_tulis(1, 50.0, False, "AUTO", _detik(86400))
+
+
+def test_data_terlambat_ditulis_tanpa_mengubah_nilai_terakhir():
+    f = DeadbandFilter(ambang=5.0)
+    f.perlu_tulis(1, 50.0, False, "AUTO", AWAL)
+
+    assert f.perlu_tulis(1, 50.0, False, "AUTO", _detik(-60))
+    assert not f.perlu_tulis(1, 51.0, False, "AUTO", _detik(10))
+
+
+def test_ambang_per_tanaman():
+    f = DeadbandFilter(ambang=5.0, ambang_per_tanaman={2: 0.5})
+    f.perlu_tulis(1, 50.0, False, "AUTO", AWAL)
+    f.perlu_tulis(2, 50.0, False, "AUTO", AWAL)
+
+    assert not f.perlu_tulis(1, 51.0, False, "AUTO", _detik(10))
+    assert f.perlu_tulis(2, 51.0, False, "AUTO", _detik(10))
+
+
+def test_ambang_nol_menulis_setiap_laporan():
+    f = DeadbandFilter(ambang=0.0)
+    assert not f.aktif
+    f.perlu_tulis(1, 50.0, False, "AUTO", AWAL)
+
+    assert f.perlu_tulis(1, 50.0, False, "AUTO", _detik(1))
+    assert DeadbandFilter(ambang=0.0, ambang_per_tanaman={3: 1.0}).aktif
+
+
+def test_isi_dan_lupakan():
+    f = DeadbandFilter(ambang=5.0)
+    f.isi(1, 50.0, False, "AUTO", AWAL)
+    assert not f.perlu_tulis(1, 51.0, False, "AUTO", _detik(10))
+
+    # Baris gagal masuk DB -> laporan berikutnya ditulis lagi
+    f.lupakan(1)
+    assert f.perlu_tulis(1, 51.0, False, "AUTO", _detik(20))
+
+
+def test_parse_ambang_per_tanaman():
+    assert parse_ambang_per_tanaman("1:0.5, 3:2") == {1: 0.5, 3: 2.0}
+    assert parse_ambang_per_tanaman("") == {}
+    with pytest.raises(ValueError):
+        parse_ambang_per_tanaman("1")
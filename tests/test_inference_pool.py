@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import uuid
+
+import pytest
+
+import inference_pool
+from image_store import ImageStore
+from inference_pool import REJECTED, InferencePool, PoolPenuh
+
+HASIL = {"dominan": "Daun Sehat", "confidence": 90.0, "detail": {"daun sehat": 100.0},
+         "patch_dievaluasi": 1, "patch_kandidat": 1, "profil": "standard"}
+
+
+class DetectorTertahan:
+    """Detector palsu: predict_image baru selesai setelah lepas() dipanggil."""
+
+    def __init__(self):
+        self.mulai = threading.Semaphore(0)
+        self._lepas = threading.Event()
+
+    def lepas(self):
+        self._lepas.set()
+
+    def predict_image(self, data, early_exit=False, profil=None):
+        self.mulai.release()
+        assert self._lepas.wait(10)
+        return dict(HASIL)
+
+    def predict_images(self, datas, profil=None):
+        return [self.predict_image(data) for data in datas]
+
+    def ambil_statistik(self):
+        return {}
+
+
+@pytest.fixture
+def pool_tertahan(monkeypatch):
+    monkeypatch.setattr(inference_pool, "_detector", None)
+    detector = DetectorTertahan()
+    pool = InferencePool(mode="thread", workers=1, max_queue=1)
+    pool.start(detector)
+    yield pool, detector
+    detector.lepas()
+    pool.shutdown()
+
+
+def test_pool_menolak_saat_antrian_penuh(pool_tertahan):
+    pool, detector = pool_tertahan
+
+    async def skenario():
+        # 1 diproses + 1 antri = kapasitas; berikutnya ditolak
+        tasks = [pool.submit("predict_image", b"a"), pool.submit("predict_image", b"b")]
+        assert pool.penuh()
+        ditolak = REJECTED.value()
+        with pytest.raises(PoolPenuh):
+            pool.submit("predict_image", b"c")
+        assert REJECTED.value() == ditolak + 1
+
+        detector.lepas()
+        assert await asyncio.gather(*tasks) == [HASIL, HASIL]
+        assert not pool.penuh()
+        assert pool._pending == 0
+
+    asyncio.run(skenario())
+
+
+def test_slot_dilepas_kalau_prediksi_gagal(pool_tertahan):
+    pool, _ = pool_tertahan
+
+    async def skenario():
+        with pytest.raises(AttributeError):
+            await pool.run("method_tidak_ada")
+        assert pool._pending == 0
+
+    asyncio.run(skenario())
+
+
+@pytest.fixture
+def api_pool_penuh(api, client, monkeypatch, tmp_path):
+    """API dengan pool berkapasitas 1 yang sedang dipakai 1 job async (belum selesai)."""
+    monkeypatch.setattr(api, "image_store", ImageStore(str(tmp_path / "python"), str(tmp_path / "laravel")))
+    monkeypatch.setattr(inference_pool, "_detector", None)
+    detector = DetectorTertahan()
+    pool = InferencePool(mode="thread", workers=1, max_queue=0)
+    pool.start(detector)
+    monkeypatch.setattr(api, "ai_engine", detector)
+    monkeypatch.setattr(api, "inference_pool", pool)
+
+    r = client.post("/iot/detect-disease", params={"tanaman_id": 920, "mode": "async"},
+                    files={"file": ("a.jpg", uuid.uuid4().bytes, "image/jpeg")})  # bukan dari cache
+    assert r.status_code == 202
+    assert detector.mulai.acquire(timeout=10)
+    assert pool.penuh()
+    job_id = r.json()["job_id"]
+    yield client, detector, job_id
+    detector.lepas()
+    _tunggu_job(client, job_id)
+    pool.shutdown()
+
+
+def _tunggu_job(client, job_id):
+    for _ in range(200):
+        status = client.get(f"/iot/detect-disease/jobs/{job_id}").json()
+        if status["status"] not in ("queued", "processing"):
+            return status
+        threading.Event().wait(0.05)
+    raise AssertionError(f"Job {job_id} tidak selesai")
+
+
+def test_deteksi_503_retry_after_saat_antrian_penuh(api, api_pool_penuh):
+    client, detector, job_id = api_pool_penuh
+
+    for mode in ("sync", "async"):
+        r = client.post("/iot/detect-disease", params={"tanaman_id": 920, "mode": mode},
+                        files={"file": ("b.jpg", b"gambar-kedua", "image/jpeg")})
+        assert r.status_code == 503
+        assert r.headers["Retry-After"] == str(api.INFERENCE_RETRY_AFTER)
+
+    # Job yang sudah diterima tetap selesai setelah worker lowong
+    detector.lepas()
+    status = _tunggu_job(client, job_id)
+    assert status["status"] == "done"
+    assert status["hasil"]["hasil"] == "Daun Sehat"
+
+
+def test_batch_503_retry_after_saat_antrian_penuh(api, api_pool_penuh):
+    client, _, _ = api_pool_penuh
+
+    r = client.post("/iot/detect-disease/batch", params={"tanaman_id": 920},
+                    files=[("files", ("b.jpg", b"gambar-kedua", "image/jpeg"))])
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == str(api.INFERENCE_RETRY_AFTER)
@@ -0,0 +1,150 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+from ingest_buffer import WriteBehindBuffer
+
+
+def _baris(tanaman_id, kelembapan):
+    sekarang = datetime(2026, 1, 1, 10, 0, 0)
+    return {
+        "tanaman_id": tanaman_id,
+        "kelembapan_tanah": kelembapan,
+        "pompa_on": False,
+        "sumber_perintah": "AUTO",
+        "created_at": sekarang,
+        "updated_at": sekarang,
+    }
+
+
+def _isi_tabel(session_factory):
+    db = session_factory()
+    try:
+        return [(r.tanaman_id, r.kelembapan_tanah)
+                for r in db.query(models.LogKelembapan).order_by(models.LogKelembapan.id)]
+    finally:
+        db.close()
+
+
+def _buffer(session_factory, **kwargs):
+    return WriteBehindBuffer(session_factory, models.LogKelembapan, nama="tes_soil", **kwargs)
+
+
+def test_flush_menulis_semua_baris(session_factory):
+    buf = _buffer(session_factory)
+    for i in range(5):
+        assert buf.add(_baris(1, 40.0 + i))
+
+    assert buf.flush() == 5
+    assert buf.flush() == 0
+    assert _isi_tabel(session_factory) == [(1, 40.0 + i) for i in range(5)]
+    assert buf.depth.value() == 0
+
+
+def test_stop_menguras_sisa_buffer(session_factory):
+    buf = _buffer(session_factory, flush_rows=1000, flush_interval=60)
+    buf.start()
+    buf.add(_baris(1, 50.0))
+    buf.add(_baris(2, 60.0))
+    buf.stop()
+
+    assert _isi_tabel(session_factory) == [(1, 50.0), (2, 60.0)]
+
+
+def test_flush_gagal_baris_dikembalikan_ke_depan():
+    # Tabel belum ada -> INSERT gagal seperti saat DB bermasalah
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    session_factory = sessionmaker(bind=engine)
+    buf = _buffer(session_factory)
+    buf.add(_baris(1, 10.0))
+    buf.add(_baris(1, 11.0))
+
+    assert buf.flush() == 0
+    assert buf.depth.value() == 2
+
+    # Baris baru masuk setelah baris yang gagal; DB pulih -> urutan tetap
+    buf.add(_baris(1, 12.0))
+    models.Base.metadata.create_all(engine, tables=[models.LogKelembapan.__table__])
+    assert buf.flush() == 3
+    assert _isi_tabel(session_factory) == [(1, 10.0), (1, 11.0), (1, 12.0)]
+
+
+def test_flush_gagal_dengan_session_rusak(session_rusak):
+    buf = _buffer(session_rusak)
+    buf.add(_baris(1, 10.0))
+
+    assert buf.flush() == 0
+    assert buf.depth.value() == 1
+    assert buf.dropped.value() == 0
+
+
+def test_buffer_penuh_membuang_baris(session_rusak):
+    buf = _buffer(session_rusak, max_rows=2)
+    assert buf.add(_baris(1, 1.0))
+    assert buf.add(_baris(1, 2.0))
+    assert not buf.add(_baris(1, 3.0))
+    assert buf.dropped.value() == 1
+
+
+def test_pengembalian_melebihi_kapasitas_dihitung_dibuang(session_rusak):
+    buf = _buffer(session_rusak, max_rows=3)
+    for i in range(3):
+        buf.add(_baris(1, float(i)))
+
+    # Selama flush berjalan buffer terisi lagi, jadi baris gagal hanya muat sebagian
+    asli = buf.session_factory
+
+    def session_lalu_isi():
+        buf.add(_baris(2, 99.0))
+        buf.add(_baris(2, 98.0))
+        return asli()
+
+    buf.session_factory = session_lalu_isi
+    assert buf.flush() == 0
+    assert buf.depth.value() == 3
+    assert buf.dropped.value() == 2
+
+
+def test_nilai_tidak_hingga_ditolak(session_factory):
+    buf = _buffer(session_factory)
+    assert not buf.add(_baris(1, float("nan")))
+    assert not buf.add(_baris(1, float("inf")))
+    assert buf.add(_baris(1, 40.0))
+
+    assert buf.rejected.value() == 2
+    assert buf.flush() == 1
+    assert _isi_tabel(session_factory) == [(1, 40.0)]
+
+
+def test_baris_rusak_dibuang_setelah_maks_percobaan(session_factory):
+    buf = _buffer(session_factory, maks_percobaan=2)
+    racun = _baris(1, 0.0)
+    racun["kelembapan_tanah"] = {"bukan": "angka"}  # ditolak driver DB
+    buf.add(_baris(1, 10.0))
+    buf.add(racun)
+    buf.add(_baris(1, 11.0))
+
+    # Baris sehat tetap tertulis, baris rusak kembali ke buffer
+    assert buf.flush() == 2
+    assert buf.depth.value() == 1
+    assert buf.dropped.value() == 0
+
+    buf.add(_baris(1, 12.0))
+    assert buf.flush() == 1
+    assert buf.depth.value() == 0
+    assert buf.dropped.value() == 1
+    assert _isi_tabel(session_factory) == [(1, 10.0), (1, 11.0), (1, 12.0)]
+
+
+def test_database_mati_tidak_dihitung_percobaan(session_rusak):
+    buf = _buffer(session_rusak, maks_percobaan=1)
+    buf.add(_baris(1, 10.0))
+    buf.add(_baris(1, 11.0))
+
+    for _ in range(3):
+        assert buf.flush() == 0
+    assert buf.depth.value() == 2
+    assert buf.dropped.value() == 0
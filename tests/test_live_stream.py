@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+
+from live_stream import EVENTS_DROPPED, LiveBroker, format_sse
+
+
+def _jalankan(skenario):
+    async def utama():
+        broker = LiveBroker(max_queue=2, max_subscribers=2)
+        broker.attach_loop(asyncio.get_running_loop())
+        await skenario(broker)
+
+    asyncio.run(utama())
+
+
+async def _isi_antrian(sub):
+    await asyncio.sleep(0.05)  # beri waktu call_soon_threadsafe dijalankan loop
+    hasil = []
+    while not sub.queue.empty():
+        hasil.append(sub.queue.get_nowait())
+    return hasil
+
+
+def test_publish_dari_thread_lain_sesuai_filter():
+    async def skenario(broker):
+        semua = broker.subscribe()
+        satu = broker.subscribe([1])
+
+        t = threading.Thread(target=lambda: [
+            broker.publish("soil", {"tanaman_id": 1, "kelembapan_tanah": 40.0}),
+            broker.publish("soil", {"tanaman_id": 2, "kelembapan_tanah": 50.0}),
+        ])
+        t.start()
+        t.join()
+
+        assert [e["data"]["tanaman_id"] for e in await _isi_antrian(semua)] == [1, 2]
+        assert [e["data"]["tanaman_id"] for e in await _isi_antrian(satu)] == [1]
+
+    _jalankan(skenario)
+
+
+def test_event_tanpa_tanaman_dikirim_ke_semua():
+    async def skenario(broker):
+        sub = broker.subscribe([5])
+        broker.publish("tank", {"tangki_id": 1, "persentase_isi": 80.0})
+        assert [e["event"] for e in await _isi_antrian(sub)] == ["tank"]
+
+    _jalankan(skenario)
+
+
+def test_pelanggan_lambat_membuang_event_lama():
+    async def skenario(broker):
+        sub = broker.subscribe()
+        dibuang = EVENTS_DROPPED.value(event="soil")
+        for i in range(5):
+            broker.publish("soil", {"tanaman_id": 1, "kelembapan_tanah": float(i)})
+
+        assert [e["data"]["kelembapan_tanah"] for e in await _isi_antrian(sub)] == [3.0, 4.0]
+        assert EVENTS_DROPPED.value(event="soil") == dibuang + 3
+
+    _jalankan(skenario)
+
+
+def test_batas_pelanggan_dan_unsubscribe():
+    async def skenario(broker):
+        a = broker.subscribe()
+        assert broker.subscribe() is not None
+        assert broker.subscribe() is None
+
+        broker.unsubscribe(a)
+        assert broker.subscribe() is not None
+
+    _jalankan(skenario)
+
+
+def test_publish_sebelum_loop_terpasang_diabaikan():
+    broker = LiveBroker()
+    broker.subscribe()
+    broker.publish("soil", {"tanaman_id": 1})
+
+
+def test_format_sse():
+    teks = format_sse({"event": "soil", "data": {"tanaman_id": 1, "kelembapan_tanah": 40.0}})
+    baris = teks.split("\n")
+    assert baris[0] == "event: soil"
+    assert json.loads(baris[1][len("data: "):]) == {"tanaman_id": 1, "kelembapan_tanah": 40.0}
+    assert teks.endswith("\n\n")
+
+
+def test_stream_503_saat_koneksi_penuh(api, client, monkeypatch):
+    monkeypatch.setattr(api, "live_broker", LiveBroker(max_subscribers=0))
+
+    r = client.get("/web/stream")
+    assert r.status_code == 503
@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+import pytest
+
+import prediction_cache
+from prediction_cache import CACHE_HITS, CACHE_MISSES, PredictionCache
+
+HASIL = {"penyakit": "Hawar Daun", "confidence": 0.9}
+
+
+class _Jam:
+    def __init__(self):
+        self.sekarang = 1000.0
+
+    def __call__(self):
+        return self.sekarang
+
+
+@pytest.fixture
+def jam(monkeypatch):
+    j = _Jam()
+    monkeypatch.setattr(prediction_cache.time, "time", j)
+    return j
+
+
+def _gambar(balik=False, titik=False):
+    # Gradasi 256x256 (cukup besar untuk decode 1/8 di dHash)
+    img = np.tile(np.arange(256, dtype=np.uint8), (256, 1))
+    if balik:
+        img = img[:, ::-1].copy()
+    if titik:
+        img[100, 100] = 0
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+def test_gambar_identik_diambil_dari_cache():
+    cache = PredictionCache()
+    hits, misses = CACHE_HITS.value(jenis="exact"), CACHE_MISSES.value()
+
+    assert cache.get(b"gambar-1") is None
+    cache.put(b"gambar-1", HASIL)
+    assert cache.get(b"gambar-1") == HASIL
+    assert cache.get(b"gambar-2") is None
+    assert CACHE_HITS.value(jenis="exact") == hits + 1
+    assert CACHE_MISSES.value() == misses + 2
+
+
+def test_varian_berbeda_tidak_saling_memakai():
+    cache = PredictionCache()
+    cache.put(b"gambar-1", HASIL, varian="cepat")
+
+    assert cache.get(b"gambar-1") is None
+    assert cache.get(b"gambar-1", varian="cepat") == HASIL
+
+
+def test_entri_kadaluarsa_setelah_ttl(jam):
+    cache = PredictionCache(ttl_detik=60)
+    cache.put(b"gambar-1", HASIL)
+
+    jam.sekarang += 60
+    assert cache.get(b"gambar-1") == HASIL
+    jam.sekarang += 1
+    assert cache.get(b"gambar-1") is None
+
+
+def test_lru_membuang_yang_paling_lama_tidak_dipakai(jam):
+    cache = PredictionCache(max_items=2)
+    cache.put(b"a", {"id": "a"})
+    cache.put(b"b", {"id": "b"})
+    cache.get(b"a")
+
+    cache.put(b"c", {"id": "c"})
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") == {"id": "a"}
+    assert cache.get(b"c") == {"id": "c"}
+    assert prediction_cache.CACHE_SIZE.value() == 2
+
+
+def test_clear_mengosongkan_cache():
+    cache = PredictionCache()
+    cache.put(b"gambar-1", HASIL)
+    cache.clear()
+
+    assert cache.get(b"gambar-1") is None
+
+
+def test_perceptual_frame_nyaris_sama():
+    cache = PredictionCache(perceptual=True)
+    cache.put(_gambar(), HASIL)
+    hits = CACHE_HITS.value(jenis="perceptual")
+
+    assert cache.get(_gambar(titik=True)) == HASIL
+    assert CACHE_HITS.value(jenis="perceptual") == hits + 1
+    assert cache.get(_gambar(balik=True)) is None
+    assert cache.get(_gambar(titik=True), varian="cepat") is None
+
+
+def test_perceptual_mati_hanya_byte_identik():
+    cache = PredictionCache()
+    cache.put(_gambar(), HASIL)
+
+    assert cache.get(_gambar(titik=True)) is None
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from migrasi_profil_deteksi import migrasi
+from profil_deteksi import PROFIL_DETEKSI, punya_kolom
+
+HASIL_AI = {"dominan": "Daun Sehat", "confidence": 90.0, "detail": {"daun sehat": 100.0}, "profil": "fast"}
+
+
+@pytest.fixture
+def engine_lama():
+    """penyakit_daun versi lama (tanpa kolom profil_deteksi)."""
+    eng = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with eng.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE penyakit_daun (id INTEGER PRIMARY KEY, tanaman_id INTEGER, user_id INTEGER, "
+            "gambar VARCHAR(255), hasil_deteksi VARCHAR(100), tingkat_keyakinan FLOAT, detail_persentase TEXT, "
+            "rekomendasi_id INTEGER, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, "
+            "updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        ))
+    yield eng
+    eng.dispose()
+
+
+def _isi_tabel(engine):
+    with engine.connect() as conn:
+        return [dict(r) for r in conn.execute(text("SELECT * FROM penyakit_daun ORDER BY id")).mappings()]
+
+
+def test_profil_menentukan_kerapatan_kotak(detector, gambar_daun):
+    hasil = {profil: detector.predict_image(gambar_daun, profil=profil) for profil in PROFIL_DETEKSI}
+
+    assert {profil: h["profil"] for profil, h in hasil.items()} == {p: p for p in PROFIL_DETEKSI}
+    # fast: resolusi kecil + kotak berjarak; accurate: kotak tumpang tindih
+    assert hasil["fast"]["patch_kandidat"] < hasil["standard"]["patch_kandidat"] < hasil["accurate"]["patch_kandidat"]
+    assert PROFIL_DETEKSI["fast"]["stride"] > PROFIL_DETEKSI["standard"]["stride"]
+
+
+def test_profil_default_detector(detector, gambar_daun):
+    assert detector.predict_image(gambar_daun)["profil"] == detector.profil
+    with pytest.raises(ValueError):
+        detector.predict_image(gambar_daun, profil="turbo")
+
+
+def test_cek_profil(api):
+    assert api._cek_profil(None) == api.DETECT_PROFILE
+    assert api._cek_profil("accurate") == "accurate"
+    with pytest.raises(HTTPException) as e:
+        api._cek_profil("turbo")
+    assert e.value.status_code == 422
+
+
+def test_endpoint_daftar_profil(client, api):
+    body = client.get("/iot/detect-disease/profiles").json()
+
+    assert body["default"] == api.DETECT_PROFILE
+    assert set(body["profil"]) == set(PROFIL_DETEKSI)
+
+
+def test_startup_mendeteksi_kolom(client, api):
+    # DB tes dibuat dari models -> kolom profil_deteksi sudah ada
+    assert api.SIMPAN_PROFIL_DETEKSI
+
+
+def test_profil_disimpan_kalau_kolom_ada(api, engine, session_factory, monkeypatch):
+    monkeypatch.setattr(api, "SIMPAN_PROFIL_DETEKSI", punya_kolom(engine))
+    db = session_factory()
+    try:
+        api._simpan_hasil_deteksi(db, 1, "a.jpg", HASIL_AI)
+    finally:
+        db.close()
+
+    baris = _isi_tabel(engine)
+    assert [(b["gambar"], b["hasil_deteksi"], b["profil_deteksi"]) for b in baris] == [("a.jpg", "Daun Sehat", "fast")]
+    assert json.loads(baris[0]["detail_persentase"]) == HASIL_AI["detail"]
+
+
+def test_tanpa_kolom_hasil_tetap_disimpan(api, engine_lama, monkeypatch):
+    assert not punya_kolom(engine_lama)
+    monkeypatch.setattr(api, "SIMPAN_PROFIL_DETEKSI", False)
+    db = sessionmaker(bind=engine_lama)()
+    try:
+        api._simpan_hasil_deteksi(db, 1, "a.jpg", HASIL_AI)
+
+        class Upload:
+            filename = "asli.jpg"
+
+        items = api._simpan_hasil_batch(db, 2, [Upload(), Upload()], ["b.jpg", "c.jpg"],
+                                        [HASIL_AI, {"status": "error", "message": "Gambar tidak terbaca"}])
+    finally:
+        db.close()
+
+    assert [item.get("error") for item in items] == [None, "Gambar tidak terbaca"]
+    assert [(b["tanaman_id"], b["gambar"]) for b in _isi_tabel(engine_lama)] == [(1, "a.jpg"), (2, "b.jpg")]
+
+
+def test_migrasi_profil_deteksi(engine_lama):
+    assert migrasi(engine_lama)
+    assert not punya_kolom(engine_lama)
+
+    assert migrasi(engine_lama, jalankan=True)
+    assert punya_kolom(engine_lama)
+    assert not migrasi(engine_lama, jalankan=True)
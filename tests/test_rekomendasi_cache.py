@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+import models
+import rekomendasi_cache
+from rekomendasi_cache import CACHE_RELOADS, RekomendasiCache, normalisasi_nama
+
+
+@pytest.fixture
+def jam(monkeypatch):
+    jam = [1000.0]
+    monkeypatch.setattr(rekomendasi_cache.time, "monotonic", lambda: jam[0])
+    return jam
+
+
+def _tambah(session_factory, *baris):
+    db = session_factory()
+    try:
+        for nama, rekomendasi in baris:
+            db.add(models.RekomendasiZat(nama_penyakit=nama, rekomendasi=rekomendasi))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _ubah(session_factory, nama, rekomendasi):
+    db = session_factory()
+    try:
+        db.query(models.RekomendasiZat).filter(models.RekomendasiZat.nama_penyakit == nama)\
+          .update({"rekomendasi": rekomendasi})
+        db.commit()
+    finally:
+        db.close()
+
+
+def _tunggu_muat_ulang(cache):
+    for _ in range(200):
+        if not cache._memuat:
+            return
+        time.sleep(0.01)
+    raise AssertionError("Muat ulang di belakang tidak selesai")
+
+
+def test_normalisasi_nama():
+    assert normalisasi_nama("bercak_daun") == "Bercak Daun"
+    assert normalisasi_nama("  BERCAK   daun ") == "Bercak Daun"
+
+
+def test_get_nama_ternormalisasi_dan_nama_kembar(session_factory):
+    _tambah(session_factory, ("bercak daun", "Fungisida A"), ("Bercak_Daun", "Fungisida B"), (None, "kosong"))
+    cache = RekomendasiCache(session_factory)
+
+    assert cache.muat() == 1
+    assert cache.get("BERCAK DAUN")["rekomendasi"] == "Fungisida A"
+    assert cache.get("Karat Daun") is None
+
+
+def test_ttl_habis_dimuat_ulang_di_belakang(session_factory, jam):
+    _tambah(session_factory, ("Bercak Daun", "lama"))
+    cache = RekomendasiCache(session_factory, ttl_detik=60)
+    cache.muat()
+    _ubah(session_factory, "Bercak Daun", "baru")
+
+    jam[0] += 30
+    assert cache.get("Bercak Daun")["rekomendasi"] == "lama"
+    assert not cache._memuat
+
+    # Kadaluarsa: data lama tetap dibalas, muat ulang cukup 1x walau dipanggil berkali-kali
+    jam[0] += 31
+    dimuat = CACHE_RELOADS.value()
+    assert cache.get("Bercak Daun")["rekomendasi"] == "lama"
+    cache.get("Bercak Daun")
+    _tunggu_muat_ulang(cache)
+    assert CACHE_RELOADS.value() == dimuat + 1
+    assert cache.get("Bercak Daun")["rekomendasi"] == "baru"
+
+
+def test_ttl_nol_hanya_refresh_manual(session_factory, jam):
+    _tambah(session_factory, ("Bercak Daun", "lama"))
+    cache = RekomendasiCache(session_factory, ttl_detik=0)
+    cache.muat()
+    _ubah(session_factory, "Bercak Daun", "baru")
+
+    jam[0] += 10 ** 6
+    assert cache.get("Bercak Daun")["rekomendasi"] == "lama"
+    assert not cache._memuat
+    cache.muat()
+    assert cache.get("Bercak Daun")["rekomendasi"] == "baru"
+
+
+def test_database_mati_saat_startup_dicoba_saat_get(session_factory, session_rusak):
+    _tambah(session_factory, ("Bercak Daun", "Fungisida A"))
+    cache = RekomendasiCache(session_rusak)
+    with pytest.raises(RuntimeError):
+        cache.muat()
+
+    assert cache.get("Bercak Daun") is None
+
+    # DB pulih -> get berikutnya memuat cache
+    cache.session_factory = session_factory
+    assert cache.get("Bercak Daun")["rekomendasi"] == "Fungisida A"
+
+
+def test_muat_ulang_gagal_data_lama_tetap_dipakai(session_factory, session_rusak, jam):
+    _tambah(session_factory, ("Bercak Daun", "lama"))
+    cache = RekomendasiCache(session_factory, ttl_detik=60)
+    cache.muat()
+
+    cache.session_factory = session_rusak
+    jam[0] += 61
+    assert cache.get("Bercak Daun")["rekomendasi"] == "lama"
+    _tunggu_muat_ulang(cache)
+    assert cache.get("Bercak Daun")["rekomendasi"] == "lama"
+
+
+def test_endpoint_refresh_admin(api, client, monkeypatch, session_factory):
+    _tambah(session_factory, ("Bercak Daun", "Fungisida A"))
+    monkeypatch.setattr(api, "rekomendasi_cache", RekomendasiCache(session_factory))
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "rahasia")
+
+    assert client.post("/admin/rekomendasi/refresh").status_code == 403
+    r = client.post("/admin/rekomendasi/refresh", headers={"X-Admin-Token": "rahasia"})
+    assert r.status_code == 200
+    assert r.json() == {"status": "success", "jumlah": 1}
@@ -0,0 +1,192 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
+import models
+from migrasi_index_log_kelembapan import migrasi
+from rollup import ROLLUP_SKIPPED, RollupJob, index_kurang, siapkan_tabel
+
+# Akhir pengamatan: semua data contoh sudah lewat dan bisa diringkas sampai tingkat hari
+SEKARANG = datetime(2026, 1, 2, 2, 0, 0)
+
+
+def _tulis_log(session_factory, baris):
+    db = session_factory()
+    try:
+        for tanaman_id, waktu, kelembapan, pompa_on in baris:
+            db.add(models.LogKelembapan(tanaman_id=tanaman_id, kelembapan_tanah=kelembapan, pompa_on=pompa_on,
+                                        sumber_perintah="AUTO", created_at=waktu, updated_at=waktu))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _isi_contoh(session_factory):
+    _tulis_log(session_factory, [
+        (1, datetime(2026, 1, 1, 10, 0, 10), 40.0, False),
+        (1, datetime(2026, 1, 1, 10, 0, 50), 60.0, True),
+        (1, datetime(2026, 1, 1, 10, 1, 30), 50.0, False),
+        (1, datetime(2026, 1, 1, 11, 15, 0), 70.0, False),
+        (1, datetime(2026, 1, 2, 0, 30, 0), 55.0, False),
+        (1, datetime(2026, 1, 2, 1, 10, 0), 65.0, False),
+        (2, datetime(2026, 1, 1, 10, 0, 20), 30.0, False),
+    ])
+
+
+def _rollup(session_factory, resolusi):
+    db = session_factory()
+    try:
+        r = models.LogKelembapanRollup
+        return {
+            (b.tanaman_id, b.bucket_start): (b.jumlah, b.kelembapan_min, b.kelembapan_max,
+                                             b.kelembapan_sum, b.pompa_on_jumlah)
+            for b in db.query(r).filter(r.resolusi == resolusi)
+        }
+    finally:
+        db.close()
+
+
+def _jumlah_mentah(session_factory):
+    db = session_factory()
+    try:
+        return db.query(models.LogKelembapan).count()
+    finally:
+        db.close()
+
+
+def test_rollup_menit_jam_hari(session_factory):
+    _isi_contoh(session_factory)
+    hasil = RollupJob(session_factory).run_once(SEKARANG)
+
+    assert hasil == {"minute": 6, "hour": 4, "day": 2, "dihapus": 0}
+    menit = _rollup(session_factory, "minute")
+    assert menit[(1, datetime(2026, 1, 1, 10, 0))] == (2, 40.0, 60.0, 100.0, 1)
+    assert menit[(2, datetime(2026, 1, 1, 10, 0))] == (1, 30.0, 30.0, 30.0, 0)
+    assert _rollup(session_factory, "hour")[(1, datetime(2026, 1, 1, 10, 0))] == (3, 40.0, 60.0, 150.0, 1)
+    assert _rollup(session_factory, "day") == {
+        (1, datetime(2026, 1, 1)): (4, 40.0, 70.0, 220.0, 1),
+        (2, datetime(2026, 1, 1)): (1, 30.0, 30.0, 30.0, 0),
+    }
+
+
+def test_data_telat_dihitung_ulang_tanpa_duplikat(session_factory):
+    _isi_contoh(session_factory)
+    job = RollupJob(session_factory)
+    job.run_once(SEKARANG)
+
+    # Kiriman ulang yang telat, masih di dalam lookback
+    _tulis_log(session_factory, [(1, datetime(2026, 1, 2, 0, 30, 40), 45.0, True)])
+    job.run_once(SEKARANG)
+
+    menit = _rollup(session_factory, "minute")
+    assert len(menit) == 6
+    assert menit[(1, datetime(2026, 1, 2, 0, 30))] == (2, 45.0, 55.0, 100.0, 1)
+    assert _rollup(session_factory, "hour")[(1, datetime(2026, 1, 2, 0, 0))] == (2, 45.0, 55.0, 100.0, 1)
+
+
+def test_retensi_default_menyimpan_data_mentah(session_factory):
+    _isi_contoh(session_factory)
+    RollupJob(session_factory).run_once(SEKARANG + timedelta(days=365))
+
+    assert _jumlah_mentah(session_factory) == 7
+
+
+def test_retensi_aktif_hanya_menghapus_data_lama(session_factory):
+    _isi_contoh(session_factory)
+    job = RollupJob(session_factory, retensi_mentah_hari=1)
+    hasil = job.run_once(datetime(2026, 1, 2, 12, 0, 0))
+
+    # Batas = 1 Jan 12:00: 5 baris pagi tanggal 1 dihapus, baris tanggal 2 tetap
+    assert hasil["dihapus"] == 5
+    assert _jumlah_mentah(session_factory) == 2
+    # Ringkasannya tetap ada
+    assert len(_rollup(session_factory, "minute")) == 6
+
+
+def test_job_kedua_dilewati_selama_lease_dipegang(session_factory):
+    _isi_contoh(session_factory)
+    pertama = RollupJob(session_factory)
+    kedua = RollupJob(session_factory)
+    assert pertama.run_once(SEKARANG)["minute"] == 6
+
+    dilewati = ROLLUP_SKIPPED.value()
+    assert kedua.run_once(SEKARANG) == {}
+    assert ROLLUP_SKIPPED.value() == dilewati + 1
+
+
+def test_lease_diambil_alih_setelah_habis(session_factory):
+    pertama = RollupJob(session_factory, lease_detik=60)
+    kedua = RollupJob(session_factory, lease_detik=60)
+    db = session_factory()
+    try:
+        assert pertama.ambil_lease(db, SEKARANG)
+        assert pertama.ambil_lease(db, SEKARANG + timedelta(seconds=30))
+        assert not kedua.ambil_lease(db, SEKARANG + timedelta(seconds=30))
+
+        # Pemegang lama mati (tidak memperpanjang) -> setelah lease habis proses lain mengambil alih
+        assert kedua.ambil_lease(db, SEKARANG + timedelta(seconds=120))
+        assert not pertama.ambil_lease(db, SEKARANG + timedelta(seconds=130))
+    finally:
+        db.close()
+
+
+def test_lepas_lease_langsung_bisa_diambil(session_factory):
+    pertama = RollupJob(session_factory)
+    kedua = RollupJob(session_factory)
+    db = session_factory()
+    try:
+        assert pertama.ambil_lease(db, SEKARANG)
+        pertama._lepas_lease()
+        assert kedua.ambil_lease(db, SEKARANG)
+    finally:
+        db.close()
+
+
+def test_database_mati_tidak_menghentikan_job(session_rusak):
+    assert RollupJob(session_rusak).run_once(SEKARANG) == {}
+
+
+@pytest.fixture
+def engine_tanpa_index():
+    """log_kelembapan buatan migration Laravel lama (belum ada index grafik)."""
+    eng = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with eng.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE log_kelembapan (id INTEGER PRIMARY KEY, tanaman_id INTEGER, kelembapan_tanah FLOAT, "
+            "pompa_on BOOLEAN, sumber_perintah VARCHAR(50), created_at DATETIME, updated_at DATETIME)"
+        ))
+    yield eng
+    eng.dispose()
+
+
+def test_siapkan_tabel_tidak_mengubah_log_kelembapan(engine_tanpa_index):
+    siapkan_tabel(engine_tanpa_index)
+
+    info = inspect(engine_tanpa_index)
+    assert info.get_indexes("log_kelembapan") == []
+    assert {"log_kelembapan_rollup", "kunci_job"} <= set(info.get_table_names())
+    assert sorted(i.name for i in index_kurang(engine_tanpa_index)) == [
+        "ix_log_kelembapan_tanaman_waktu", "ix_log_kelembapan_waktu"]
+
+
+def test_index_lengkap_tidak_dilaporkan(engine):
+    assert index_kurang(engine) == []
+
+
+def test_index_nama_lain_dianggap_cukup(engine_tanpa_index):
+    with engine_tanpa_index.begin() as conn:
+        conn.execute(text("CREATE INDEX log_kelembapan_tanaman_id_created_at_index "
+                          "ON log_kelembapan (tanaman_id, created_at, id)"))
+
+    assert [i.name for i in index_kurang(engine_tanpa_index)] == ["ix_log_kelembapan_waktu"]
+
+
+def test_migrasi_index_log_kelembapan(engine_tanpa_index):
+    assert len(migrasi(engine_tanpa_index)) == 2
+    assert len(index_kurang(engine_tanpa_index)) == 2
+
+    assert len(migrasi(engine_tanpa_index, jalankan=True)) == 2
+    assert index_kurang(engine_tanpa_index) == []
+    assert migrasi(engine_tanpa_index, jalankan=True) == []
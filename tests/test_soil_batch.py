@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from database import AsyncDB, SessionLocal
+import models
+
+
+def _log(tanaman_id):
+    db = SessionLocal()
+    try:
+        return [(r.kelembapan_tanah, r.pompa_on, r.created_at)
+                for r in db.query(models.LogKelembapan)
+                           .filter(models.LogKelembapan.tanaman_id == tanaman_id)
+                           .order_by(models.LogKelembapan.created_at)]
+    finally:
+        db.close()
+
+
+def test_batch_disimpan_urut_waktu_dengan_perintah_terbaru(client):
+    r = client.post("/iot/soil-data/batch", json=[
+        {"tanaman_id": 901, "moisture": 80.0, "timestamp": "2026-01-01T10:05:00"},
+        {"tanaman_id": 901, "moisture": 30.0, "timestamp": "2026-01-01T10:00:00"},
+        {"tanaman_id": 902, "moisture": 60.0, "timestamp": "2026-01-01T10:01:00"},
+    ])
+
+    assert r.status_code == 200
+    body = r.json()
+    assert body["status"] == "success"
+    assert body["tersimpan"] == 3
+    # Perintah pompa dari data paling baru tiap tanaman (80% -> basah -> OFF)
+    assert body["pump"] == {"901": "OFF", "902": "OFF"}
+    assert _log(901) == [
+        (30.0, True, datetime(2026, 1, 1, 10, 0)),
+        (80.0, False, datetime(2026, 1, 1, 10, 5)),
+    ]
+
+
+def test_batch_timestamp_berzona_waktu_disimpan_sebagai_jam_lokal(client):
+    client.post("/iot/soil-data/batch", json=[
+        {"tanaman_id": 903, "moisture": 55.0, "timestamp": "2026-01-01T03:00:00Z"},
+    ])
+
+    lokal = datetime.fromisoformat("2026-01-01T03:00:00+00:00").astimezone().replace(tzinfo=None)
+    assert _log(903) == [(55.0, False, lokal)]
+
+
+def test_batch_melebihi_batas_ditolak(client, api):
+    data = [{"tanaman_id": 904, "moisture": 50.0}] * (api.MAX_SOIL_BATCH + 1)
+    r = client.post("/iot/soil-data/batch", json=data)
+
+    assert r.status_code == 422
+    assert _log(904) == []
+
+
+def test_batch_db_mati_tetap_membalas_perintah_pompa(client, api, session_rusak):
+    async def db_rusak():
+        yield AsyncDB(session_rusak(), native=False)
+
+    api.app.dependency_overrides[api.get_async_db] = db_rusak
+    r = client.post("/iot/soil-data/batch", json=[
+        {"tanaman_id": 905, "moisture": 20.0, "timestamp": "2026-01-01T10:00:00"},
+    ])
+
+    assert r.status_code == 200
+    assert r.json()["status"] == "db_error"
+    assert r.json()["tersimpan"] == 0
+    assert r.json()["pump"] == {"905": "ON"}
+
+
+def test_batch_kontrol_pompa_tidak_di_event_loop(client, api, monkeypatch):
+    import asyncio
+
+    di_event_loop = []
+
+    class KontrolPompaLambat:
+        # Backend sqlite / database melakukan I/O di sini
+        def is_manual(self, tanaman_id):
+            try:
+                asyncio.get_running_loop()
+                di_event_loop.append(tanaman_id)
+            except RuntimeError:
+                pass
+            return False
+
+        def matikan_manual(self, tanaman_id):
+            return self.is_manual(tanaman_id)
+
+    monkeypatch.setattr(api, "kontrol_pompa", KontrolPompaLambat())
+    r = client.post("/iot/soil-data/batch", json=[
+        {"tanaman_id": 906, "moisture": 80.0, "timestamp": "2026-01-01T10:00:00"},
+        {"tanaman_id": 906, "moisture": 20.0, "timestamp": "2026-01-01T10:01:00"},
+    ])
+
+    assert r.json()["pump"] == {"906": "ON"}
+    assert di_event_loop == []
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import models
+from state_cache import LatestStateCache
+
+JAM = datetime(2026, 1, 1, 10, 0, 0)
+
+
+def test_update_dan_get_soil():
+    cache = LatestStateCache()
+    assert cache.get_soil(1) is None
+
+    cache.update_soil(1, 40.0, True, "AUTO", JAM)
+    cache.update_soil(1, 55.0, False, "MANUAL", JAM.replace(minute=5))
+
+    assert cache.get_soil(1) == {"kelembapan_tanah": 55.0, "pompa_on": False,
+                                 "sumber_perintah": "MANUAL", "waktu": JAM.replace(minute=5)}
+    assert list(cache.get_all_soil()) == [1]
+
+
+def test_data_kiriman_ulang_lebih_tua_diabaikan():
+    cache = LatestStateCache()
+    cache.update_soil(1, 55.0, False, "AUTO", JAM.replace(minute=5))
+    cache.update_soil(1, 20.0, True, "AUTO", JAM)
+
+    assert cache.get_soil(1)["kelembapan_tanah"] == 55.0
+
+
+def test_update_tank_per_tangki():
+    cache = LatestStateCache()
+    cache.update_tank(30.0, 60.0, JAM)
+    cache.update_tank(10.0, 20.0, JAM, tangki_id=2)
+
+    assert cache.get_tank()["persentase_isi"] == 60.0
+    assert cache.get_tank(2)["ketinggian_air"] == 10.0
+    assert cache.get_tank(3) is None
+    assert sorted(cache.get_all_tanks()) == [1, 2]
+
+
+def test_warm_mengambil_baris_terbaru(session_factory):
+    db = session_factory()
+    try:
+        for tanaman_id, kelembapan, menit in [(1, 40.0, 0), (1, 45.0, 1), (2, 70.0, 0)]:
+            waktu = JAM.replace(minute=menit)
+            db.add(models.LogKelembapan(tanaman_id=tanaman_id, kelembapan_tanah=kelembapan, pompa_on=False,
+                                        sumber_perintah="AUTO", created_at=waktu, updated_at=waktu))
+        db.add(models.LogTangki(tangki_id=1, ketinggian_air=25.0, persentase_isi=50.0,
+                                created_at=JAM, updated_at=JAM.replace(minute=9)))
+        db.commit()
+
+        cache = LatestStateCache()
+        assert cache.warm(db) == 2
+    finally:
+        db.close()
+
+    assert cache.get_soil(1)["kelembapan_tanah"] == 45.0
+    assert cache.get_soil(2)["kelembapan_tanah"] == 70.0
+    assert cache.get_tank(1) == {"ketinggian_air": 25.0, "persentase_isi": 50.0, "waktu": JAM.replace(minute=9)}
+
+
+def test_dashboard_dibaca_dari_cache(api, client):
+    r = client.post("/iot/soil-data", json={"tanaman_id": 930, "moisture": 12.5})
+    assert r.status_code == 200
+
+    # Langsung terlihat di dashboard, sebelum buffer ditulis ke DB
+    body = client.get("/web/dashboard-metrics", params={"tanaman_id": 930, "tangki_id": 930}).json()
+    assert body["soil_moisture"] == 12.5
+    assert body["pump_status"] == (r.json()["pump"] == "ON")
+    assert body["tank_percent"] == 0
+
+
+def test_peringatan_multi_worker(api):
+    assert api._peringatan_multi_worker(1) is None
+    pesan = api._peringatan_multi_worker(4)
+    assert "WEB_CONCURRENCY=4" in pesan
+    assert "cache kondisi terkini" in pesan
+    assert "pelanggan SSE" in pesan
+    assert "deadband" in pesan
+
+
+def test_startup_memperingatkan_multi_worker(api, monkeypatch, capsys):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(api, "WEB_CONCURRENCY", 2)
+    with TestClient(api.app):
+        pass
+    assert "WEB_CONCURRENCY=2" in capsys.readouterr().out
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+
+from svm_numpy import NumpySVC
+
+FOLDER_MODEL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ai_models")
+
+# Selisih terukur dengan libsvm ~1e-12 (hanya urutan penjumlahan float64)
+TOLERANSI = 1e-9
+
+
+def _cocok(numpy_svm, svm, scaler, X):
+    prob_np = numpy_svm.predict_proba(X)
+    prob_sk = svm.predict_proba(scaler.transform(X))
+    np.testing.assert_allclose(prob_np, prob_sk, rtol=0, atol=TOLERANSI)
+    assert (prob_np.argmax(axis=1) == prob_sk.argmax(axis=1)).all()
+
+
+def test_model_daun_sama_dengan_sklearn(detector, gambar_daun):
+    fitur = detector._image_features(gambar_daun)
+    acak = detector.scaler.mean_ + np.random.default_rng(0).normal(size=(2000, fitur.shape[1])) * detector.scaler.scale_
+
+    for X in (fitur, acak):
+        _cocok(detector.numpy_svm, detector.svm, detector.scaler, X)
+
+
+@pytest.mark.parametrize("n_kelas", [2, 3, 5])
+def test_model_sintetis_sama_dengan_sklearn(n_kelas):
+    rng = np.random.default_rng(n_kelas)
+    X = rng.normal(size=(60 * n_kelas, 4)) * [1.0, 10.0, 0.1, 100.0]
+    y = np.repeat(np.arange(n_kelas), 60)
+    X[:, 0] += y * 1.5
+    scaler = StandardScaler().fit(X)
+    svm = SVC(kernel="rbf", probability=True, random_state=0).fit(scaler.transform(X), y)
+
+    _cocok(NumpySVC(svm, scaler), svm, scaler, rng.normal(size=(300, 4)) * [2.0, 10.0, 0.1, 100.0])
+
+
+def test_model_tidak_didukung():
+    X = np.random.default_rng(0).normal(size=(40, 2))
+    y = np.repeat([0, 1], 20)
+
+    with pytest.raises(ValueError):
+        NumpySVC(SVC(kernel="linear", probability=True).fit(X, y))
+    with pytest.raises(ValueError):
+        NumpySVC(SVC(kernel="rbf").fit(X, y))
+
+
+def test_hasil_deteksi_sama_dengan_jalur_sklearn(detector, gambar_daun):
+    from ai_engine import LeafDiseaseDetector
+
+    sklearn_detector = LeafDiseaseDetector(model_folder=FOLDER_MODEL, numpy_svm=False)
+    assert sklearn_detector.numpy_svm is None
+    assert detector.predict_image(gambar_daun) == sklearn_detector.predict_image(gambar_daun)
@@ -0,0 +1,160 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.pool import StaticPool
+
+import models
+import tangki
+from database import SessionLocal
+from migrasi_tangki import TABEL_ARSIP, migrasi
+
+WAKTU = datetime(2026, 1, 1, 10, 0, 0)
+
+
+@pytest.fixture
+def engine_lama():
+    """log_tangki versi lama (tanpa tangki_id), berisi 3 baris kembar."""
+    eng = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with eng.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE log_tangki (id INTEGER PRIMARY KEY, ketinggian_air FLOAT, persentase_isi FLOAT, "
+            "created_at DATETIME, updated_at DATETIME)"
+        ))
+        for i, level in enumerate([80.0, 70.0, 60.0], start=1):
+            conn.execute(text("INSERT INTO log_tangki VALUES (:id, :level, :level, '2026-01-01', '2026-01-01')"),
+                         {"id": i, "level": level})
+    yield eng
+    eng.dispose()
+
+
+def _isi_log_tangki(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT * FROM log_tangki ORDER BY id")).mappings().all()
+
+
+def test_parse_konfigurasi_tangki():
+    assert tangki.parse_konfigurasi_tangki("1:100, 2:150:5:2000") == {
+        1: {"tinggi_cm": 100.0, "offset_cm": 0.0, "kapasitas_liter": 0.0},
+        2: {"tinggi_cm": 150.0, "offset_cm": 5.0, "kapasitas_liter": 2000.0},
+    }
+    with pytest.raises(ValueError):
+        tangki.parse_konfigurasi_tangki("1")
+    with pytest.raises(ValueError):
+        tangki.parse_konfigurasi_tangki("1:0")
+
+
+def test_hitung_level_dibatasi_0_sampai_tinggi():
+    registri = tangki.RegistriTangki(tangki.parse_konfigurasi_tangki("1:100,2:150:5:2000"))
+
+    assert registri.hitung(1, 20.0) == (80.0, 80.0, None)
+    assert registri.hitung(1, 150.0) == (0.0, 0.0, None)
+    assert registri.hitung(1, -5.0) == (100.0, 100.0, None)
+    assert registri.hitung(2, 80.0) == (75.0, 50.0, 1000.0)
+    assert registri.hitung(3, 20.0) is None
+
+
+def test_riwayat_disampling_per_tangki():
+    registri = tangki.RegistriTangki({1: {}, 2: {}}, riwayat_detik=60)
+
+    assert registri.perlu_riwayat(1, WAKTU)
+    assert registri.perlu_riwayat(2, WAKTU)
+    assert not registri.perlu_riwayat(1, datetime(2026, 1, 1, 10, 0, 59))
+    assert registri.perlu_riwayat(1, datetime(2026, 1, 1, 10, 1, 0))
+    # Transaksi gagal -> laporan berikutnya boleh menulis riwayat lagi
+    registri.lupakan_riwayat(1)
+    assert registri.perlu_riwayat(1, datetime(2026, 1, 1, 10, 1, 1))
+    assert not tangki.RegistriTangki({1: {}}).perlu_riwayat(1, WAKTU)
+
+
+def test_upsert_kembar_mengubah_satu_baris(session_factory):
+    db = session_factory()
+    try:
+        db.execute(tangki.upsert_level("sqlite", 1, 80.0, 80.0, WAKTU))
+        db.execute(tangki.upsert_level("sqlite", 1, 60.0, 60.0, datetime(2026, 1, 1, 10, 5)))
+        db.execute(tangki.upsert_level("sqlite", 2, 30.0, 20.0, WAKTU))
+        db.commit()
+
+        rows = db.query(models.LogTangki).order_by(models.LogTangki.tangki_id).all()
+        assert [(r.tangki_id, r.ketinggian_air, r.persentase_isi) for r in rows] == [(1, 60.0, 60.0), (2, 30.0, 20.0)]
+        assert rows[0].updated_at == datetime(2026, 1, 1, 10, 5)
+    finally:
+        db.close()
+
+
+def test_upsert_mysql_satu_statement():
+    sql = str(tangki.upsert_level("mysql", 1, 80.0, 80.0, WAKTU).compile(dialect=mysql.dialect()))
+
+    assert sql.startswith("INSERT INTO log_tangki")
+    assert "ON DUPLICATE KEY UPDATE" in sql
+
+
+def test_upsert_dialect_tidak_didukung():
+    with pytest.raises(ValueError):
+        tangki.upsert_level("oracle", 1, 80.0, 80.0, WAKTU)
+
+
+def test_siapkan_tabel_menolak_log_tangki_lama(engine_lama):
+    with pytest.raises(RuntimeError):
+        tangki.siapkan_tabel(engine_lama)
+
+    # Tabel milik Laravel tidak diubah saat startup
+    assert "tangki_id" not in {k["name"] for k in inspect(engine_lama).get_columns("log_tangki")}
+    assert len(_isi_log_tangki(engine_lama)) == 3
+
+
+def test_siapkan_tabel_lolos_kalau_sudah_unique(engine):
+    tangki.siapkan_tabel(engine)
+    assert tangki.punya_unique_tangki(engine)
+
+
+def test_migrasi_tanpa_jalankan_tidak_mengubah_apa_pun(engine_lama):
+    hasil = migrasi(engine_lama)
+
+    assert hasil == {"kolom_ditambah": True, "diarsipkan": 2, "index_dibuat": True}
+    assert not tangki.punya_unique_tangki(engine_lama)
+    assert len(_isi_log_tangki(engine_lama)) == 3
+    assert TABEL_ARSIP not in inspect(engine_lama).get_table_names()
+
+
+def test_migrasi_mengarsipkan_baris_kembar(engine_lama):
+    hasil = migrasi(engine_lama, jalankan=True)
+
+    assert hasil == {"kolom_ditambah": True, "diarsipkan": 2, "index_dibuat": True}
+    assert [(r["id"], r["tangki_id"], r["ketinggian_air"]) for r in _isi_log_tangki(engine_lama)] == [(1, 1, 80.0)]
+    with engine_lama.connect() as conn:
+        arsip = conn.execute(text(f"SELECT id, tangki_id, ketinggian_air FROM {TABEL_ARSIP} ORDER BY id")).all()
+    assert arsip == [(2, 1, 70.0), (3, 1, 60.0)]
+
+    # Setelah migrasi: startup lolos, upsert mengubah baris yang sama
+    tangki.siapkan_tabel(engine_lama)
+    with engine_lama.begin() as conn:
+        conn.execute(tangki.upsert_level("sqlite", 1, 50.0, 50.0, WAKTU))
+    assert [(r["id"], r["ketinggian_air"]) for r in _isi_log_tangki(engine_lama)] == [(1, 50.0)]
+
+    # Dijalankan ulang: tidak ada yang diubah
+    assert migrasi(engine_lama, jalankan=True) == {"kolom_ditambah": False, "diarsipkan": 0, "index_dibuat": False}
+
+
+def test_endpoint_water_level_upsert(client):
+    for jarak in (20.0, 35.0):
+        r = client.post("/iot/water-level", json={"distance_cm": jarak})
+        assert r.status_code == 200
+
+    assert r.json()["level_percent"] == 65.0
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(models.LogTangki.tangki_id, models.LogTangki.ketinggian_air)).all()
+    finally:
+        db.close()
+    assert rows == [(1, 65.0)]
+
+    tangki_1 = client.get("/web/tank-levels").json()[0]
+    assert (tangki_1["tangki_id"], tangki_1["persentase_isi"]) == (1, 65.0)
+
+
+def test_endpoint_water_level_tangki_tidak_terdaftar(client):
+    r = client.post("/iot/water-level", json={"distance_cm": 20.0, "tangki_id": 99})
+
+    assert r.status_code == 422
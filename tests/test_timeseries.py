@@ -0,0 +1,207 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import models
+import timeseries
+from rollup import RollupJob
+
+
+def _tulis_log(session_factory, baris):
+    db = session_factory()
+    try:
+        for tanaman_id, waktu, kelembapan, pompa_on in baris:
+            db.add(models.LogKelembapan(tanaman_id=tanaman_id, kelembapan_tanah=kelembapan, pompa_on=pompa_on,
+                                        sumber_perintah="AUTO", created_at=waktu, updated_at=waktu))
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def db(session_factory):
+    s = session_factory()
+    yield s
+    s.close()
+
+
+def _ringkas(titik):
+    return [(p["waktu"], p["jumlah"], p["kelembapan_avg"], p["pompa_on_rasio"]) for p in titik]
+
+
+@pytest.fixture
+def data_step(session_factory):
+    # Nilai berubah 2x; di antaranya tidak ada baris (dilewati deadband)
+    _tulis_log(session_factory, [
+        (1, datetime(2026, 1, 1, 10, 0, 10), 40.0, False),
+        (1, datetime(2026, 1, 1, 10, 3, 20), 60.0, True),
+    ])
+
+
+def test_step_mengisi_bucket_kosong(db, data_step):
+    titik = timeseries.bucket_series(db, 1, datetime(2026, 1, 1, 10, 0), datetime(2026, 1, 1, 10, 6), 60,
+                                     step=True)
+
+    assert _ringkas(titik) == [
+        (datetime(2026, 1, 1, 10, 0), 1, 40.0, 0.0),
+        (datetime(2026, 1, 1, 10, 1), 0, 40.0, 0.0),
+        (datetime(2026, 1, 1, 10, 2), 0, 40.0, 0.0),
+        (datetime(2026, 1, 1, 10, 3), 1, 60.0, 1.0),
+        (datetime(2026, 1, 1, 10, 4), 0, 60.0, 1.0),
+        (datetime(2026, 1, 1, 10, 5), 0, 60.0, 1.0),
+    ]
+
+
+def test_step_memakai_baris_sebelum_rentang(db, data_step):
+    titik = timeseries.bucket_series(db, 1, datetime(2026, 1, 1, 10, 1), datetime(2026, 1, 1, 10, 3), 60,
+                                     step=True)
+
+    assert _ringkas(titik) == [
+        (datetime(2026, 1, 1, 10, 1), 0, 40.0, 0.0),
+        (datetime(2026, 1, 1, 10, 2), 0, 40.0, 0.0),
+    ]
+
+
+def test_step_berhenti_setelah_maks_gap(db, data_step):
+    titik = timeseries.bucket_series(db, 1, datetime(2026, 1, 1, 10, 0), datetime(2026, 1, 1, 10, 6), 60,
+                                     step=True, maks_gap=90)
+
+    # Bucket yang mulai > 90 detik setelah baris terakhir dibiarkan kosong (perangkat dianggap mati)
+    assert [p["waktu"].minute for p in titik] == [0, 1, 3, 4]
+
+
+def test_tanpa_step_bucket_kosong_tidak_muncul(db, data_step):
+    titik = timeseries.bucket_series(db, 1, datetime(2026, 1, 1, 10, 0), datetime(2026, 1, 1, 10, 6), 60)
+
+    assert [p["waktu"].minute for p in titik] == [0, 3]
+
+
+def test_isi_step_menolak_bucket_tidak_valid(db):
+    start, end = datetime(2026, 1, 1, 10, 0), datetime(2026, 1, 1, 11, 0)
+
+    with pytest.raises(ValueError):
+        timeseries._isi_step(db, "sqlite", 1, start, end, 0, {}, None)
+    with pytest.raises(ValueError):
+        timeseries._isi_step(db, "sqlite", 1, start, end, -60, {}, None)
+    with pytest.raises(ValueError):
+        timeseries._isi_step(db, "sqlite", 1, start, end, 60, {}, None, maks_bucket=59)
+    assert timeseries._isi_step(db, "sqlite", 1, start, end, 60, {}, None, maks_bucket=60) == []
+
+
+def test_bucket_agregat_min_avg_max_pompa(db, session_factory):
+    _tulis_log(session_factory, [
+        (1, datetime(2026, 1, 1, 10, 0, 10), 40.0, False),
+        (1, datetime(2026, 1, 1, 10, 0, 50), 60.0, True),
+        (1, datetime(2026, 1, 1, 10, 1, 30), 50.0, False),
+        (2, datetime(2026, 1, 1, 10, 0, 20), 10.0, False),
+    ])
+    titik = timeseries.bucket_series(db, 1, datetime(2026, 1, 1, 10, 0), datetime(2026, 1, 1, 10, 5), 60)
+
+    assert titik == [
+        {"waktu": datetime(2026, 1, 1, 10, 0), "kelembapan_min": 40.0, "kelembapan_avg": 50.0,
+         "kelembapan_max": 60.0, "pompa_on_rasio": 0.5, "jumlah": 2},
+        {"waktu": datetime(2026, 1, 1, 10, 1), "kelembapan_min": 50.0, "kelembapan_avg": 50.0,
+         "kelembapan_max": 50.0, "pompa_on_rasio": 0.0, "jumlah": 1},
+    ]
+
+
+def test_bucket_gabungan_rollup_dan_data_mentah(db, session_factory):
+    _tulis_log(session_factory, [
+        (1, datetime(2026, 1, 1, 10, 0, 10), 40.0, False),
+        (1, datetime(2026, 1, 1, 10, 30, 0), 60.0, True),
+        (1, datetime(2026, 1, 1, 11, 10, 0), 70.0, False),
+    ])
+    RollupJob(session_factory).run_once(datetime(2026, 1, 1, 12, 0))
+    # Data mentah yang sudah masuk rollup jam dihapus (seperti retensi) -> jam 10 dibaca dari rollup,
+    # jam 11 (belum diringkas) tetap dari data mentah
+    db.query(models.LogKelembapan).filter(models.LogKelembapan.created_at < datetime(2026, 1, 1, 11, 0)).delete()
+    db.commit()
+
+    titik = timeseries.bucket_series(db, 1, datetime(2026, 1, 1, 10, 0), datetime(2026, 1, 1, 12, 0), 3600)
+    assert [(p["waktu"], p["jumlah"], p["kelembapan_avg"]) for p in titik] == [
+        (datetime(2026, 1, 1, 10, 0), 2, 50.0),
+        (datetime(2026, 1, 1, 11, 0), 1, 70.0),
+    ]
+
+
+def test_pilih_resolusi():
+    assert timeseries.pilih_resolusi(30) is None
+    assert timeseries.pilih_resolusi(60) == "minute"
+    assert timeseries.pilih_resolusi(900) == "minute"
+    assert timeseries.pilih_resolusi(7200) == "hour"
+    assert timeseries.pilih_resolusi(5400) == "minute"
+    assert timeseries.pilih_resolusi(86400 * 7) == "day"
+
+
+@pytest.mark.parametrize("bucket_seconds", [0, -60, None])
+def test_cek_bucket_menolak_bucket_tidak_positif(bucket_seconds):
+    with pytest.raises(ValueError):
+        timeseries.cek_bucket(datetime(2026, 1, 1), datetime(2026, 1, 2), bucket_seconds)
+
+
+def test_cek_bucket_menolak_bucket_terlalu_banyak(db):
+    start = datetime(2026, 1, 1)
+    timeseries.cek_bucket(start, start + timedelta(seconds=timeseries.MAKS_BUCKET), 1)
+
+    with pytest.raises(ValueError):
+        timeseries.cek_bucket(start, start + timedelta(seconds=timeseries.MAKS_BUCKET + 1), 1)
+    with pytest.raises(ValueError):
+        timeseries.bucket_series(db, 1, start, start + timedelta(days=7), 1)
+
+
+def test_lttb_maksimal_points(db, session_factory):
+    awal = datetime(2026, 1, 1)
+    _tulis_log(session_factory, [
+        (1, awal + timedelta(minutes=i), 50.0 + (i % 7) * 3, i % 2 == 0) for i in range(600)
+    ])
+    titik = timeseries.lttb_series(db, 1, awal, awal + timedelta(hours=10), 50)
+
+    assert len(titik) == 50
+    assert titik[0]["waktu"] == awal
+    # Titik terakhir = bucket halus terakhir (berisi baris menit ke-599)
+    assert titik[-1]["waktu"] > awal + timedelta(minutes=598)
+    assert [p["waktu"] for p in titik] == sorted(p["waktu"] for p in titik)
+
+
+def test_lttb_indices_titik_sedikit_tidak_dikurangi():
+    assert list(timeseries.lttb_indices([1, 2, 3], [1, 5, 2], 10)) == [0, 1, 2]
+
+
+@pytest.mark.parametrize("bucket_seconds", ["0", "-5"])
+def test_endpoint_menolak_bucket_tidak_positif(client, bucket_seconds):
+    r = client.get("/web/chart-series/1", params={"bucket_seconds": bucket_seconds})
+    assert r.status_code == 422
+
+
+def test_endpoint_menolak_bucket_terlalu_banyak(client):
+    r = client.get("/web/chart-series/1", params={
+        "start": "2026-01-01T00:00:00", "end": "2026-01-08T00:00:00", "bucket_seconds": 60,
+    })
+    assert r.status_code == 422
+
+
+def test_endpoint_bucket_otomatis(client):
+    r = client.get("/web/chart-series/1", params={
+        "start": "2026-01-01T00:00:00", "end": "2026-01-08T00:00:00", "points": 200,
+    })
+    assert r.status_code == 200
+    assert r.json()["bucket_seconds"] == 3060
+
+
+def test_endpoint_rentang_berzona_waktu(client):
+    from database import SessionLocal
+
+    lokal = datetime.fromisoformat("2026-01-01T10:00:30+00:00").astimezone().replace(tzinfo=None)
+    _tulis_log(SessionLocal, [(912, lokal, 42.0, False)])
+
+    r = client.get("/web/chart-series/912", params={
+        "start": "2026-01-01T10:00:00Z", "end": "2026-01-01T10:05:00Z", "bucket_seconds": 60,
+    })
+    assert r.status_code == 200
+    titik = r.json()["points"]
+    assert [(p["jumlah"], p["kelembapan_avg"]) for p in titik] == [(1, 42.0)]
+    assert datetime.fromisoformat(titik[0]["waktu"]) == lokal.replace(second=0)
+
+    # Hanya start yang berzona (end default = sekarang)
+    start = (datetime.now(timezone.utc) - timedelta(hours=6)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    assert client.get("/web/chart-series/912", params={"start": start}).status_code == 200
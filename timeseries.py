@@ -0,0 +1,308 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import Integer, case, cast, func
+
+import models
+
+# ==========================================
+# DATA GRAFIK RENTANG PANJANG (DOWNSAMPLING)
+# Untuk grafik seminggu / sebulan, data mentah log_kelembapan tidak dikirim semua.
+# - Mode "bucket": rata-rata/min/max per interval waktu, dihitung langsung di SQL
+# - Mode "lttb"  : Largest-Triangle-Three-Buckets, memilih titik yang bentuk grafiknya
+#                  paling mirip dengan data asli (puncak & lembah tetap kelihatan)
+# - step=True      : log ditulis dengan deadband (deadband.py), jadi bucket kosong di antara
+#                  dua baris diisi nilai baris terakhir (nilai dianggap tetap sampai baris berikutnya)
+# ==========================================
+
+# Mode lttb: data disaring dulu di SQL jadi (points x LTTB_OVERSAMPLE) bucket halus,
+# supaya rentang panjang tidak menarik ratusan ribu baris mentah ke Python
+LTTB_OVERSAMPLE = 8
+
+# Batas jumlah bucket per permintaan (rentang / bucket_seconds), supaya bucket kecil
+# di rentang panjang tidak membuat query, loop Python & balasan membengkak tanpa batas
+MAKS_BUCKET = 5000
+
+
+# Resolusi tabel ringkasan log_kelembapan_rollup (diisi job di rollup.py), dari yang paling halus
+ROLLUP_RESOLUSI = {"minute": 60, "hour": 3600, "day": 86400}
+
+
+def epoch_kolom(dialect, kolom):
+    # Detik sejak 1970 dari kolom DATETIME (fungsi beda di tiap database)
+    if dialect == "sqlite":
+        return cast(func.strftime("%s", kolom), Integer)
+    if dialect == "postgresql":
+        return func.extract("epoch", kolom)
+    return func.unix_timestamp(kolom)
+
+
+def dari_epoch(dialect, detik):
+    # Kebalikan epoch_kolom: SQLite menganggap DATETIME tanpa zona sebagai UTC,
+    # MySQL memakai zona waktu sesi (= jam lokal server)
+    if dialect == "sqlite":
+        return datetime.fromtimestamp(detik, timezone.utc).replace(tzinfo=None)
+    return datetime.fromtimestamp(detik)
+
+
+def ke_epoch(dialect, waktu):
+    # Sama seperti epoch_kolom, tapi untuk datetime Python
+    if dialect == "sqlite" and waktu.tzinfo is None:
+        return waktu.replace(tzinfo=timezone.utc).timestamp()
+    return waktu.timestamp()
+
+
+def awal_bucket(dialect, waktu, bucket_seconds):
+    # Bulatkan waktu ke bawah ke awal bucket (selaras dengan nomor_bucket di SQL)
+    return dari_epoch(dialect, int(ke_epoch(dialect, waktu) // bucket_seconds) * bucket_seconds)
+
+
+def nomor_bucket(dialect, kolom, bucket_seconds):
+    if dialect == "sqlite":
+        # SQLite tidak punya FLOOR (versi lama); CAST ke INTEGER membulatkan ke bawah untuk nilai positif
+        return cast(epoch_kolom(dialect, kolom) / bucket_seconds, Integer)
+    return func.floor(epoch_kolom(dialect, kolom) / bucket_seconds)
+
+
+def pilih_resolusi(bucket_seconds):
+    """
+    Resolusi rollup yang dipakai untuk bucket sebesar ini:
+    yang paling kasar dan pas membagi bucket, kalau tidak ada yang pas -> yang paling kasar <= bucket.
+    Output: nama resolusi, atau None kalau bucket lebih kecil dari 1 menit (pakai data mentah).
+    """
+    cocok = [nama for nama, detik in ROLLUP_RESOLUSI.items() if detik <= bucket_seconds]
+    if not cocok:
+        return None
+    pas = [nama for nama in cocok if bucket_seconds % ROLLUP_RESOLUSI[nama] == 0]
+    return (pas or cocok)[-1]
+
+
+def batas_rollup(db, resolusi, tanaman_id=None):
+    """Akhir rentang yang sudah diringkas (awal bucket terakhir + 1 resolusi), None kalau belum ada."""
+    rollup = models.LogKelembapanRollup
+    query = db.query(func.max(rollup.bucket_start)).filter(rollup.resolusi == resolusi)
+    if tanaman_id is not None:
+        query = query.filter(rollup.tanaman_id == tanaman_id)
+    terakhir = query.scalar()
+    if terakhir is None:
+        return None
+    if isinstance(terakhir, str):
+        terakhir = datetime.fromisoformat(terakhir)
+    return terakhir + timedelta(seconds=ROLLUP_RESOLUSI[resolusi])
+
+
+def _agregat_mentah(db, dialect, tanaman_id, start, end, bucket_seconds):
+    log = models.LogKelembapan
+    bucket = nomor_bucket(dialect, log.created_at, bucket_seconds).label("bucket")
+    return db.query(
+                bucket,
+                func.count(log.id),
+                func.min(log.kelembapan_tanah),
+                func.max(log.kelembapan_tanah),
+                func.sum(log.kelembapan_tanah),
+                func.sum(case((log.pompa_on, 1), else_=0)),
+             )\
+             .filter(log.tanaman_id == tanaman_id)\
+             .filter(log.created_at >= start, log.created_at < end)\
+             .group_by(bucket)\
+             .all()
+
+
+def _agregat_rollup(db, dialect, resolusi, tanaman_id, start, end, bucket_seconds):
+    # Bucket rollup dimasukkan ke bucket grafik sesuai waktu awalnya
+    rollup = models.LogKelembapanRollup
+    bucket = nomor_bucket(dialect, rollup.bucket_start, bucket_seconds).label("bucket")
+    return db.query(
+                bucket,
+                func.sum(rollup.jumlah),
+                func.min(rollup.kelembapan_min),
+                func.max(rollup.kelembapan_max),
+                func.sum(rollup.kelembapan_sum),
+                func.sum(rollup.pompa_on_jumlah),
+             )\
+             .filter(rollup.resolusi == resolusi, rollup.tanaman_id == tanaman_id)\
+             .filter(rollup.bucket_start >= start, rollup.bucket_start < end)\
+             .group_by(bucket)\
+             .all()
+
+
+def _terakhir_per_bucket(db, dialect, tanaman_id, start, end, bucket_seconds):
+    """
+    Baris terakhir tiap bucket (1 query: MAX(created_at) per bucket lalu join balik).
+    Output: {nomor_bucket: (created_at, kelembapan, pompa_on)}
+    """
+    log = models.LogKelembapan
+    terakhir = db.query(func.max(log.created_at).label("waktu"))\
+                 .filter(log.tanaman_id == tanaman_id)\
+                 .filter(log.created_at >= start, log.created_at < end)\
+                 .group_by(nomor_bucket(dialect, log.created_at, bucket_seconds))\
+                 .subquery()
+    rows = db.query(log.created_at, log.kelembapan_tanah, log.pompa_on)\
+             .join(terakhir, log.created_at == terakhir.c.waktu)\
+             .filter(log.tanaman_id == tanaman_id)\
+             .all()
+    return {int(ke_epoch(dialect, w) // bucket_seconds): (w, k, p) for w, k, p in rows}
+
+
+def _baris_sebelum(db, tanaman_id, waktu):
+    # Nilai yang sedang berlaku saat 'waktu' (baris terakhir sebelumnya), atau None
+    log = models.LogKelembapan
+    return db.query(log.created_at, log.kelembapan_tanah, log.pompa_on)\
+             .filter(log.tanaman_id == tanaman_id, log.created_at < waktu)\
+             .order_by(log.created_at.desc())\
+             .first()
+
+
+def _isi_step(db, dialect, tanaman_id, start, end, bucket_seconds, gabungan, maks_gap, maks_bucket=MAKS_BUCKET):
+    """
+    Isi bucket kosong dengan nilai baris terakhir sebelumnya (rekonstruksi step).
+    Bucket yang lebih dari maks_gap detik setelah baris terakhir dibiarkan kosong
+    (perangkat dianggap mati, bukan nilainya tetap). Bucket isian punya jumlah = 0.
+    Loop di Python berjalan per bucket, jadi jumlahnya dibatasi maks_bucket (ValueError).
+    """
+    cek_bucket(start, end, bucket_seconds, maks_bucket)
+    terakhir = _terakhir_per_bucket(db, dialect, tanaman_id, start, end, bucket_seconds)
+    awal = _baris_sebelum(db, tanaman_id, start)
+    berlaku = tuple(awal) if awal else None  # (waktu, kelembapan, pompa_on)
+
+    b_awal = int(ke_epoch(dialect, start) // bucket_seconds)
+    b_akhir = int(-(-ke_epoch(dialect, end) // bucket_seconds))
+    titik = []
+    for b in range(b_awal, b_akhir):
+        if b in gabungan:
+            jumlah, mn, mx, total, pompa = gabungan[b]
+            titik.append((b, jumlah, mn, mx, total, pompa))
+            # Data mentah bucket ini sudah dihapus retensi -> pakai rata-ratanya
+            berlaku = terakhir.get(b) or (dari_epoch(dialect, (b + 1) * bucket_seconds),
+                                          float(total) / int(jumlah), pompa * 2 >= jumlah)
+            continue
+        if berlaku is None:
+            continue
+        waktu_bucket = dari_epoch(dialect, b * bucket_seconds)
+        if maks_gap and (waktu_bucket - berlaku[0]).total_seconds() > maks_gap:
+            continue
+        nilai = float(berlaku[1])
+        titik.append((b, 0, nilai, nilai, nilai, 1.0 if berlaku[2] else 0.0))
+    return titik
+
+
+def cek_bucket(start, end, bucket_seconds, maks_bucket=MAKS_BUCKET):
+    """ValueError kalau bucket_seconds <= 0 atau rentang start-end terpecah lebih dari maks_bucket bucket."""
+    if not bucket_seconds or bucket_seconds <= 0:
+        raise ValueError("bucket_seconds harus > 0")
+    jumlah = math.ceil((end - start).total_seconds() / bucket_seconds)
+    if jumlah > maks_bucket:
+        raise ValueError(f"Rentang terlalu panjang untuk bucket {bucket_seconds} detik "
+                         f"({jumlah} bucket, maksimal {maks_bucket})")
+
+
+def bucket_series(db, tanaman_id, start, end, bucket_seconds, step=False, maks_gap=None, maks_bucket=MAKS_BUCKET):
+    """
+    Agregasi log kelembapan per bucket waktu (GROUP BY di database).
+    Bucket >= 1 menit dibaca dari tabel rollup untuk rentang yang sudah diringkas,
+    sisanya (data terbaru) dari log_kelembapan mentah.
+    step=True: bucket kosong diisi nilai terakhir (lihat _isi_step), maks_gap = batas detiknya.
+    Output: list dict {waktu, kelembapan_min, kelembapan_avg, kelembapan_max, pompa_on_rasio, jumlah}
+    """
+    cek_bucket(start, end, bucket_seconds, maks_bucket)
+    dialect = db.get_bind().dialect.name
+
+    rows = []
+    batas = start
+    resolusi = pilih_resolusi(bucket_seconds)
+    if resolusi:
+        akhir_rollup = batas_rollup(db, resolusi, tanaman_id)
+        # Rollup hanya dipakai untuk bucket yang utuh di dalam rentang; potongan di awal & akhir
+        # (start/end tidak pas di awal bucket rollup) tetap dari data mentah
+        awal_rollup = awal_bucket(dialect, start, ROLLUP_RESOLUSI[resolusi])
+        if awal_rollup < start:
+            awal_rollup += timedelta(seconds=ROLLUP_RESOLUSI[resolusi])
+        if akhir_rollup:
+            akhir_rollup = min(akhir_rollup, awal_bucket(dialect, end, ROLLUP_RESOLUSI[resolusi]))
+        if akhir_rollup and akhir_rollup > awal_rollup:
+            batas = akhir_rollup
+            if start < awal_rollup:
+                rows += _agregat_mentah(db, dialect, tanaman_id, start, awal_rollup, bucket_seconds)
+            rows += _agregat_rollup(db, dialect, resolusi, tanaman_id, awal_rollup, batas, bucket_seconds)
+    if batas < end:
+        rows += _agregat_mentah(db, dialect, tanaman_id, batas, end, bucket_seconds)
+
+    # Gabungkan bucket yang terbelah di batas rollup / data mentah
+    gabungan = {}
+    for b, jumlah, mn, mx, total, pompa in rows:
+        if not jumlah:
+            continue
+        b = int(b)
+        if b in gabungan:
+            j0, mn0, mx0, total0, pompa0 = gabungan[b]
+            gabungan[b] = (j0 + jumlah, min(mn0, mn), max(mx0, mx), total0 + total, pompa0 + pompa)
+        else:
+            gabungan[b] = (jumlah, mn, mx, total, pompa)
+
+    if step:
+        titik = _isi_step(db, dialect, tanaman_id, start, end, bucket_seconds, gabungan, maks_gap, maks_bucket)
+    else:
+        titik = [(b, *nilai) for b, nilai in sorted(gabungan.items())]
+
+    return [
+        {
+            "waktu": dari_epoch(dialect, b * bucket_seconds),
+            "kelembapan_min": float(mn),
+            "kelembapan_avg": float(total) / max(int(jumlah), 1),
+            "kelembapan_max": float(mx),
+            "pompa_on_rasio": float(pompa) / max(int(jumlah), 1),
+            "jumlah": int(jumlah),
+        }
+        for b, jumlah, mn, mx, total, pompa in titik
+    ]
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: pilih n_out indeks dari deret (x, y).
+    Titik pertama & terakhir selalu ikut; tiap bucket di tengah diwakili titik
+    yang membentuk segitiga terbesar dengan titik terpilih sebelumnya dan
+    rata-rata bucket berikutnya.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    batas = np.linspace(1, n - 1, n_out - 1).astype(int)  # batas bucket di tengah (tanpa titik pertama/terakhir)
+
+    terpilih = np.empty(n_out, dtype=int)
+    terpilih[0] = 0
+    terpilih[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        awal, akhir = batas[i], batas[i + 1]
+        # Rata-rata bucket berikutnya (bucket terakhir -> titik terakhir)
+        if i + 2 < len(batas):
+            nx, ny = x[akhir:batas[i + 2]].mean(), y[akhir:batas[i + 2]].mean()
+        else:
+            nx, ny = x[-1], y[-1]
+        luas = np.abs((x[a] - nx) * (y[awal:akhir] - y[a]) - (x[a] - x[awal:akhir]) * (ny - y[a]))
+        a = awal + int(np.argmax(luas))
+        terpilih[i + 1] = a
+    return terpilih
+
+
+def lttb_series(db, tanaman_id, start, end, points, step=False, maks_gap=None):
+    """
+    Deret hasil LTTB sebanyak maks 'points' titik.
+    Output: list dict dengan format sama seperti bucket_series
+    """
+    rentang = max(1.0, (end - start).total_seconds())
+    bucket_halus = max(1, int(rentang // (points * LTTB_OVERSAMPLE)))
+    # Pembulatan ke bawah bisa membuat bucket halus sampai 2x (points x LTTB_OVERSAMPLE)
+    halus = bucket_series(db, tanaman_id, start, end, bucket_halus, step, maks_gap,
+                          maks_bucket=2 * points * LTTB_OVERSAMPLE + 1)
+    if len(halus) <= points:
+        return halus
+
+    x = np.array([p["waktu"].timestamp() for p in halus])
+    y = np.array([p["kelembapan_avg"] for p in halus])
+    return [halus[i] for i in lttb_indices(x, y, points)]